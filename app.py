@@ -1,17 +1,18 @@
 # app.py
 # Interfaz de usuario con Streamlit y orquestación del proceso.
 
-import io
 import os
 import sys
+import threading
+import time
 import types
-import zipfile
 import re
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
-from pathlib import Path
-import tempfile
-import shutil
+
+# Antes de importar nuestros módulos: constants lee su configuración del entorno.
+load_dotenv()
 
 # --- Parche compatibilidad ---
 if 'imghdr' not in sys.modules:
@@ -19,14 +20,38 @@ if 'imghdr' not in sys.modules:
     sys.modules['imghdr'] = imghdr
 
 # --- Importar nuestros módulos ---
+# Solo lo necesario para el primer render; pipeline (pydantic, jinja2, openai, yaml) se importa al
+# generar y, mientras tanto, se precarga en segundo plano (ver `recursos_compartidos`).
+_inicio_importaciones = time.perf_counter()
 from constants import *
-from llm_service import inferir_contexto_unificado
-from project_generator import procesar_arquetipo
-# <<< NUEVO >>> Importamos el nuevo servicio de rúbricas
-from rubrics_service import cargar_rubricas, analizar_proyecto_con_rubricas
+from blob_store import obtener_blobs
+from job_runner import obtener_runner
+from llm_cache import obtener_cache
+from spec_loader import ZipIndex, map_prefix_to_type
+import speculation
+from startup_report import precargar_recursos
+from tracing import obtener_estadisticas, span
+_segundos_importaciones = time.perf_counter() - _inicio_importaciones
+
+
+@st.cache_resource(show_spinner=False)
+def tiempo_importaciones() -> float:
+    """Las importaciones del primer run del proceso (en los reruns ya están en `sys.modules`)."""
+    return _segundos_importaciones
+
+
+@st.cache_resource(show_spinner=False)
+def recursos_compartidos() -> dict:
+    """
+    Una vez por proceso, no por rerun ni por sesión: el cliente del LLM, los arquetipos compilados
+    y los catálogos de rúbricas se preparan en segundo plano mientras el usuario sube el diseño.
+    """
+    tiempos = {}
+    threading.Thread(target=lambda: tiempos.update(precargar_recursos()), name="precarga", daemon=True).start()
+    return tiempos
+
 
 # ========= CONFIG =========
-load_dotenv()
 if not os.getenv("OPENAI_API_KEY"):
     st.error("❌ Falta OPENAI_API_KEY en secretos/entorno.")
     st.stop()
@@ -56,9 +81,11 @@ def init_session_state():
     defaults = {
         S_MESSAGES: [], S_UPLOADED_SPEC: None, S_GENERATED_ZIP: None,
         S_OBSERVACIONES: [], S_SERVICE_TYPE: "UNKNOWN", S_SPEC_NAME: None,
-        S_SPEC_KIND: None, S_IS_GENERATING: False, S_PENDING_ACTION: None,
+        S_SPEC_KIND: None, S_SESSION_ID: uuid.uuid4().hex, S_JOB_ID: None,
         S_ARCHETYPE_CHOICE: "Automático", S_RUBRICS_DEFS: [], S_RUBRICS_KIND: "mule",
-        S_CTX_TEXT: "", S_EXTRACTED_KIND: None, S_EXTRACTED_NAME: None, S_EXTRACTED_BYTES: None
+        S_CTX_BLOB: None, S_EXTRACTED_KIND: None, S_EXTRACTED_NAME: None,
+        S_PROJECT_TREE: None, S_GENERATED_CONTEXT: None, S_RUBRICS_SCORE: None, S_TRACE: None,
+        S_SPECULATION: None, S_LAYERS_CHOICE: [], S_MULTI_RESULT: None
     }
     for key, value in defaults.items():
         if key not in st.session_state:
@@ -66,142 +93,206 @@ def init_session_state():
 
 
 init_session_state()
+precarga = recursos_compartidos()
+# Renueva la retención de los blobs de la sesión; los de sesiones que ya no vuelven se recolectan.
+obtener_blobs().retener(st.session_state[S_SESSION_ID], st.session_state[S_UPLOADED_SPEC],
+                        st.session_state[S_CTX_BLOB])
 
 
 # ========= Utilidades =========
-# (Las funciones _map_prefix_to_type, _best_candidate_from_zip, leer_especificacion, etc. van aquí)
-def _map_prefix_to_type(filename: str) -> str | None:
-    if not filename: return None
-    fname = filename.lower()
-    if "-rec-" in fname or "reception" in fname: return "REC"
-    if "-dom-" in fname or "domain" in fname: return "DOM"
-    if "-bus-" in fname or "business" in fname: return "BUS"
-    if "proxy" in fname: return "PROXY"
-    return None
-
-
-def _best_candidate_from_zip(z: zipfile.ZipFile) -> tuple[str, str, bytes]:
-    names = z.namelist()
-    candidates = {
-        "OAS": [n for n in names if re.search(r'(openapi|swagger)\.(ya?ml|json)$', n, re.I)],
-        "RAML": [n for n in names if n.lower().endswith(".raml")],
-    }
-    for kind, files in candidates.items():
-        if files:
-            name = files[0]
-            return (kind, name, z.read(name))
-    return ("RAW", names[0] if names else "", z.read(names[0]) if names else b"")
-
-
-def leer_especificacion(file):
-    name = (file.name or "").lower()
+def leer_especificacion(file) -> list[str]:
+    """
+    Copia el ZIP subido al blob store, lo indexa desde disco y guarda ahí también la spec raíz: la
+    sesión se queda solo con los hashes. Devuelve las referencias (`uses:`/`!include`/`$ref`) que
+    no se encontraron dentro del ZIP.
+    """
+    blobs = obtener_blobs()
     file.seek(0)
-    if name.endswith(".zip"):
-        st.session_state[S_SPEC_KIND] = "ZIP"
-        data = file.read()
-        with zipfile.ZipFile(io.BytesIO(data), "r") as z:
-            kind, inner_name, inner_bytes = _best_candidate_from_zip(z)
-        st.session_state[S_EXTRACTED_KIND] = kind
-        st.session_state[S_EXTRACTED_NAME] = inner_name
-        st.session_state[S_EXTRACTED_BYTES] = inner_bytes
-        ctx_text = inner_bytes.decode("utf-8", "ignore")
-        st.session_state[S_CTX_TEXT] = ctx_text
-
-
-def obtener_arquetipo(layer: str) -> str | None:
-    archetype_path = Path("archetypes") / layer
-    if archetype_path.exists() and archetype_path.is_dir():
-        return str(archetype_path.resolve())
-    st.error(f"No se encontró el directorio del arquetipo en: {archetype_path}")
-    return None
-
-
-# ========= Lógica Principal de la App =========
-
-def ejecutar_generacion():
-    try:
-        if not st.session_state[S_UPLOADED_SPEC]:
-            st.warning("Primero adjunta el ZIP de diseño.")
-            return
-
-        choice = st.session_state[S_ARCHETYPE_CHOICE]
-        if choice == "Automático":
-            svc_map = {"REC": "Reception", "DOM": "Domain", "BUS": "Business", "PROXY": "Proxy"}
-            choice = svc_map.get(st.session_state[S_SERVICE_TYPE], "Domain")
+    st.session_state[S_UPLOADED_SPEC] = blobs.guardar_archivo(file)
+    if not (file.name or "").lower().endswith(".zip"):
+        return []
+    st.session_state[S_SPEC_KIND] = "ZIP"
+    with span("lectura_spec", diseno=file.name), \
+            ZipIndex(str(blobs.ruta(st.session_state[S_UPLOADED_SPEC]))) as indice:
+        kind, inner_name, inner_bytes = indice.principal()
+        faltantes = indice.resolver(inner_name).faltantes if inner_name else []
+    st.session_state[S_EXTRACTED_KIND] = kind
+    st.session_state[S_EXTRACTED_NAME] = inner_name
+    st.session_state[S_CTX_BLOB] = blobs.guardar(inner_bytes) if inner_bytes else None
+    blobs.retener(st.session_state[S_SESSION_ID], st.session_state[S_UPLOADED_SPEC], st.session_state[S_CTX_BLOB])
+    return faltantes
 
-        st.info(f"⚙️ Iniciando generación para la capa: **{choice}**")
 
-        with st.spinner("🧠 Analizando especificación con IA..."):
-            contexto = inferir_contexto_unificado(st.session_state[S_CTX_TEXT], choice)
+def bytes_especificacion() -> bytes:
+    """La spec raíz se lee del blob store cuando hace falta, en vez de quedar en la sesión."""
+    return obtener_blobs().leer(st.session_state[S_CTX_BLOB]) if st.session_state[S_CTX_BLOB] else b""
 
-        if not contexto:
-            st.error("❌ El LLM no pudo generar un contexto válido.")
-            return
 
-        st.success("✅ Contexto de generación creado con éxito.")
-        with st.expander("Ver contexto generado"):
-            st.json(contexto.model_dump())
+def texto_especificacion() -> str:
+    return bytes_especificacion().decode("utf-8", "ignore")
 
-        layer_key = choice.lower()
-        st.session_state[S_RUBRICS_KIND] = "apigee" if layer_key == "reception" else "mule"
 
-        arquetipo_path = obtener_arquetipo("reception" if layer_key == "reception" else "generic-mule")
-        if not arquetipo_path: return
+@st.cache_data(max_entries=64, show_spinner=False)
+def tokens_especificacion(digest: str) -> tuple[int, int]:
+    """(condensados, originales) de la spec; por hash, así sesiones con el mismo diseño lo comparten."""
+    from spec_condenser import condensar_spec
+    spec_condensada = condensar_spec(obtener_blobs().leer_texto(digest))
+    return spec_condensada.tokens_condensados, spec_condensada.tokens_originales
 
-        with st.spinner("🏗️ Construyendo proyecto desde la plantilla..."):
-            salida_zip = procesar_arquetipo(arquetipo_path, contexto, st.session_state[S_EXTRACTED_BYTES],
-                                            st.session_state[S_EXTRACTED_KIND])
 
-        st.session_state[S_GENERATED_ZIP] = salida_zip
+def capa_elegida() -> str:
+    """La capa del radio, con 'Automático' resuelto a la inferida por el nombre del ZIP."""
+    from pipeline import resolver_capa
+    return resolver_capa(st.session_state[S_ARCHETYPE_CHOICE], st.session_state[S_SERVICE_TYPE])
 
-        # <<< NUEVO: Análisis con Rúbricas >>>
-        with st.spinner("🔍 Analizando calidad del proyecto generado..."):
-            temp_analysis_dir = Path(tempfile.mkdtemp())
-            with zipfile.ZipFile(salida_zip, 'r') as zip_ref:
-                zip_ref.extractall(temp_analysis_dir)
 
-            # Cargamos las definiciones de rúbricas
-            st.session_state[S_RUBRICS_DEFS] = cargar_rubricas(st.session_state[S_RUBRICS_KIND])
+def descartar_especulacion():
+    if st.session_state.get(S_SPECULATION) is not None:
+        speculation.descartar(obtener_runner(), st.session_state[S_SPECULATION])
+        st.session_state[S_SPECULATION] = None
 
-            # Analizamos y guardamos las observaciones
-            observaciones = analizar_proyecto_con_rubricas(
-                project_path=temp_analysis_dir,
-                rubrics_kind=st.session_state[S_RUBRICS_KIND],
-                rubrics_defs=st.session_state[S_RUBRICS_DEFS]
-            )
-            st.session_state[S_OBSERVACIONES] = observaciones
 
-            shutil.rmtree(temp_analysis_dir)  # Limpiamos
-
-        resumen = f"✅ ¡Proyecto '{contexto.names.artifact_id}.zip' generado!"
-        if st.session_state[S_OBSERVACIONES]:
-            resumen += f"\n\n Se encontraron {len(st.session_state[S_OBSERVACIONES])} observaciones de calidad."
-        st.success(resumen)
+# ========= Lógica Principal de la App =========
 
-    except Exception as e:
-        st.error(f"💥 Ocurrió un error durante la generación: {e}")
-        st.exception(e)
-    finally:
-        st.session_state[S_IS_GENERATING] = False
-        st.session_state[S_PENDING_ACTION] = None
+def enviar_generacion():
+    """Encola la generación como trabajo en segundo plano; la UI consulta su estado."""
+    from pipeline import ETAPAS_GENERACION, ETAPAS_MULTICAPA, generar_multicapa, generar_proyecto
+    capas = st.session_state[S_LAYERS_CHOICE]
+    if capas:
+        descartar_especulacion()  # se infirió para una sola capa
+        st.session_state[S_JOB_ID] = obtener_runner().enviar(
+            st.session_state[S_SESSION_ID], "generacion_multicapa", generar_multicapa,
+            texto_especificacion(), capas, bytes_especificacion(), st.session_state[S_EXTRACTED_KIND],
+            etapas=ETAPAS_MULTICAPA)
+        st.session_state[S_MESSAGES].append(
+            {"role": "assistant", "content": f"⚙️ Generación encolada para las capas: **{', '.join(capas)}**"})
+        return
+    choice = capa_elegida()
+    previo = None
+    if st.session_state[S_PROJECT_TREE] is not None and st.session_state[S_GENERATED_CONTEXT] is not None:
+        previo = (st.session_state[S_GENERATED_CONTEXT], st.session_state[S_PROJECT_TREE])
+    especulado = None
+    if st.session_state[S_SPECULATION] is not None:
+        especulado = speculation.reclamar(obtener_runner(), st.session_state[S_SPECULATION], choice)
+        st.session_state[S_SPECULATION] = None
+    st.session_state[S_JOB_ID] = obtener_runner().enviar(
+        st.session_state[S_SESSION_ID], "generacion", generar_proyecto,
+        texto_especificacion(), choice, bytes_especificacion(), st.session_state[S_EXTRACTED_KIND], previo,
+        etapas=ETAPAS_GENERACION, especulado=especulado)
+    st.session_state[S_MESSAGES].append(
+        {"role": "assistant", "content": f"⚙️ Generación encolada para la capa: **{choice}**"})
+
+
+def aplicar_resultado(job):
+    """Pasa el resultado de un trabajo terminado al estado de la sesión."""
+    if job.estado != "ok":
+        detalle = job.error or job.estado
+        st.session_state[S_MESSAGES].append(
+            {"role": "assistant", "content": f"💥 Ocurrió un error durante la generación: {detalle}"})
+        return
+    from pipeline import ResultadoMulticapa
+    r = job.resultado
+    if isinstance(r, ResultadoMulticapa):
+        aplicar_resultado_multicapa(job)
+        return
+    # El ZIP se escribe recién cuando el usuario lo descarga.
+    st.session_state[S_MULTI_RESULT] = None
+    st.session_state[S_PROJECT_TREE] = r.proyecto
+    st.session_state[S_GENERATED_ZIP] = f"{r.contexto.names.artifact_id}.zip"
+    st.session_state[S_GENERATED_CONTEXT] = r.contexto
+    st.session_state[S_RUBRICS_KIND] = r.rubrics_kind
+    st.session_state[S_OBSERVACIONES] = r.observaciones
+    st.session_state[S_RUBRICS_SCORE] = r.puntaje
+    st.session_state[S_TRACE] = r.traza
+
+    resumen = f"✅ ¡Proyecto '{r.contexto.names.artifact_id}.zip' generado!"
+    if r.diff is not None:
+        resumen += (f"\n\n🔁 Cambios respecto a la generación anterior: {len(r.diff.modificados)} modificados, "
+                    f"{len(r.diff.agregados)} nuevos, {len(r.diff.eliminados)} eliminados "
+                    f"({r.diff.rerenderizados} plantillas re-renderizadas, {r.diff.reutilizados} archivos reutilizados).")
+    if r.corregidas:
+        resumen += f"\n\n🛠️ Corregidas automáticamente: {', '.join(r.corregidas)}."
+    if r.observaciones:
+        resumen += f"\n\n Se encontraron {len(r.observaciones)} observaciones de calidad."
+    tiempos = " · ".join(f"{etapa}: {segundos:.1f}s" for etapa, segundos in job.tiempos.items())
+    resumen += f"\n\n⏱️ {tiempos}"
+    st.session_state[S_MESSAGES].append({"role": "assistant", "content": resumen})
+
+
+def aplicar_resultado_multicapa(job):
+    """Varias capas: un único ZIP con todos los proyectos; las observaciones llevan la capa delante."""
+    r = job.resultado
+    primero = next(iter(r.capas.values())).contexto
+    st.session_state[S_MULTI_RESULT] = r
+    st.session_state[S_GENERATED_ZIP] = f"{primero.names.artifact_id}-capas.zip"
+    # Sin árbol ni contexto únicos: la próxima generación de una capa no es incremental.
+    st.session_state[S_PROJECT_TREE] = None
+    st.session_state[S_GENERATED_CONTEXT] = None
+    st.session_state[S_RUBRICS_SCORE] = None
+    st.session_state[S_OBSERVACIONES] = [f"[{capa}] {o}" for capa, g in r.capas.items() for o in g.observaciones]
+    st.session_state[S_TRACE] = r.traza
+
+    resumen = f"✅ ¡Paquete '{st.session_state[S_GENERATED_ZIP]}' generado con {len(r.capas)} proyectos!"
+    for capa, g in r.capas.items():
+        puntaje = g.puntaje.puntaje_total if g.puntaje is not None else None
+        resumen += (f"\n- **{capa}**: {g.contexto.names.artifact_id} ({len(g.proyecto)} archivos, "
+                    f"{len(g.observaciones)} observaciones"
+                    + (f", {len(g.corregidas)} corregidas" if g.corregidas else "")
+                    + (f", rúbricas {puntaje:.0%}" if puntaje is not None else "") + ")")
+    tiempos = " · ".join(f"{etapa}: {segundos:.1f}s" for etapa, segundos in job.tiempos.items())
+    resumen += f"\n\n⏱️ {tiempos}"
+    st.session_state[S_MESSAGES].append({"role": "assistant", "content": resumen})
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def mostrar_trabajo():
+    """Se re-ejecuta sola cada `JOB_POLL_SECONDS` mientras haya un trabajo; no bloquea el resto de la página."""
+    job = obtener_runner().obtener(st.session_state[S_JOB_ID]) if st.session_state[S_JOB_ID] else None
+    if job is None:
+        return
+    if not job.activo:
+        aplicar_resultado(job)
+        st.session_state[S_JOB_ID] = None
+        st.rerun(scope="app")
+
+    etiqueta = "⏳ En cola…" if job.estado == "pendiente" else f"⚙️ Etapa: {job.etapa}"
+    st.progress(job.progreso, text=etiqueta)
+    secciones = [valor for nombre, valor in list(job.eventos) if nombre == "seccion"]
+    if secciones:
+        # Las secciones del contexto se muestran a medida que el LLM las completa.
+        with st.expander("Ver contexto en construcción", expanded=True):
+            for nombre, valor in secciones:
+                st.markdown(f"**{nombre}**")
+                if isinstance(valor, dict):
+                    st.json(valor)
+                else:
+                    st.write(valor)
+    if st.button("Cancelar generación"):
+        obtener_runner().cancelar(job.id)
 
 
 # ========= Renderizado de la UI =========
 
 if st.button("🔄 Reiniciar"):
+    descartar_especulacion()
+    obtener_blobs().soltar(st.session_state[S_SESSION_ID])
     for k in list(st.session_state.keys()): del st.session_state[k]
     st.rerun()
 
 spec = st.file_uploader("Adjunta el ZIP de diseño", type=["zip"])
 
 if spec and st.session_state[S_UPLOADED_SPEC] is None:
-    st.session_state[S_UPLOADED_SPEC] = spec
     st.session_state[S_SPEC_NAME] = spec.name
-    st.session_state[S_SERVICE_TYPE] = _map_prefix_to_type(spec.name) or "UNKNOWN"
-    leer_especificacion(spec)
+    st.session_state[S_SERVICE_TYPE] = map_prefix_to_type(spec.name) or "UNKNOWN"
+    faltantes = leer_especificacion(spec)
+    if SPECULATION_ENABLED and st.session_state[S_CTX_BLOB]:
+        # El LLM arranca ya con la capa inferida; "crea el proyecto" reutiliza el resultado si la capa coincide.
+        st.session_state[S_SPECULATION] = speculation.iniciar(
+            obtener_runner(), st.session_state[S_SESSION_ID], texto_especificacion(), capa_elegida())
+    aviso = f"\n\n⚠️ Referencias no encontradas en el ZIP: {', '.join(faltantes)}" if faltantes else ""
     st.session_state[S_MESSAGES].append({
         "role": "assistant",
-        "content": f"📦 Especificación \"{spec.name}\" cargada. Elige la capa y escribe \"crea el proyecto\"."
+        "content": f"📦 Especificación \"{spec.name}\" cargada. Elige la capa y escribe \"crea el proyecto\".{aviso}"
     })
     st.rerun()
 
@@ -212,6 +303,13 @@ if st.session_state[S_UPLOADED_SPEC]:
     st.session_state[S_ARCHETYPE_CHOICE] = st.radio(
         "Selecciona la capa del proyecto", choices, index=default_idx, horizontal=True
     )
+    if st.toggle("Generar varias capas en una pasada"):
+        st.session_state[S_LAYERS_CHOICE] = st.multiselect("Capas a generar", LAYERS, default=list(LAYERS))
+    else:
+        st.session_state[S_LAYERS_CHOICE] = []
+    especulacion = st.session_state[S_SPECULATION]
+    if especulacion is not None and (st.session_state[S_LAYERS_CHOICE] or especulacion.capa != capa_elegida()):
+        descartar_especulacion()
 
 # Historial de Chat y entrada de usuario
 for msg in st.session_state[S_MESSAGES]:
@@ -219,35 +317,93 @@ for msg in st.session_state[S_MESSAGES]:
     with st.chat_message(msg["role"], avatar=avatar):
         st.markdown(msg["content"])
 
+if st.session_state[S_GENERATED_CONTEXT] is not None:
+    with st.expander("Ver contexto generado"):
+        st.json(st.session_state[S_GENERATED_CONTEXT].model_dump())
+elif st.session_state[S_MULTI_RESULT] is not None:
+    with st.expander("Ver contextos generados"):
+        st.json({capa: g.contexto.model_dump() for capa, g in st.session_state[S_MULTI_RESULT].capas.items()})
+
+if st.session_state[S_TRACE] is not None:
+    traza = st.session_state[S_TRACE]
+    with st.expander(f"⏱️ Desglose de tiempos ({traza.duracion:.2f}s)"):
+        st.table([{"Etapa": "· " * s.profundidad + s.nombre, "ms": round(s.duracion * 1000, 1),
+                   "Detalle": ", ".join(f"{k}={v}" for k, v in s.atributos.items()) + (f" ⚠️ {s.error}" if s.error else "")}
+                  for s in sorted(traza.spans, key=lambda s: s.inicio)])
+        st.caption("p50/p95 por etapa (últimas ejecuciones)")
+        st.table([{"Etapa": etapa, "n": p["n"], "p50 ms": round(p["p50"] * 1000, 1), "p95 ms": round(p["p95"] * 1000, 1)}
+                  for etapa, p in sorted(obtener_estadisticas().percentiles().items())])
+
+stats = obtener_cache().estadisticas()
+st.sidebar.caption(f"Cache LLM: {stats['hits']} hits / {stats['misses']} misses")
+if st.session_state[S_CTX_BLOB]:
+    tokens_condensados, tokens_originales = tokens_especificacion(st.session_state[S_CTX_BLOB])
+    st.sidebar.caption(f"Spec en el prompt: {tokens_condensados} de {tokens_originales} tokens")
+especulaciones = speculation.obtener_estadisticas_especulacion().estadisticas()
+if especulaciones["hits"] or especulaciones["misses"]:
+    st.sidebar.caption(f"Especulación: {especulaciones['hits']} aciertos / {especulaciones['misses']} fallos "
+                       f"({especulaciones['segundos_ahorrados']:.1f}s adelantados)")
+trabajos = obtener_runner().estadisticas()
+st.sidebar.caption(f"Trabajos: {trabajos['en_curso']} en curso / {trabajos['pendientes']} en cola")
+arranque = f"Arranque: importaciones {tiempo_importaciones() * 1000:.0f} ms"
+if precarga:
+    arranque += f" · precarga {sum(precarga.values()) * 1000:.0f} ms"
+st.sidebar.caption(arranque)
+
 # <<< NUEVO: Mostrar Observaciones >>>
 if st.session_state[S_OBSERVACIONES]:
     st.markdown("---")
     st.markdown("### ⚠️ Observaciones de Calidad (Rúbricas)")
     for o in st.session_state[S_OBSERVACIONES]:
         st.markdown(f"- {o}", unsafe_allow_html=True)
+    puntaje = st.session_state[S_RUBRICS_SCORE]
+    if puntaje is not None and puntaje.puntaje_total is not None:
+        with st.expander(f"Puntaje de rúbricas: {puntaje.puntaje_total:.0%}"):
+            st.table([{"Criterio": c.id, "Peso": c.peso,
+                       "Puntaje": "N/A" if c.puntaje is None else f"{c.puntaje:.0%}"}
+                      for c in puntaje.criterios.values()])
     st.markdown("---")
 
-if st.session_state[S_IS_GENERATING]:
-    st.info("⏳ Generando proyecto… El chat está deshabilitado.")
-
-if st.session_state.is_generating and st.session_state.pending_action == "generate":
-    ejecutar_generacion()
-    st.rerun()
+if st.session_state[S_JOB_ID]:
+    mostrar_trabajo()
 
 user_input = st.chat_input("Escribe 'crea el proyecto' para empezar...")
-if user_input and not st.session_state[S_IS_GENERATING]:
+if user_input:
     st.session_state[S_MESSAGES].append({"role": "user", "content": user_input})
     if "crea el proyecto" in user_input.lower():
-        st.session_state[S_IS_GENERATING] = True
-        st.session_state[S_PENDING_ACTION] = "generate"
+        if not st.session_state[S_UPLOADED_SPEC]:
+            st.session_state[S_MESSAGES].append(
+                {"role": "assistant", "content": "Primero adjunta el ZIP de diseño."})
+        elif st.session_state[S_JOB_ID]:
+            st.session_state[S_MESSAGES].append(
+                {"role": "assistant", "content": "⏳ Ya hay una generación en curso para esta sesión."})
+        else:
+            enviar_generacion()
         st.rerun()
     else:
         st.session_state[S_MESSAGES].append(
             {"role": "assistant", "content": "💬 Entendido. Para empezar, escribe \"crea el proyecto\"."})
         st.rerun()
 
-if st.session_state[S_GENERATED_ZIP]:
-    zip_path = Path(st.session_state[S_GENERATED_ZIP])
-    if zip_path.exists():
-        with open(zip_path, "rb") as f:
-            st.download_button(f"⬇️ Descargar {zip_path.name}", f, file_name=zip_path.name)
\ No newline at end of file
+# La descarga es diferida: el ZIP se arma y se lee solo al hacer clic; ningún rerun lo carga.
+# Lectura completa a propósito: `st.download_button` convierte cualquier `data` (bytes, archivo o
+# callable) a bytes y los guarda en su almacén de medios en memoria, así que un lector por trozos o
+# mmap (`BlobStore.trozos`/`mapear`) no ahorraría memoria aquí y solo dejaría el archivo abierto.
+def _leer_zip(ruta: str) -> bytes:
+    with open(ruta, "rb") as f:
+        return f.read()
+
+
+if st.session_state[S_GENERATED_ZIP] and st.session_state[S_PROJECT_TREE] is not None:
+    from project_generator import empaquetar_proyecto
+    proyecto = st.session_state[S_PROJECT_TREE]
+    contexto = st.session_state[S_GENERATED_CONTEXT]
+    st.download_button(f"⬇️ Descargar {st.session_state[S_GENERATED_ZIP]}",
+                       lambda: _leer_zip(empaquetar_proyecto(proyecto, contexto)),
+                       file_name=st.session_state[S_GENERATED_ZIP], mime="application/zip")
+elif st.session_state[S_GENERATED_ZIP] and st.session_state[S_MULTI_RESULT] is not None:
+    from project_generator import empaquetar_bundle
+    proyectos = {capa: (g.proyecto, g.contexto) for capa, g in st.session_state[S_MULTI_RESULT].capas.items()}
+    nombre = st.session_state[S_GENERATED_ZIP]
+    st.download_button(f"⬇️ Descargar {nombre}", lambda: _leer_zip(empaquetar_bundle(proyectos, nombre)),
+                       file_name=nombre, mime="application/zip")
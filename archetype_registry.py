@@ -0,0 +1,345 @@
+# archetype_registry.py
+# Registro de arquetipos de larga vida: plantillas Jinja2 compiladas y cacheadas por proceso.
+
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from pathlib import Path
+from jinja2 import BaseLoader, Environment, FileSystemLoader, FileSystemBytecodeCache, Template, TemplateNotFound
+from jinja2 import meta, nodes
+
+from constants import (TEXT_EXTS, JINJA_BYTECODE_DIR, TEMPLATE_MARKERS, ARCHETYPE_EXCLUDE, ARCHETYPE_INCLUDE,
+                       ARCHETYPE_MANIFEST_DIR)
+from zip_utils import leer_entrada, raiz_comun, offset_datos
+
+
+# Versión de las reglas de clasificación: si cambian, los manifiestos persistidos dejan de valer.
+_REGLAS = hashlib.sha256(repr((sorted(TEXT_EXTS), TEMPLATE_MARKERS, ARCHETYPE_EXCLUDE,
+                                ARCHETYPE_INCLUDE)).encode("utf-8")).hexdigest()[:12]
+
+
+def excluido(ruta_relativa: str) -> bool:
+    """Reglas include/exclude del manifiesto; una inclusión explícita prevalece."""
+    ruta = ruta_relativa.rstrip("/")
+    if any(fnmatch(ruta, patron) for patron in ARCHETYPE_INCLUDE):
+        return False
+    return any(fnmatch(parte, patron) for parte in ruta.split("/") for patron in ARCHETYPE_EXCLUDE)
+
+
+def es_plantilla(ruta_relativa: str, contenido: bytes | None = None) -> bool:
+    """
+    Indica si un archivo del arquetipo se trata como plantilla Jinja2: extensión de texto y,
+    si se pasa el contenido, al menos un marcador de Jinja2.
+    """
+    nombre = ruta_relativa.rsplit("/", 1)[-1].lower()
+    if not (Path(nombre).suffix in TEXT_EXTS or nombre == "pom.xml"):
+        return False
+    return contenido is None or any(m in contenido for m in TEMPLATE_MARKERS)
+
+
+def _listar_archivos(src_dir: Path) -> tuple[list[tuple[str, os.stat_result]], list[str]]:
+    """
+    Devuelve (ruta relativa con '/', stat) de cada archivo del arquetipo, en orden estable,
+    y las rutas excluidas. Las carpetas excluidas (p. ej. `.git/`) no se recorren.
+    """
+    archivos, excluidos = [], []
+    for raiz, dirs, files in os.walk(src_dir):
+        rel_raiz = Path(raiz).relative_to(src_dir).as_posix()
+        prefijo = "" if rel_raiz == "." else rel_raiz + "/"
+        for nombre in sorted(dirs):
+            if excluido(prefijo + nombre):
+                excluidos.append(prefijo + nombre + "/")
+                dirs.remove(nombre)
+        dirs.sort()
+        for nombre in sorted(files):
+            if excluido(prefijo + nombre):
+                excluidos.append(prefijo + nombre)
+                continue
+            archivos.append((prefijo + nombre, (Path(raiz) / nombre).stat()))
+    return archivos, excluidos
+
+
+# Dependencia comodín: la plantilla incluye/extiende otras y se re-renderiza ante cualquier cambio.
+TODO_EL_CONTEXTO = "*"
+
+
+def _ruta_atributo(nodo) -> list[str] | None:
+    """`names.api_name` / `names['api_name']` -> ['names', 'api_name']; None si el acceso es dinámico."""
+    partes = []
+    while isinstance(nodo, (nodes.Getattr, nodes.Getitem)):
+        if isinstance(nodo, nodes.Getattr):
+            partes.append(nodo.attr)
+        elif isinstance(nodo.arg, nodes.Const) and isinstance(nodo.arg.value, str):
+            partes.append(nodo.arg.value)
+        else:
+            return None
+        nodo = nodo.node
+    if not isinstance(nodo, nodes.Name):
+        return None
+    return [nodo.name, *reversed(partes)]
+
+
+def dependencias_plantilla(env: Environment, fuente: str) -> frozenset[str]:
+    """
+    Campos del contexto que lee una plantilla, como rutas con puntos (`paths.base_path`).
+    Parte de las variables no declaradas de Jinja2 y refina cada una con la cadena de atributos
+    con que se accede; si solo se usa el objeto entero (p. ej. en un `for`), la dependencia es la raíz.
+    """
+    ast = env.parse(fuente)
+    if any(ast.find_all((nodes.Include, nodes.Extends, nodes.Import, nodes.FromImport))):
+        return frozenset({TODO_EL_CONTEXTO})
+    raices = meta.find_undeclared_variables(ast)
+    rutas: set[str] = set()
+
+    def visitar(nodo):
+        if isinstance(nodo, (nodes.Getattr, nodes.Getitem)):
+            ruta = _ruta_atributo(nodo)
+            if ruta and ruta[0] in raices:
+                rutas.add(".".join(ruta))
+                return
+        elif isinstance(nodo, nodes.Name) and nodo.ctx == "load" and nodo.name in raices:
+            rutas.add(nodo.name)
+            return
+        for hijo in nodo.iter_child_nodes():
+            visitar(hijo)
+
+    visitar(ast)
+    return frozenset(rutas)
+
+
+def _leer_manifiesto(content_hash: str) -> dict | None:
+    try:
+        return json.loads((ARCHETYPE_MANIFEST_DIR / f"{content_hash}-{_REGLAS}.json").read_text("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _guardar_manifiesto(content_hash: str, manifiesto: dict):
+    destino = ARCHETYPE_MANIFEST_DIR / f"{content_hash}-{_REGLAS}.json"
+    try:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        tmp = destino.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(manifiesto, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, destino)
+    except OSError as e:
+        print(f"Advertencia: No se pudo guardar el manifiesto del arquetipo: {e}")
+
+
+def _huella(archivos: list[tuple[str, os.stat_result]]) -> tuple:
+    """Huella barata (ruta, tamaño, mtime) para detectar cambios sin leer contenido."""
+    return tuple((rel, st.st_size, st.st_mtime_ns) for rel, st in archivos)
+
+
+def _hash_contenido(src_dir: Path, archivos: list[tuple[str, os.stat_result]]) -> str:
+    """Hash SHA-256 del árbol del arquetipo (rutas + contenido)."""
+    h = hashlib.sha256()
+    for rel, _ in archivos:
+        h.update(rel.encode("utf-8") + b"\0")
+        h.update((src_dir / rel).read_bytes())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _hash_archivo(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class _ZipLoader(BaseLoader):
+    """
+    Loader de Jinja2 que lee las plantillas directamente del ZIP del arquetipo, por el offset de cada
+    entrada ya indexado en el arquetipo (sin reabrir el ZIP ni re-parsear su directorio central).
+    """
+
+    def __init__(self, zip_path: Path, miembros: dict[str, zipfile.ZipInfo], offsets: dict[str, int]):
+        self.zip_path = zip_path
+        self.miembros = miembros
+        self.offsets = offsets
+
+    def get_source(self, environment, template):
+        info = self.miembros.get(template)
+        if info is None:
+            raise TemplateNotFound(template)
+        source = leer_entrada(self.zip_path, info, self.offsets[template]).decode("utf-8")
+        return source, None, lambda: True
+
+
+@dataclass
+class ArchetypeEntry:
+    """
+    Arquetipo compilado según su manifiesto: plantillas listas para `render`, archivos estáticos
+    (se copian sin leerlos) y rutas excluidas (nunca llegan al proyecto generado).
+    """
+    origen: Path
+    content_hash: str
+    huella: tuple
+    env: Environment
+    templates: dict[str, Template] = field(default_factory=dict)
+    estaticos: list[str] = field(default_factory=list)
+    errores: dict[str, str] = field(default_factory=dict)
+    excluidos: list[str] = field(default_factory=list)
+    # Solo para arquetipos ZIP: raíz envoltorio, entradas y offset de sus datos comprimidos.
+    prefijo: str = ""
+    directorios: dict[str, zipfile.ZipInfo] = field(default_factory=dict)
+    miembros: dict[str, zipfile.ZipInfo] = field(default_factory=dict)
+    offsets: dict[str, int] = field(default_factory=dict)
+    _dependencias: dict[str, frozenset[str]] = field(default_factory=dict, repr=False)
+    _dependencias_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def version(self) -> str:
+        """Identifica contenido + reglas de clasificación (lo que determina la salida generada)."""
+        return f"{self.content_hash}-{_REGLAS}"
+
+    @property
+    def es_zip(self) -> bool:
+        return self.origen.is_file()
+
+    @property
+    def archivos(self) -> list[str]:
+        return sorted([*self.templates, *self.estaticos, *self.errores])
+
+    def dependencias(self, rel: str) -> frozenset[str]:
+        """Campos del contexto que usa la plantilla `rel` (se analiza una vez por arquetipo)."""
+        with self._dependencias_lock:
+            if rel not in self._dependencias:
+                fuente, _, _ = self.env.loader.get_source(self.env, rel)
+                self._dependencias[rel] = dependencias_plantilla(self.env, fuente)
+            return self._dependencias[rel]
+
+
+class ArchetypeRegistry:
+    """
+    Cache de arquetipos compilados, indexada por ruta (directorio o ZIP) y validada por hash de contenido.
+    El bytecode de Jinja2 se persiste en disco para que un proceso nuevo no recompile.
+    """
+
+    def __init__(self, bytecode_dir: Path = JINJA_BYTECODE_DIR):
+        self.bytecode_dir = Path(bytecode_dir)
+        self._entries: dict[str, ArchetypeEntry] = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, origen: Path) -> ArchetypeEntry:
+        """Devuelve el arquetipo compilado; recompila solo si algún archivo cambió."""
+        origen = Path(origen).resolve()
+        key = str(origen)
+        if origen.is_file():
+            st = origen.stat()
+            archivos, excluidos, huella = None, [], (st.st_size, st.st_mtime_ns)
+        else:
+            archivos, excluidos = _listar_archivos(origen)
+            huella = _huella(archivos)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.huella == huella:
+                return entry
+
+            content_hash = _hash_archivo(origen) if archivos is None else _hash_contenido(origen, archivos)
+            if entry and entry.content_hash == content_hash:
+                # Solo cambiaron metadatos (p. ej. mtime): las plantillas siguen siendo válidas.
+                entry.huella = huella
+                return entry
+
+            if archivos is None:
+                entry = self._compilar_zip(origen, huella, content_hash)
+            else:
+                entry = self._compilar(origen, archivos, excluidos, huella, content_hash)
+            self._entries[key] = entry
+            return entry
+
+    def invalidar(self, origen: Path | None = None):
+        """Descarta un arquetipo (o todos) de la cache en memoria."""
+        with self._lock:
+            if origen is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(Path(origen).resolve()), None)
+
+    def _crear_env(self, loader: BaseLoader, content_hash: str) -> Environment:
+        bytecode_dir = self.bytecode_dir / content_hash[:16]
+        bytecode_dir.mkdir(parents=True, exist_ok=True)
+        return Environment(
+            loader=loader,
+            bytecode_cache=FileSystemBytecodeCache(str(bytecode_dir)),
+            autoescape=False,
+            auto_reload=False,
+            cache_size=-1,
+        )
+
+    @staticmethod
+    def _clasificar(entry: ArchetypeEntry, rutas: list[str], leer):
+        """
+        Aplica el manifiesto (plantilla / estático) y compila solo las plantillas.
+        El manifiesto se calcula una vez por contenido y se persiste junto al bytecode.
+        """
+        manifiesto = _leer_manifiesto(entry.content_hash)
+        if manifiesto is None:
+            manifiesto = {"plantillas": [], "estaticos": []}
+            for rel in rutas:
+                plantilla = es_plantilla(rel) and es_plantilla(rel, leer(rel))
+                manifiesto["plantillas" if plantilla else "estaticos"].append(rel)
+            _guardar_manifiesto(entry.content_hash, manifiesto)
+
+        entry.estaticos = list(manifiesto["estaticos"])
+        for rel in manifiesto["plantillas"]:
+            try:
+                entry.templates[rel] = entry.env.get_template(rel)
+            except Exception as e:
+                entry.errores[rel] = str(e)
+
+    def _compilar(self, src_dir: Path, archivos, excluidos: list[str], huella: tuple,
+                  content_hash: str) -> ArchetypeEntry:
+        env = self._crear_env(FileSystemLoader(searchpath=str(src_dir)), content_hash)
+        entry = ArchetypeEntry(origen=src_dir, content_hash=content_hash, huella=huella, env=env,
+                               excluidos=excluidos)
+        self._clasificar(entry, [rel for rel, _ in archivos], lambda rel: (src_dir / rel).read_bytes())
+
+        print(f"Arquetipo compilado: {src_dir.name} ({len(entry.templates)} plantillas, "
+              f"{len(entry.estaticos)} estáticos, {len(entry.excluidos)} excluidos, hash {content_hash[:12]})")
+        return entry
+
+    def _compilar_zip(self, zip_path: Path, huella: tuple, content_hash: str) -> ArchetypeEntry:
+        with zipfile.ZipFile(zip_path) as z:
+            infos = z.infolist()
+        prefijo = raiz_comun([i.filename for i in infos])
+        miembros, offsets = {}, {}  # el loader los comparte con el arquetipo; se llenan abajo
+        env = self._crear_env(_ZipLoader(zip_path, miembros, offsets), content_hash)
+        entry = ArchetypeEntry(origen=zip_path, content_hash=content_hash, huella=huella, env=env, prefijo=prefijo,
+                               miembros=miembros, offsets=offsets)
+
+        with open(zip_path, "rb") as fp:
+            for info in infos:
+                if not info.filename.startswith(prefijo) or info.filename == prefijo:
+                    continue
+                rel = info.filename[len(prefijo):]
+                if excluido(rel):
+                    if not info.is_dir():
+                        entry.excluidos.append(rel)
+                    continue
+                if info.is_dir():
+                    entry.directorios[rel] = info
+                    continue
+                entry.miembros[rel] = info
+                entry.offsets[rel] = offset_datos(fp, info)
+        self._clasificar(entry, sorted(entry.miembros),
+                         lambda rel: leer_entrada(zip_path, entry.miembros[rel], entry.offsets[rel]))
+
+        print(f"Arquetipo compilado: {zip_path.name} ({len(entry.templates)} plantillas, "
+              f"{len(entry.estaticos)} estáticos, {len(entry.excluidos)} excluidos, hash {content_hash[:12]})")
+        return entry
+
+
+_registry = ArchetypeRegistry()
+
+
+def obtener_registro() -> ArchetypeRegistry:
+    """Registro compartido por todo el proceso."""
+    return _registry
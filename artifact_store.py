@@ -0,0 +1,171 @@
+# artifact_store.py
+# Almacén de ZIPs generados direccionado por contenido: mismas entradas -> mismo artefacto, sin volver a generar.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+from constants import ARTIFACT_STORE_DIR, ARTIFACT_STORE_MAX_ENTRIES, ARTIFACT_STORE_MAX_BYTES
+from models import UnifiedModel
+
+# Temporales huérfanos (p. ej. de un proceso que murió a mitad de escritura) más viejos que esto se borran.
+_TMP_MAX_EDAD_SECONDS = 3600
+
+
+def clave_artefacto(version_arquetipo: str, contexto: UnifiedModel, spec_bytes: bytes, spec_kind: str) -> str:
+    """Clave del artefacto: hash de la versión del arquetipo + contexto + especificación."""
+    h = hashlib.sha256()
+    h.update(version_arquetipo.encode("utf-8") + b"\0")
+    h.update(json.dumps(contexto.model_dump(), sort_keys=True, ensure_ascii=False).encode("utf-8") + b"\0")
+    h.update(spec_kind.encode("utf-8") + b"\0")
+    h.update(spec_bytes or b"")
+    return h.hexdigest()
+
+
+def clave_bundle(claves: dict[str, str]) -> str:
+    """Clave de un paquete con varios proyectos: hash de las claves de cada uno (por nombre de carpeta)."""
+    return hashlib.sha256(json.dumps(claves, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def clave_corregida(clave: str, correcciones: list[str]) -> str:
+    """Clave de un artefacto al que se aplicaron correcciones automáticas (mismo origen + mismas correcciones)."""
+    return hashlib.sha256(json.dumps([clave, sorted(correcciones)]).encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    """
+    Un directorio por clave con el ZIP dentro (`<clave>/<artifact_id>.zip`), así dos usuarios que
+    generan el mismo artifact_id con entradas distintas nunca se pisan. Las escrituras son atómicas
+    (temporal + rename), las peticiones idénticas simultáneas comparten una sola construcción y el
+    directorio se recorta por LRU (mtime) cuando excede el tamaño o la cantidad de entradas.
+    """
+
+    def __init__(self, directorio: Path = ARTIFACT_STORE_DIR, max_entries: int = ARTIFACT_STORE_MAX_ENTRIES,
+                 max_bytes: int = ARTIFACT_STORE_MAX_BYTES):
+        self.directorio = Path(directorio)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._locks: dict[str, tuple[threading.Lock, int]] = {}
+
+    def ruta(self, clave: str, nombre: str) -> Path:
+        return self.directorio / clave / nombre
+
+    def obtener(self, clave: str, nombre: str) -> Optional[Path]:
+        """Ruta del artefacto si ya existe (y lo marca como usado), o None."""
+        ruta = self.ruta(clave, nombre)
+        try:
+            os.utime(ruta)  # marca de uso para el LRU
+        except OSError:
+            return None
+        return ruta
+
+    @contextmanager
+    def _bloqueo(self, clave: str):
+        """Lock por clave, con conteo de referencias para no acumular locks."""
+        with self._lock:
+            lock, usos = self._locks.get(clave, (threading.Lock(), 0))
+            self._locks[clave] = (lock, usos + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, usos = self._locks[clave]
+                if usos == 1:
+                    del self._locks[clave]
+                else:
+                    self._locks[clave] = (lock, usos - 1)
+
+    def obtener_o_construir(self, clave: str, nombre: str, construir: Callable[[Path], object]) -> str:
+        """
+        Devuelve la ruta del artefacto; si no existe, llama a `construir(ruta_temporal)` para que
+        escriba el ZIP y lo publica con un rename atómico.
+        """
+        ruta = self.obtener(clave, nombre)
+        if ruta is not None:
+            with self._lock:
+                self.hits += 1
+            return str(ruta)
+
+        with self._bloqueo(clave):
+            ruta = self.obtener(clave, nombre)
+            if ruta is not None:  # otra petición idéntica lo construyó mientras esperábamos
+                with self._lock:
+                    self.coalesced += 1
+                return str(ruta)
+
+            with self._lock:
+                self.misses += 1
+            destino = self.ruta(clave, nombre)
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.directorio / f".{clave}.{uuid.uuid4().hex}.tmp"
+            try:
+                construir(tmp)
+                os.replace(tmp, destino)
+            finally:
+                tmp.unlink(missing_ok=True)
+
+        self._desalojar(conservar=clave)
+        return str(destino)
+
+    def limpiar(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                    "evictions": self.evictions}
+
+    def _desalojar(self, conservar: str | None = None):
+        """Elimina temporales huérfanos y, si se excede el límite, los artefactos menos usados."""
+        entradas = []
+        ahora = time.time()
+        for ruta in self.directorio.iterdir():
+            try:
+                if ruta.is_file():
+                    if ruta.suffix == ".tmp" and ahora - ruta.stat().st_mtime > _TMP_MAX_EDAD_SECONDS:
+                        ruta.unlink(missing_ok=True)
+                    continue
+                archivos = [(a, a.stat()) for a in ruta.iterdir() if a.is_file()]
+            except OSError:
+                continue
+            mtime = max((st.st_mtime for _, st in archivos), default=0.0)
+            entradas.append((mtime, sum(st.st_size for _, st in archivos), ruta))
+
+        entradas.sort()  # menos usadas primero
+        total_bytes = sum(size for _, size, _ in entradas)
+        restantes = len(entradas)
+        eliminadas = 0
+        for _, size, ruta in entradas:
+            if restantes <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            if ruta.name == conservar:
+                continue
+            shutil.rmtree(ruta, ignore_errors=True)
+            restantes -= 1
+            total_bytes -= size
+            eliminadas += 1
+
+        if eliminadas:
+            with self._lock:
+                self.evictions += eliminadas
+
+
+_store = ArtifactStore()
+
+
+def obtener_store() -> ArtifactStore:
+    """Almacén compartido por todo el proceso."""
+    return _store
@@ -0,0 +1,365 @@
+# autofix.py
+# Correcciones automáticas después de las rúbricas: para las reglas fallidas que declaran una acción
+# correctiva (o cuyo fixer solo crea lo que falta), los fixers registrados completan el proyecto ya
+# generado (carpetas, descriptores, endpoints) sin volver a llamar al LLM ni re-renderizar el
+# arquetipo, y solo se re-evalúan las reglas afectadas.
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Mapping, Optional
+from xml.sax.saxutils import escape
+
+from artifact_store import clave_corregida
+from constants import AUTOFIX_ENABLED
+from models import UnifiedModel
+from project_tree import ProjectTree
+from rubric_catalog import obtener_catalogo
+from rubric_engine import Regla, ResultadoRubricas, reevaluar
+from rubrics_service import observaciones_de
+from tracing import span
+
+# Re-evaluar todas las reglas (la corrección cambia algo que casi todas consultan).
+TODAS = "*"
+
+
+@dataclass
+class Reparacion:
+    """Lo que necesita un fixer: el árbol que puede modificar, el contexto y los defaults de la rúbrica."""
+    tree: ProjectTree
+    contexto: UnifiedModel
+    defaults: Mapping = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class _Fixer:
+    fn: Callable[[Reparacion], list[str]]
+    afecta: tuple[str, ...]  # otras claves de verificación cuyo resultado puede cambiar
+    solo_faltantes: bool = False  # solo crea archivos ausentes: corre aunque la regla no declare acción
+
+
+_FIXERS: dict[str, _Fixer] = {}
+
+
+def registrar(*claves: str, afecta: tuple[str, ...] = (), solo_faltantes: bool = False):
+    """
+    Registra un fixer bajo las claves de verificación que repara. El fixer devuelve las rutas que
+    creó o modificó (vacía si no pudo o no hizo falta corregir nada). Con `solo_faltantes` el fixer
+    se compromete a no tocar archivos existentes y corre también para reglas sin acción correctiva.
+    """
+    def decorador(fn):
+        for clave in claves:
+            _FIXERS[clave] = _Fixer(fn, afecta, solo_faltantes)
+        return fn
+    return decorador
+
+
+def _claves_corregibles(regla: Regla) -> list[str]:
+    """Claves de `regla` con fixer aplicable: todas si declara una acción; si no, las de solo faltantes."""
+    return [c for c in regla.claves if c in _FIXERS and (regla.accion or _FIXERS[c].solo_faltantes)]
+
+
+def fixers_registrados() -> set[str]:
+    return set(_FIXERS)
+
+
+# --- Fixers Mule ---
+
+_MULE = "src/main/mule"
+_MULE_ARTIFACT = {"minMuleVersion": "4.6.0", "javaSpecificationVersions": ["17"]}
+
+
+@registrar("C5_COMMON_STRUCTURE", afecta=("H2_MMP_CONFIG",))
+def _estructura_mule(rep: Reparacion) -> list[str]:
+    """Carpetas de la estructura común que falten."""
+    cambios = []
+    for carpeta in [*(f"{_MULE}/{d}" for d in ("client", "handler", "orchestrator", "common")),
+                    "src/main/resources/dwl", "src/test/munit"]:
+        if not rep.tree.is_dir(carpeta):
+            rep.tree.agregar_directorio(carpeta)
+            cambios.append(carpeta + "/")
+    return cambios
+
+
+@registrar("H1_RUNTIME_COMPAT", solo_faltantes=True)
+def _descriptor_mule(rep: Reparacion) -> list[str]:
+    """
+    `mule-artifact.json` si falta. H1 no admite autofix: un descriptor existente (aunque declare
+    otra versión de Mule o de Java) nunca se reescribe.
+    """
+    if rep.tree.exists("mule-artifact.json"):
+        return []
+    rep.tree.agregar("mule-artifact.json", json.dumps(_MULE_ARTIFACT, indent=2) + "\n")
+    return ["mule-artifact.json"]
+
+
+# --- Fixers Apigee ---
+
+def _apiproxy(tree: ProjectTree) -> Optional[str]:
+    candidatos = sorted(d for d in tree.directorios() if d == "apiproxy" or d.endswith("/apiproxy"))
+    return candidatos[0] if candidatos else None
+
+
+def _endpoints(tree: ProjectTree, apiproxy: str, carpeta: str) -> list[str]:
+    return tree.glob(f"{apiproxy}/{carpeta}/*.xml")
+
+
+def _nombre_proxy(rep: Reparacion, apiproxy: str | None = None) -> str:
+    padre = apiproxy.rpartition("/")[0].rpartition("/")[2] if apiproxy and "/" in apiproxy else ""
+    return padre or rep.contexto.names.api_name or rep.contexto.names.artifact_id
+
+
+def _oas(tree: ProjectTree, apiproxy: str) -> dict:
+    for rel in tree.glob(f"{apiproxy}/resources/oas/*.json"):
+        try:
+            data = json.loads(tree.leer_texto(rel))
+        except ValueError:
+            continue
+        if isinstance(data, dict) and "paths" in data:
+            return data
+    return {}
+
+
+def _url_backend(rep: Reparacion, apiproxy: str | None) -> Optional[str]:
+    """URL del backend: la del contexto, la del upstream o el primer `servers` del OAS."""
+    if rep.contexto.paths.target_base_url:
+        return rep.contexto.paths.target_base_url
+    up = rep.contexto.upstream
+    if up.host:
+        return f"{up.protocol or 'https'}://{up.host}{up.path or ''}"
+    servidores = _oas(rep.tree, apiproxy).get("servers") if apiproxy else None
+    if servidores and isinstance(servidores[0], dict) and servidores[0].get("url"):
+        return servidores[0]["url"]
+    return None
+
+
+def _con_saltos(texto: str, fragmento: str) -> str:
+    """`fragmento` con el mismo fin de línea que `texto` (los arquetipos traen archivos CRLF)."""
+    return fragmento.replace("\n", "\r\n") if "\r\n" in texto else fragmento
+
+
+def _propiedades_timeout(rep: Reparacion, faltan: list[str], sangria: str) -> str:
+    timeouts = rep.defaults.get("timeouts") or {}
+    return "".join(f'{sangria}<Property name="{p}">{timeouts.get(p, "")}</Property>\n' for p in faltan)
+
+
+def _proxy_endpoint(rep: Reparacion) -> str:
+    return f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<ProxyEndpoint name="default">
+  <HTTPProxyConnection>
+    <BasePath>{escape(rep.contexto.paths.base_path)}</BasePath>
+    <VirtualHost>{escape(rep.defaults.get("virtualhost") or "default")}</VirtualHost>
+  </HTTPProxyConnection>
+  <PreFlow name="PreFlow">
+    <Request/>
+    <Response/>
+  </PreFlow>
+  <Flows/>
+  <RouteRule name="default">
+    <TargetEndpoint>backend</TargetEndpoint>
+  </RouteRule>
+</ProxyEndpoint>
+"""
+
+
+def _target_endpoint(rep: Reparacion, url: Optional[str]) -> str:
+    propiedades = _propiedades_timeout(rep, ["connect.timeout.millis", "io.timeout.millis"], "      ")
+    url_xml = f"    <URL>{escape(url)}</URL>\n" if url else ""
+    return f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<TargetEndpoint name="backend">
+  <PreFlow name="PreFlow">
+    <Request/>
+    <Response/>
+  </PreFlow>
+  <HTTPTargetConnection>
+    <Properties>
+{propiedades}    </Properties>
+{url_xml}  </HTTPTargetConnection>
+</TargetEndpoint>
+"""
+
+
+@registrar("has_apiproxy_root", afecta=(TODAS,))
+def _estructura_apigee(rep: Reparacion) -> list[str]:
+    """Bundle mínimo: `apiproxy/` con `proxies/default.xml`, `targets/backend.xml` y `policies/`."""
+    if _apiproxy(rep.tree) is not None:
+        return []
+    apiproxy = f"src/main/apigee/apiproxies/{_nombre_proxy(rep)}/apiproxy"
+    rep.tree.agregar_directorio(f"{apiproxy}/policies")
+    rep.tree.agregar_directorio(f"{apiproxy}/resources/oas")
+    rep.tree.agregar(f"{apiproxy}/proxies/default.xml", _proxy_endpoint(rep))
+    rep.tree.agregar(f"{apiproxy}/targets/backend.xml", _target_endpoint(rep, _url_backend(rep, None)))
+    return [f"{apiproxy}/policies/", f"{apiproxy}/proxies/default.xml", f"{apiproxy}/targets/backend.xml"]
+
+
+@registrar("has_apiproxy_descriptor")
+def _descriptor(rep: Reparacion) -> list[str]:
+    """Descriptor `<APIProxy>` con la descripción del `info` del OAS y los endpoints existentes."""
+    apiproxy = _apiproxy(rep.tree)
+    if apiproxy is None:
+        return []
+    nombre = _nombre_proxy(rep, apiproxy)
+    rel = f"{apiproxy}/{nombre}.xml"
+    if rep.tree.exists(rel):
+        return []  # hay un XML con ese nombre que no es un descriptor: no se pisa
+    info = _oas(rep.tree, apiproxy).get("info") or {}
+    descripcion = info.get("title") or rep.contexto.names.api_display_name or nombre
+
+    def lista(carpeta: str, etiqueta: str) -> str:
+        nombres = [r.rsplit("/", 1)[-1][:-4] for r in rep.tree.glob(f"{apiproxy}/{carpeta}/*.xml")]
+        return "".join(f"    <{etiqueta}>{escape(n)}</{etiqueta}>\n" for n in sorted(nombres))
+
+    rep.tree.agregar(rel, f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<APIProxy name="{escape(nombre, {'"': "&quot;"})}">
+  <Description>{escape(str(descripcion))}</Description>
+  <BasePaths>{escape(rep.contexto.paths.base_path)}</BasePaths>
+  <Policies>
+{lista("policies", "Policy")}  </Policies>
+  <ProxyEndpoints>
+{lista("proxies", "ProxyEndpoint")}  </ProxyEndpoints>
+  <TargetEndpoints>
+{lista("targets", "TargetEndpoint")}  </TargetEndpoints>
+</APIProxy>
+""")
+    return [rel]
+
+
+@registrar("proxy.virtualhost.configured", afecta=("proxy.basepath.from_servers",))
+def _virtualhost(rep: Reparacion) -> list[str]:
+    """Agrega el VirtualHost por defecto a los ProxyEndpoint que no lo tienen (o crea `proxies/default.xml`)."""
+    apiproxy = _apiproxy(rep.tree)
+    if apiproxy is None:
+        return []
+    proxies = _endpoints(rep.tree, apiproxy, "proxies")
+    if not proxies:
+        rel = f"{apiproxy}/proxies/default.xml"
+        rep.tree.agregar(rel, _proxy_endpoint(rep))
+        return [rel]
+    virtualhost = escape(rep.defaults.get("virtualhost") or "default")
+    cambios = []
+    for rel in proxies:
+        texto = rep.tree.leer_texto(rel)
+        if "<VirtualHost>" in texto:
+            continue
+        nuevo = re.sub(r"([ \t]*)</HTTPProxyConnection>",
+                       lambda m: _con_saltos(texto, f"{m.group(1)}  <VirtualHost>{virtualhost}</VirtualHost>\n"
+                                                    f"{m.group(1)}</HTTPProxyConnection>"), texto, count=1)
+        if nuevo != texto:
+            rep.tree.agregar(rel, nuevo)
+            cambios.append(rel)
+    return cambios
+
+
+@registrar("target.url_or_server", afecta=("target.timeouts",))
+def _target(rep: Reparacion) -> list[str]:
+    """Crea `targets/backend.xml` si no hay TargetEndpoint, o agrega la URL del backend si no tiene."""
+    apiproxy = _apiproxy(rep.tree)
+    if apiproxy is None:
+        return []
+    url = _url_backend(rep, apiproxy)
+    targets = _endpoints(rep.tree, apiproxy, "targets")
+    if not targets:
+        rel = f"{apiproxy}/targets/backend.xml"
+        rep.tree.agregar(rel, _target_endpoint(rep, url))
+        return [rel]
+    if url is None:
+        return []
+    cambios = []
+    for rel in targets:
+        texto = rep.tree.leer_texto(rel)
+        if "<HTTPTargetConnection" not in texto or re.search(r"<URL>|<Server\b", texto):
+            continue
+        nuevo = re.sub(r"([ \t]*)</HTTPTargetConnection>",
+                       lambda m: _con_saltos(texto, f"{m.group(1)}  <URL>{escape(url)}</URL>\n"
+                                                    f"{m.group(1)}</HTTPTargetConnection>"), texto, count=1)
+        rep.tree.agregar(rel, nuevo)
+        cambios.append(rel)
+    return cambios
+
+
+@registrar("target.timeouts")
+def _timeouts(rep: Reparacion) -> list[str]:
+    """Agrega a cada HTTPTargetConnection los timeouts por defecto de la rúbrica que le falten."""
+    apiproxy = _apiproxy(rep.tree)
+    if apiproxy is None:
+        return []
+    cambios = []
+    for rel in _endpoints(rep.tree, apiproxy, "targets"):
+        texto = rep.tree.leer_texto(rel)
+        m = re.search(r"([ \t]*)<HTTPTargetConnection>[^\n]*\n(.*?)</HTTPTargetConnection>", texto, re.S)
+        if m is None:
+            continue
+        sangria, bloque = m.group(1), m.group(2)
+        faltan = [p for p in ("connect.timeout.millis", "io.timeout.millis") if f'name="{p}"' not in bloque]
+        if not faltan:
+            continue
+        propiedades = _propiedades_timeout(rep, faltan, sangria + "    ")
+        if re.search(r"</Properties>", bloque):
+            bloque = re.sub(r"([ \t]*)</Properties>", lambda p: _con_saltos(texto, propiedades) + p.group(0),
+                            bloque, count=1)
+        elif "<Properties/>" in bloque:
+            bloque = bloque.replace("<Properties/>", _con_saltos(
+                texto, f"<Properties>\n{propiedades}{sangria}  </Properties>"), 1)
+        else:
+            bloque = _con_saltos(texto, f"{sangria}  <Properties>\n{propiedades}{sangria}  </Properties>\n") + bloque
+        rep.tree.agregar(rel, texto[:m.start(2)] + bloque + texto[m.end(2):])
+        cambios.append(rel)
+    return cambios
+
+
+# --- Etapa de corrección ---
+
+@dataclass
+class ResultadoAutofix:
+    proyecto: ProjectTree
+    observaciones: list[str]
+    puntaje: ResultadoRubricas | None
+    corregidas: list[str] = field(default_factory=list)  # ids de reglas que pasaron a cumplirse
+    archivos: list[str] = field(default_factory=list)  # rutas creadas o modificadas
+
+
+def corregir(proyecto: ProjectTree, contexto: UnifiedModel, rubrics_kind: str, rubrics_defs: list[dict],
+             observaciones: list[str], puntaje: ResultadoRubricas | None) -> ResultadoAutofix:
+    """
+    Aplica los fixers de las reglas fallidas que admiten corrección (`_claves_corregibles`) sobre una
+    copia del árbol (las entradas sin tocar se comparten y al empaquetar se copian sin recomprimir) y
+    re-evalúa solo las reglas afectadas. Si nada cambió devuelve el proyecto y el puntaje originales.
+    """
+    sin_cambios = ResultadoAutofix(proyecto, observaciones, puntaje)
+    if not AUTOFIX_ENABLED or puntaje is None:
+        return sin_cambios
+    pendientes = [r.regla for r in puntaje.fallidas if _claves_corregibles(r.regla)]
+    if not pendientes:
+        return sin_cambios
+    catalogo = obtener_catalogo(rubrics_kind)
+
+    with span("autofix", tipo=rubrics_kind, pendientes=len(pendientes)) as s:
+        tree = proyecto.copia()
+        rep = Reparacion(tree, contexto, catalogo.definiciones.get("scaffold_defaults") or {})
+        archivos, aplicados, afectadas = [], [], set()
+        for clave in dict.fromkeys(c for r in pendientes for c in _claves_corregibles(r)):
+            fixer = _FIXERS[clave]
+            try:
+                cambios = fixer.fn(rep)
+            except Exception as e:  # un fixer roto no debe tumbar la generación
+                print(f"Advertencia: La corrección automática de '{clave}' falló: {e}")
+                continue
+            if cambios:
+                archivos += cambios
+                aplicados.append(clave)
+                afectadas |= {clave, *fixer.afecta}
+        if not aplicados:
+            return sin_cambios
+
+        reglas = [r for r in catalogo.reglas if TODAS in afectadas or set(r.claves) & afectadas]
+        nuevo = reevaluar(tree, puntaje, reglas, dict(catalogo.pesos))
+        antes = {r.regla for r in puntaje.fallidas}
+        corregidas = [r.regla.id for r in nuevo.reglas if r.regla in antes and r.estado == "ok"]
+        s.atributos.update(archivos=len(archivos), reevaluadas=len(reglas), corregidas=len(corregidas))
+
+    tree.original = proyecto.original or proyecto
+    if proyecto.clave is not None:
+        tree.fijar_clave(clave_corregida(proyecto.clave, aplicados))
+    print(f"Autofix: {len(corregidas)} reglas corregidas, {len(archivos)} rutas creadas o modificadas")
+    return ResultadoAutofix(tree, observaciones_de(tree, rubrics_kind, rubrics_defs, nuevo), nuevo,
+                            corregidas, archivos)
@@ -0,0 +1,159 @@
+# batch_cli.py
+# Generación por lotes sin Streamlit: un directorio de ZIPs de diseño -> proyectos + reporte JSONL.
+#
+# Uso:
+#   python batch_cli.py disenos/ --out salida/ --llm-concurrency 4 --workers 4
+
+import argparse
+import html
+import json
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()  # antes de importar los servicios, que leen su configuración del entorno
+
+from constants import LLM_MODE
+from llm_service import inferir_contexto_unificado
+from models import UnifiedModel
+from pipeline import construir_y_analizar, leer_zip_diseno, resolver_capa
+from tracing import Traza
+
+
+def _etapa_contexto(spec_path: Path, layer_choice: str, modo: str) -> dict:
+    """Lectura del diseño + inferencia del contexto (limitada por E/S; corre en hilos)."""
+    registro = {"spec": spec_path.name, "status": "ok", "timings": {}}
+    with Traza("lote.contexto", spec=spec_path.name) as traza:
+        _inferir(registro, spec_path, layer_choice, modo)
+    registro["trace_ids"] = [traza.id]
+    return registro
+
+
+def _inferir(registro: dict, spec_path: Path, layer_choice: str, modo: str):
+    try:
+        t0 = time.perf_counter()
+        diseno = leer_zip_diseno(spec_path)
+        registro["timings"]["read"] = round(time.perf_counter() - t0, 4)
+        capa = resolver_capa(layer_choice, diseno.service_type)
+        registro.update(layer=capa, spec_member=diseno.inner_name, spec_kind=diseno.kind,
+                        spec_missing_refs=diseno.referencias_faltantes)
+
+        t0 = time.perf_counter()
+        contexto = inferir_contexto_unificado(diseno.ctx_text, capa, modo=modo)
+        registro["timings"]["context"] = round(time.perf_counter() - t0, 4)
+        if not contexto:
+            registro.update(status="error", error="El LLM no pudo generar un contexto válido.")
+            return
+
+        registro["context"] = contexto.model_dump()
+        registro["_spec_bytes"] = diseno.spec_bytes
+    except Exception as e:
+        registro.update(status="error", error=f"{type(e).__name__}: {e}")
+
+
+def _etapa_build(contexto_dict: dict, spec_bytes: bytes, spec_kind: str, out_dir: str) -> dict:
+    """Render + rúbricas + autofix + ZIP (limitada por CPU; corre en el pool de procesos)."""
+    contexto = UnifiedModel.model_validate(contexto_dict)
+    with Traza("lote.build", artifact_id=contexto.names.artifact_id) as traza:
+        t0 = time.perf_counter()
+        r = construir_y_analizar(contexto, spec_bytes, spec_kind)
+        proyecto, observaciones, puntaje = r.proyecto, r.observaciones, r.puntaje
+        t_build = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        output = Path(out_dir) / f"{contexto.names.artifact_id}.zip"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        proyecto.escribir_zip(output)
+        t_zip = time.perf_counter() - t0
+
+    return {
+        "trace_id": traza.id,
+        "output": str(output),
+        "files": len(proyecto),
+        "observations": [html.unescape(re.sub(r"<[^>]+>", "", o)).strip() for o in observaciones],
+        "rubric_score": puntaje.puntaje_total if puntaje else None,
+        "rubric_criteria": {c.id: c.puntaje for c in puntaje.criterios.values()} if puntaje else {},
+        "autofixed": r.corregidas,
+        "timings": {"build_and_rubrics": round(t_build, 4), "zip": round(t_zip, 4)},
+    }
+
+
+def ejecutar_lote(designs_dir: Path, out_dir: Path, report_path: Path, layer_choice: str = "Automático",
+                  llm_concurrency: int = 4, workers: int | None = None, modo: str = LLM_MODE) -> list[dict]:
+    """
+    Corre el pipeline para cada ZIP de `designs_dir`. Las inferencias de contexto corren en paralelo
+    (hasta `llm_concurrency`) y cada contexto listo pasa de inmediato al pool de procesos.
+    """
+    specs = sorted(Path(designs_dir).glob("*.zip"))
+    if not specs:
+        print(f"No se encontraron ZIPs de diseño en {designs_dir}.")
+        return []
+
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    registros = []
+    inicio = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=llm_concurrency) as llm_pool, \
+            ProcessPoolExecutor(max_workers=workers) as build_pool, \
+            open(report_path, "w", encoding="utf-8") as report:
+
+        def _emitir(registro: dict):
+            registro.pop("_spec_bytes", None)
+            registros.append(registro)
+            report.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            report.flush()
+            print(f"[{registro['status']}] {registro['spec']} -> {registro.get('output', registro.get('error', ''))}")
+
+        builds = {}
+        contextos = {llm_pool.submit(_etapa_contexto, spec, layer_choice, modo): spec for spec in specs}
+        for fut in as_completed(contextos):
+            registro = fut.result()
+            if registro["status"] != "ok":
+                _emitir(registro)
+                continue
+            spec_dir = Path(out_dir) / Path(registro["spec"]).stem
+            build = build_pool.submit(_etapa_build, registro["context"], registro["_spec_bytes"],
+                                      registro["spec_kind"], str(spec_dir))
+            builds[build] = registro
+
+        for fut in as_completed(builds):
+            registro = builds[fut]
+            try:
+                resultado = fut.result()
+                registro["timings"].update(resultado.pop("timings"))
+                registro["trace_ids"].append(resultado.pop("trace_id"))
+                registro.update(resultado)
+            except Exception as e:
+                registro.update(status="error", error=f"{type(e).__name__}: {e}")
+            _emitir(registro)
+
+    ok = sum(1 for r in registros if r["status"] == "ok")
+    print(f"Lote terminado: {ok}/{len(registros)} proyectos en {time.perf_counter() - inicio:.2f}s. Reporte: {report_path}")
+    return registros
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Genera proyectos en lote a partir de ZIPs de diseño.")
+    parser.add_argument("designs_dir", type=Path, help="Directorio con los ZIPs de diseño.")
+    parser.add_argument("--out", type=Path, default=Path("batch_output"), help="Directorio de salida.")
+    parser.add_argument("--report", type=Path, default=None, help="Reporte JSONL (por defecto <out>/report.jsonl).")
+    parser.add_argument("--layer", default="Automático",
+                        choices=["Automático", "Domain", "Business", "Proxy", "Reception"])
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="Inferencias de contexto simultáneas.")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para render/zip/rúbricas.")
+    parser.add_argument("--mode", default=LLM_MODE, choices=["auto", "llm", "local"],
+                        help="auto: LLM solo si faltan campos; llm: siempre; local: nunca.")
+    args = parser.parse_args(argv)
+
+    registros = ejecutar_lote(args.designs_dir, args.out, args.report or args.out / "report.jsonl",
+                              layer_choice=args.layer, llm_concurrency=args.llm_concurrency,
+                              workers=args.workers, modo=args.mode)
+    return 0 if registros and all(r["status"] == "ok" for r in registros) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+# bench_pipeline.py
+# Benchmarks del pipeline de generación sobre entradas sintéticas de tamaño creciente.
+#
+# Uso:
+#   python benchmarks/bench_pipeline.py                          # todos los casos y tamaños; compara con baseline.json
+#   python benchmarks/bench_pipeline.py --tamanos 20,200 --casos rubricas
+#   python benchmarks/bench_pipeline.py --guardar-baseline       # fija los resultados actuales como referencia
+#
+# Falla (código 1) si un caso se vuelve más lento o usa más memoria que en la baseline, o si su costo
+# por archivo crece con el tamaño (escalado superlineal) más que en la baseline o más de --max-escala.
+#
+# Cada (caso, tamaño) corre en un proceso nuevo: así el pico de RSS es el del caso y las caches en
+# memoria (registro de arquetipos, catálogos) empiezan frías. El LLM no participa: el contexto se arma
+# directamente y el proceso hijo corre con GENERATOR_LLM_MODE=local.
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import sinteticos  # noqa: E402  (junto a este script)
+
+DIR_BENCH = Path(__file__).resolve().parent
+TAMANOS = (20, 200, 1000, 3000)
+CASOS = ("render_directorio", "procesar_arquetipo", "extraccion_zip", "rubricas")
+
+
+# --- Casos (corren en el proceso hijo) ---
+
+def _contexto(tamano: int, nota: str = ""):
+    """Contexto fijo en lugar de la respuesta del LLM."""
+    from models import UnifiedModel
+    return UnifiedModel.model_validate({
+        "layer": "domain",
+        "names": {"project_name": f"Bench {tamano}", "artifact_id": f"bench-{tamano}", "api_name": f"bench-{tamano}"},
+        "paths": {"base_path": "/bench/v1", "base_uri": "https://api.bank.com/bench/v1"},
+        "security": {"auth": "oauth2"},
+        "notes": nota,
+    })
+
+
+def _contar_archivos(directorio: Path) -> int:
+    return sum(len(archivos) for _, _, archivos in os.walk(directorio))
+
+
+def _caso_render_directorio(datos: Path, tamano: int):
+    from project_generator import render_template_directory
+    src = datos / f"arquetipo-{tamano}"
+    salida = datos.parent / f"render-{tamano}"  # dentro del directorio de trabajo, que el padre borra
+
+    def medir(i: int):
+        render_template_directory(src, salida / str(i), _contexto(tamano))
+    return medir, _contar_archivos(src)
+
+
+def _caso_procesar_arquetipo(datos: Path, tamano: int):
+    from project_generator import procesar_arquetipo
+    zip_path = datos / f"arquetipo-{tamano}.zip"
+    spec = sinteticos.spec_oas(max(5, tamano // 10)).encode("utf-8")
+
+    def medir(i: int):
+        # Un contexto distinto por repetición: el store de artefactos no puede devolver el ZIP anterior.
+        procesar_arquetipo(str(zip_path), _contexto(tamano, nota=f"repeticion {i}"), spec, "OAS")
+    return medir, _contar_archivos(datos / f"arquetipo-{tamano}")
+
+
+def _caso_extraccion_zip(datos: Path, tamano: int):
+    from spec_loader import ZipIndex
+    zip_path = datos / f"diseno-{tamano}.zip"
+
+    def medir(i: int):
+        with ZipIndex(zip_path, cache_miembros=tamano + 2) as indice:
+            _, raiz, _ = indice.principal()
+            indice.resolver(raiz)
+    with ZipIndex(zip_path) as indice:
+        miembros = len(indice.miembros)
+    return medir, miembros
+
+
+def _caso_rubricas(datos: Path, tamano: int):
+    from project_generator import construir_proyecto
+    from rubrics_service import analizar_proyecto_con_rubricas, leer_rubricas
+    spec = sinteticos.spec_oas(max(5, tamano // 10)).encode("utf-8")
+    proyecto = construir_proyecto(str(datos / f"arquetipo-{tamano}.zip"), _contexto(tamano), spec, "OAS")
+    definiciones = leer_rubricas("mule")
+
+    def medir(i: int):
+        analizar_proyecto_con_rubricas(proyecto, "mule", definiciones)
+    return medir, len(proyecto)
+
+
+_PREPARAR = {
+    "render_directorio": _caso_render_directorio,
+    "procesar_arquetipo": _caso_procesar_arquetipo,
+    "extraccion_zip": _caso_extraccion_zip,
+    "rubricas": _caso_rubricas,
+}
+
+
+def _pico_rss_mb() -> float:
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes en macOS, KiB en Linux
+
+
+def ejecutar_caso(caso: str, tamano: int, datos: Path, repeticiones: int) -> dict:
+    """Corre un caso en este proceso; la primera repetición es en frío y la mediana usa todas."""
+    medir, archivos = _PREPARAR[caso](datos, tamano)
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        medir(i)
+        tiempos.append(time.perf_counter() - inicio)
+    mediana = statistics.median(tiempos)
+    return {
+        "caso": caso, "tamano": tamano, "archivos": archivos, "repeticiones": repeticiones,
+        "wall_s": round(mediana, 4), "wall_min_s": round(min(tiempos), 4), "frio_s": round(tiempos[0], 4),
+        "rss_mb": _pico_rss_mb(), "archivos_por_s": round(archivos / mediana, 1) if mediana else None,
+    }
+
+
+# --- Orquestación (proceso padre) ---
+
+def generar_datos(destino: Path, tamanos: list[int]):
+    for tamano in tamanos:
+        arquetipo = sinteticos.crear_arquetipo(destino / f"arquetipo-{tamano}", tamano, semilla=tamano)
+        sinteticos.comprimir(arquetipo, destino / f"arquetipo-{tamano}.zip", raiz=f"arquetipo-{tamano}")
+        sinteticos.crear_diseno_zip(destino / f"diseno-{tamano}.zip", tamano)
+
+
+def _en_subproceso(caso: str, tamano: int, datos: Path, repeticiones: int, cache_dir: Path) -> dict:
+    env = {**os.environ, "GENERATOR_CACHE_DIR": str(cache_dir), "GENERATOR_LLM_MODE": "local",
+           "GENERATOR_TRACE_FILE": "", "LLM_CACHE_DISABLED": "1"}
+    proceso = subprocess.run([sys.executable, __file__, "--interno", caso, str(tamano), str(datos), str(repeticiones)],
+                             capture_output=True, text=True, env=env, cwd=RAIZ)
+    if proceso.returncode != 0:
+        raise RuntimeError(f"El caso {caso}/{tamano} falló:\n{proceso.stderr[-2000:]}")
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def comparar(resultados: list[dict], baseline: dict, tol_tiempo: float, tol_rss: float,
+             minimo_s: float = 0.02) -> list[str]:
+    """
+    Regresiones respecto de la baseline: más lento que `tol_tiempo` o más memoria que `tol_rss`
+    (fracciones). Los casos que tardan menos de `minimo_s` no cuentan para el tiempo: son puro ruido.
+    """
+    previos = {(r["caso"], r["tamano"]): r for r in baseline.get("resultados", [])}
+    regresiones = []
+    for r in resultados:
+        base = previos.get((r["caso"], r["tamano"]))
+        if base is None:
+            r["delta_wall"] = r["delta_rss"] = None
+            continue
+        r["delta_wall"] = round(r["wall_s"] / base["wall_s"] - 1, 3) if base["wall_s"] else None
+        r["delta_rss"] = round(r["rss_mb"] / base["rss_mb"] - 1, 3) if base["rss_mb"] else None
+        if r["delta_wall"] is not None and r["delta_wall"] > tol_tiempo and r["wall_s"] >= minimo_s:
+            regresiones.append(f"{r['caso']}/{r['tamano']}: {base['wall_s']:.3f}s -> {r['wall_s']:.3f}s "
+                               f"({r['delta_wall']:+.0%})")
+        if r["delta_rss"] is not None and r["delta_rss"] > tol_rss:
+            regresiones.append(f"{r['caso']}/{r['tamano']}: {base['rss_mb']:.0f} MB -> {r['rss_mb']:.0f} MB "
+                               f"({r['delta_rss']:+.0%})")
+    return regresiones
+
+
+def _costo_por_archivo(resultados: list[dict], minimo_s: float) -> dict[str, dict[int, float]]:
+    """
+    Costo por archivo de cada tamaño relativo al del tamaño más chico medible del mismo caso.
+    1.0 es escalado lineal; 4.0 a 10x archivos ya huele a cuadrático.
+    """
+    por_caso: dict[str, list[dict]] = {}
+    for r in resultados:
+        if r["archivos"] and r["wall_s"] >= minimo_s:
+            por_caso.setdefault(r["caso"], []).append(r)
+    relativos = {}
+    for caso, filas in por_caso.items():
+        filas.sort(key=lambda r: r["tamano"])
+        referencia = filas[0]["wall_s"] / filas[0]["archivos"]
+        relativos[caso] = {r["tamano"]: round(r["wall_s"] / r["archivos"] / referencia, 3) for r in filas[1:]}
+    return relativos
+
+
+def comparar_escala(resultados: list[dict], baseline: dict, tol_escala: float, max_escala: float,
+                    minimo_s: float = 0.02) -> list[str]:
+    """
+    Regresiones de escalado: un caso cuyo costo por archivo crece con el tamaño más que en la baseline
+    (fracción `tol_escala`) o más que `max_escala` veces en absoluto. Atrapa lo superlineal aunque
+    los tiempos del tamaño chico sigan dentro de la tolerancia.
+    """
+    actuales = _costo_por_archivo(resultados, minimo_s)
+    previos = _costo_por_archivo(baseline.get("resultados", []), minimo_s)
+    regresiones = []
+    for caso, relativos in actuales.items():
+        for tamano, relativo in relativos.items():
+            base = previos.get(caso, {}).get(tamano)
+            if relativo > max_escala:
+                regresiones.append(f"{caso}/{tamano}: costo por archivo x{relativo:.1f} respecto del tamaño "
+                                   f"más chico (máximo x{max_escala:.1f})")
+            elif base is not None and relativo > base * (1 + tol_escala):
+                regresiones.append(f"{caso}/{tamano}: costo por archivo x{base:.1f} -> x{relativo:.1f} "
+                                   f"respecto del tamaño más chico")
+    return regresiones
+
+
+def _entorno() -> dict:
+    return {"python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count(),
+            "fecha": datetime.datetime.now().isoformat(timespec="seconds")}
+
+
+def _imprimir(resultados: list[dict]):
+    print(f"{'caso':<20} {'tamaño':>6} {'archivos':>8} {'wall s':>8} {'frío s':>8} {'RSS MB':>7} {'arch/s':>9} {'Δwall':>7}")
+    for r in resultados:
+        delta = f"{r['delta_wall']:+.0%}" if r.get("delta_wall") is not None else "-"
+        print(f"{r['caso']:<20} {r['tamano']:>6} {r['archivos']:>8} {r['wall_s']:>8.3f} {r['frio_s']:>8.3f} "
+              f"{r['rss_mb']:>7.1f} {r['archivos_por_s'] or 0:>9.0f} {delta:>7}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline con entradas sintéticas.")
+    parser.add_argument("--tamanos", default=",".join(map(str, TAMANOS)), help="Archivos por arquetipo, separados por coma.")
+    parser.add_argument("--casos", default=",".join(CASOS), help=f"Subconjunto de: {', '.join(CASOS)}.")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", type=Path, default=DIR_BENCH / "resultados.json",
+                        help="Resultados en JSON (ignorado por git).")
+    parser.add_argument("--baseline", type=Path, default=DIR_BENCH / "baseline.json")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Escribe los resultados como nueva baseline.")
+    parser.add_argument("--tolerancia-tiempo", type=float, default=0.25, help="Fracción de lentitud admitida.")
+    parser.add_argument("--tolerancia-rss", type=float, default=0.20, help="Fracción de memoria extra admitida.")
+    parser.add_argument("--tolerancia-escala", type=float, default=0.5,
+                        help="Fracción admitida de crecimiento del costo por archivo respecto de la baseline.")
+    parser.add_argument("--max-escala", type=float, default=3.0,
+                        help="Máximo costo por archivo relativo al tamaño más chico, con o sin baseline.")
+    parser.add_argument("--minimo-s", type=float, default=0.02,
+                        help="Por debajo de este tiempo (s) no se reportan regresiones de tiempo.")
+    parser.add_argument("--interno", nargs=4, metavar=("CASO", "TAMANO", "DATOS", "REPETICIONES"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.interno:
+        caso, tamano, datos, repeticiones = args.interno
+        print(json.dumps(ejecutar_caso(caso, int(tamano), Path(datos), int(repeticiones))))
+        return 0
+
+    tamanos = [int(t) for t in args.tamanos.split(",") if t]
+    casos = [c for c in args.casos.split(",") if c]
+    desconocidos = set(casos) - set(CASOS)
+    if desconocidos:
+        parser.error(f"Casos desconocidos: {', '.join(sorted(desconocidos))}")
+
+    trabajo = Path(tempfile.mkdtemp(prefix="bench-pipeline-"))
+    try:
+        inicio = time.perf_counter()
+        (trabajo / "datos").mkdir()
+        generar_datos(trabajo / "datos", tamanos)
+        print(f"Entradas sintéticas generadas en {time.perf_counter() - inicio:.1f}s ({trabajo / 'datos'}).")
+        resultados = []
+        for caso in casos:
+            for tamano in tamanos:
+                resultados.append(_en_subproceso(caso, tamano, trabajo / "datos", args.repeticiones,
+                                                 trabajo / f"cache-{caso}-{tamano}"))
+                print(f"  {caso}/{tamano}: {resultados[-1]['wall_s']:.3f}s")
+    finally:
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    baseline = {}
+    if args.baseline.exists() and not args.guardar_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regresiones = comparar(resultados, baseline, args.tolerancia_tiempo, args.tolerancia_rss, args.minimo_s)
+    regresiones += comparar_escala(resultados, baseline, args.tolerancia_escala, args.max_escala, args.minimo_s)
+    _imprimir(resultados)
+
+    salida = {"entorno": _entorno(), "resultados": resultados, "regresiones": regresiones}
+    args.salida.parent.mkdir(parents=True, exist_ok=True)
+    args.salida.write_text(json.dumps(salida, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.guardar_baseline:
+        args.baseline.write_text(json.dumps({"entorno": salida["entorno"], "resultados": resultados},
+                                            ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Baseline actualizada: {args.baseline}")
+    for r in regresiones:
+        print(f"⚠️ Regresión: {r}")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
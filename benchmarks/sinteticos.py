@@ -0,0 +1,163 @@
+# sinteticos.py
+# Entradas sintéticas para los benchmarks: especificaciones OAS/RAML, ZIPs de diseño y arquetipos
+# Mule de tamaño creciente (plantillas, flujos XML grandes, lockfiles como el del arquetipo reception).
+
+import json
+import random
+import zipfile
+from pathlib import Path
+
+_PLANTILLA_POM = """<?xml version="1.0" encoding="UTF-8"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <modelVersion>4.0.0</modelVersion>
+  <groupId>{{ names.group_id }}</groupId>
+  <artifactId>{{ names.artifact_id }}</artifactId>
+  <version>{{ names.version }}</version>
+  <name>{{ names.project_name }}</name>
+  <properties>
+    <app.runtime>4.4.0</app.runtime>
+    <mule.maven.plugin.version>3.8.0</mule.maven.plugin.version>
+  </properties>
+  <build><plugins><plugin>
+    <groupId>org.mule.tools.maven</groupId><artifactId>mule-maven-plugin</artifactId>
+    <version>${mule.maven.plugin.version}</version>
+  </plugin></plugins></build>
+</project>
+"""
+
+_PLANTILLA_PROPIEDADES = """# Entorno {entorno}
+http.basePath={{{{ paths.base_path }}}}
+api.name={{{{ names.api_name }}}}
+api.id=${{secure::api.id}}
+{{% if security.auth != "none" %}}security.auth={{{{ security.auth }}}}{{% endif %}}
+"""
+
+_GLOBAL_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<mule xmlns="http://www.mulesoft.org/schema/mule/core" xmlns:apikit="http://www.mulesoft.org/schema/mule/mule-apikit"
+      xmlns:api-gateway="http://www.mulesoft.org/schema/mule/api-gateway"
+      xmlns:secure-properties="http://www.mulesoft.org/schema/mule/secure-properties">
+  <apikit:config name="api-config" api="resource::api.raml" outboundHeadersMapName="outboundHeaders"/>
+  <secure-properties:config name="secure-props" file="config/${env}.yaml" key="${key}"/>
+  <api-gateway:autodiscovery apiId="${api.id}" flowRef="api-main"/>
+  <error-handler name="global-error-handler">
+    <on-error-propagate type="APIKIT:BAD_REQUEST"><logger message="400"/></on-error-propagate>
+    <on-error-propagate type="APIKIT:NOT_FOUND"><logger message="404"/></on-error-propagate>
+    <on-error-propagate type="ANY"><logger message="500"/></on-error-propagate>
+  </error-handler>
+</mule>
+"""
+
+
+def _flujo(nombre: str, pasos: int) -> str:
+    cuerpo = "".join(f'    <logger level="INFO" doc:name="paso-{i}" message="#[vars.correlationId] {nombre} {i}"/>\n'
+                     f'    <set-variable variableName="v{i}" value="#[payload.items[{i}]]"/>\n' for i in range(pasos))
+    return f'  <flow name="{nombre}">\n{cuerpo}  </flow>\n'
+
+
+def _xml_flujos(prefijo: str, flujos: int, pasos: int) -> str:
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n<mule xmlns="http://www.mulesoft.org/schema/mule/core" '
+            'xmlns:doc="http://www.mulesoft.org/schema/mule/documentation">\n'
+            + "".join(_flujo(f"{prefijo}-{i}", pasos) for i in range(flujos)) + "</mule>\n")
+
+
+def _lockfile(paquetes: int, rnd: random.Random) -> str:
+    deps = {f"node_modules/pkg-{i}": {"version": f"{rnd.randint(0, 9)}.{rnd.randint(0, 30)}.{rnd.randint(0, 99)}",
+                                      "resolved": f"https://registry.npmjs.org/pkg-{i}/-/pkg-{i}.tgz",
+                                      "integrity": "sha512-" + "".join(rnd.choices("abcdef0123456789", k=64))}
+            for i in range(paquetes)}
+    return json.dumps({"name": "arquetipo", "lockfileVersion": 3, "packages": deps}, indent=2)
+
+
+def crear_arquetipo(destino: Path, archivos: int, semilla: int = 0) -> Path:
+    """
+    Directorio con la estructura mínima de un proyecto Mule y ~`archivos` archivos: ~10% plantillas
+    Jinja, flujos XML (uno grande que crece con el tamaño), DataWeave, schemas y un lockfile.
+    """
+    rnd = random.Random(semilla)
+    destino = Path(destino)
+    base = destino / "src/main/mule"
+    for carpeta in ("client", "handler", "orchestrator", "common"):
+        (base / carpeta).mkdir(parents=True, exist_ok=True)
+    (destino / "src/main/resources/config").mkdir(parents=True, exist_ok=True)
+    (destino / "src/main/resources/dwl").mkdir(parents=True, exist_ok=True)
+    (destino / "src/main/resources/schemas").mkdir(parents=True, exist_ok=True)
+    (destino / "src/test/munit").mkdir(parents=True, exist_ok=True)
+
+    (destino / "pom.xml").write_text(_PLANTILLA_POM, encoding="utf-8")
+    (destino / "mule-artifact.json").write_text('{"minMuleVersion": "4.4.0"}', encoding="utf-8")
+    (base / "common/global-config.xml").write_text(_GLOBAL_XML, encoding="utf-8")
+    (base / "common/flujos-grandes.xml").write_text(_xml_flujos("grande", max(10, archivos // 2), 20), encoding="utf-8")
+    (destino / "package-lock.json").write_text(_lockfile(max(200, archivos * 2), rnd), encoding="utf-8")
+    creados = 5
+
+    i = 0
+    while creados < archivos:
+        tipo = i % 10
+        if tipo == 0:
+            (destino / f"src/main/resources/config/entorno-{i}.properties").write_text(
+                _PLANTILLA_PROPIEDADES.format(entorno=i), encoding="utf-8")
+        elif tipo in (1, 2, 3):
+            carpeta = ("client", "handler", "orchestrator")[tipo - 1]
+            (base / carpeta / f"op-{i}-{carpeta}.xml").write_text(_xml_flujos(f"op-{i}-{carpeta}", 2, 5), encoding="utf-8")
+        elif tipo in (4, 5, 6):
+            (destino / f"src/main/resources/dwl/op-{i}.dwl").write_text(
+                "%dw 2.0\noutput application/json\n---\n{ id: payload.id, valor: payload.items map $.v }\n",
+                encoding="utf-8")
+        elif tipo in (7, 8):
+            esquema = {"type": "object", "properties": {f"campo{k}": {"type": "string"} for k in range(20)}}
+            (destino / f"src/main/resources/schemas/schema-{i}.json").write_text(json.dumps(esquema), encoding="utf-8")
+        else:
+            (destino / f"src/test/munit/op-{i}-test-suite.xml").write_text(_xml_flujos(f"test-{i}", 1, 3),
+                                                                           encoding="utf-8")
+        creados += 1
+        i += 1
+    return destino
+
+
+def comprimir(directorio: Path, zip_path: Path, raiz: str | None = None) -> Path:
+    """ZIP con el contenido de `directorio` bajo una carpeta raíz (como los arquetipos empaquetados)."""
+    directorio, zip_path = Path(directorio), Path(zip_path)
+    raiz = raiz or directorio.name
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+        for p in sorted(directorio.rglob("*")):
+            arcname = f"{raiz}/{p.relative_to(directorio).as_posix()}"
+            if p.is_dir():
+                z.writestr(arcname + "/", b"")
+            else:
+                z.write(p, arcname)
+    return zip_path
+
+
+def spec_oas(rutas: int) -> str:
+    lineas = ["openapi: 3.0.1", "info:", "  title: Benchmark API", "  version: 1.0.0",
+              "servers:", "  - url: https://api.bank.com/bench/v1", "paths:"]
+    for i in range(rutas):
+        lineas += [f"  /recursos-{i}/{{id}}:", "    get:", f"      operationId: getRecurso{i}",
+                   f"      summary: Obtiene el recurso {i}", "      parameters:",
+                   "        - {name: id, in: path, required: true, schema: {type: string}}",
+                   "      responses:", "        '200':", "          description: OK",
+                   "          content:", "            application/json:",
+                   "              example: {id: '1', nombre: ejemplo, items: [1, 2, 3]}",
+                   "        '404': {description: No encontrado}"]
+    return "\n".join(lineas) + "\n"
+
+
+def spec_raml(recursos: int) -> str:
+    lineas = ["#%RAML 1.0", "title: Benchmark API", "version: v1", "baseUri: https://api.bank.com/bench/v1",
+              "uses:", "  lib: libs/tipos.raml"]
+    for i in range(recursos):
+        lineas += [f"/recursos-{i}:", "  get:", f"    displayName: getRecurso{i}", "    responses:",
+                   "      200:", "        body:", "          application/json:",
+                   f"            example: !include ejemplos/recurso-{i}.json"]
+    return "\n".join(lineas) + "\n"
+
+
+def crear_diseno_zip(zip_path: Path, recursos: int) -> Path:
+    """ZIP de diseño RAML con una librería y un ejemplo incluido por recurso (`recursos + 2` miembros)."""
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("bench-dom-design/api.raml", spec_raml(recursos))
+        z.writestr("bench-dom-design/libs/tipos.raml", "#%RAML 1.0 Library\ntypes:\n  Recurso: {type: object}\n")
+        for i in range(recursos):
+            z.writestr(f"bench-dom-design/ejemplos/recurso-{i}.json",
+                       json.dumps({"id": str(i), "nombre": f"recurso {i}", "items": list(range(10))}))
+    return zip_path
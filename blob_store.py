@@ -0,0 +1,199 @@
+# blob_store.py
+# Blobs locales direccionados por contenido (sha256): la sesión de Streamlit guarda solo el hash del
+# diseño subido y de su spec raíz, y los bytes viven en disco, compartidos entre sesiones si son iguales.
+
+import hashlib
+import mmap
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from constants import BLOB_CHUNK_BYTES, BLOB_STORE_DIR, BLOB_STORE_MAX_BYTES, BLOB_TTL_SECONDS
+
+# Temporales huérfanos (p. ej. de un proceso que murió a mitad de escritura) más viejos que esto se borran.
+_TMP_MAX_EDAD_SECONDS = 3600
+
+
+class BlobStore:
+    """
+    Un archivo por blob (`<aa>/<sha256>`), escrito con temporal + rename. Los propietarios (sesiones)
+    retienen los hashes que usan; un blob sin propietarios vivos se borra cuando pasa `ttl_seconds`
+    sin uso o, si el directorio excede `max_bytes`, empezando por el menos usado (mtime). Un
+    propietario que no renueva su retención en `ttl_seconds` (la pestaña se cerró) deja de contar.
+    """
+
+    def __init__(self, directorio: Path = BLOB_STORE_DIR, max_bytes: int = BLOB_STORE_MAX_BYTES,
+                 ttl_seconds: float = BLOB_TTL_SECONDS):
+        self.directorio = Path(directorio)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.escritos = 0
+        self.compartidos = 0  # guardados que ya existían (mismo contenido subido por otra sesión)
+        self.recolectados = 0
+        self._lock = threading.Lock()
+        self._retenidos: dict[str, tuple[set[str], float]] = {}  # propietario -> (hashes, última renovación)
+
+    def ruta(self, digest: str) -> Path:
+        return self.directorio / digest[:2] / digest
+
+    def existe(self, digest: str) -> bool:
+        return self.ruta(digest).is_file()
+
+    # --- Escritura ---
+
+    def guardar(self, datos: bytes) -> str:
+        digest = hashlib.sha256(datos).hexdigest()
+        if self._tocar(digest):
+            return digest
+        return self._publicar(digest, lambda f: f.write(datos))
+
+    def guardar_archivo(self, origen: BinaryIO, tam_trozo: int = BLOB_CHUNK_BYTES) -> str:
+        """Copia `origen` por trozos calculando el hash al vuelo (nunca lo tiene entero en memoria)."""
+        h = hashlib.sha256()
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        tmp = self.directorio / f".{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                while trozo := origen.read(tam_trozo):
+                    h.update(trozo)
+                    f.write(trozo)
+            digest = h.hexdigest()
+            if self._tocar(digest):
+                return digest
+            destino = self.ruta(digest)
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, destino)
+        finally:
+            tmp.unlink(missing_ok=True)
+        with self._lock:
+            self.escritos += 1
+        self.recolectar(conservar=digest)
+        return digest
+
+    def _publicar(self, digest: str, escribir) -> str:
+        destino = self.ruta(digest)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.directorio / f".{digest}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                escribir(f)
+            os.replace(tmp, destino)
+        finally:
+            tmp.unlink(missing_ok=True)
+        with self._lock:
+            self.escritos += 1
+        self.recolectar(conservar=digest)
+        return digest
+
+    def _tocar(self, digest: str) -> bool:
+        """Si el blob ya existe lo marca como usado (LRU) y cuenta como compartido."""
+        try:
+            os.utime(self.ruta(digest))
+        except OSError:
+            return False
+        with self._lock:
+            self.compartidos += 1
+        return True
+
+    # --- Lectura ---
+
+    def abrir(self, digest: str) -> BinaryIO:
+        """Archivo abierto para leer por trozos (p. ej. `data` de `st.download_button`)."""
+        return open(self.ruta(digest), "rb")
+
+    def leer(self, digest: str) -> bytes:
+        return self.ruta(digest).read_bytes()
+
+    def leer_texto(self, digest: str, encoding: str = "utf-8") -> str:
+        return self.ruta(digest).read_bytes().decode(encoding, "ignore")
+
+    @contextmanager
+    def mapear(self, digest: str) -> Iterator[mmap.mmap | bytes]:
+        """Vista de solo lectura mapeada en memoria: las páginas las trae el SO a medida que se leen."""
+        with open(self.ruta(digest), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:  # mmap no admite archivos vacíos
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                yield m
+
+    def trozos(self, digest: str, tam_trozo: int = BLOB_CHUNK_BYTES) -> Iterator[bytes]:
+        with self.abrir(digest) as f:
+            while trozo := f.read(tam_trozo):
+                yield trozo
+
+    # --- Referencias y recolección ---
+
+    def retener(self, propietario: str, *digests: str):
+        """Fija los hashes que usa `propietario` (reemplaza los anteriores) y renueva su vigencia."""
+        with self._lock:
+            self._retenidos[propietario] = ({d for d in digests if d}, time.time())
+
+    def soltar(self, propietario: str):
+        with self._lock:
+            self._retenidos.pop(propietario, None)
+
+    def _vivos(self) -> set[str]:
+        """Hashes retenidos por propietarios vigentes; los vencidos se olvidan."""
+        limite = time.time() - self.ttl_seconds
+        with self._lock:
+            for propietario in [p for p, (_, visto) in self._retenidos.items() if visto < limite]:
+                del self._retenidos[propietario]
+            return set().union(*(hashes for hashes, _ in self._retenidos.values()))
+
+    def recolectar(self, conservar: str | None = None) -> int:
+        """Borra temporales huérfanos y blobs sin referencias vencidos por TTL o que exceden el tamaño."""
+        if not self.directorio.is_dir():
+            return 0
+        vivos = self._vivos()
+        if conservar:
+            vivos.add(conservar)
+        ahora = time.time()
+        candidatos, total_bytes = [], 0
+        for carpeta in self.directorio.iterdir():
+            try:
+                if carpeta.is_file():
+                    if carpeta.suffix == ".tmp" and ahora - carpeta.stat().st_mtime > _TMP_MAX_EDAD_SECONDS:
+                        carpeta.unlink(missing_ok=True)
+                    continue
+                for ruta in carpeta.iterdir():
+                    st = ruta.stat()
+                    total_bytes += st.st_size
+                    if ruta.name not in vivos:
+                        candidatos.append((st.st_mtime, st.st_size, ruta))
+            except OSError:
+                continue
+
+        candidatos.sort()  # menos usados primero
+        eliminados = 0
+        for mtime, size, ruta in candidatos:
+            if ahora - mtime <= self.ttl_seconds and total_bytes <= self.max_bytes:
+                break  # los siguientes son más recientes
+            ruta.unlink(missing_ok=True)
+            total_bytes -= size
+            eliminados += 1
+        if eliminados:
+            with self._lock:
+                self.recolectados += eliminados
+        return eliminados
+
+    def limpiar(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {"escritos": self.escritos, "compartidos": self.compartidos,
+                    "recolectados": self.recolectados, "propietarios": len(self._retenidos)}
+
+
+_store = BlobStore()
+
+
+def obtener_blobs() -> BlobStore:
+    """Almacén de blobs compartido por todo el proceso."""
+    return _store
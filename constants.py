@@ -1,20 +1,30 @@
+import os
+import tempfile
+from pathlib import Path
+
 # --- Claves de Streamlit Session State ---
 S_MESSAGES = "messages"
-S_UPLOADED_SPEC = "uploaded_spec"
+S_UPLOADED_SPEC = "uploaded_spec"  # hash del ZIP de diseño en el blob store
 S_GENERATED_ZIP = "generated_zip"
 S_OBSERVACIONES = "observaciones"
 S_SERVICE_TYPE = "service_type"
 S_SPEC_NAME = "spec_name"
 S_SPEC_KIND = "spec_kind"
-S_IS_GENERATING = "is_generating"
-S_PENDING_ACTION = "pending_action"
+S_SESSION_ID = "session_id"
+S_JOB_ID = "job_id"
 S_ARCHETYPE_CHOICE = "archetype_choice"
 S_RUBRICS_DEFS = "rubrics_defs"
 S_RUBRICS_KIND = "rubrics_kind"
-S_CTX_TEXT = "ctx_text"
+S_CTX_BLOB = "ctx_blob"  # hash de la spec raíz extraída
 S_EXTRACTED_KIND = "extracted_kind"
 S_EXTRACTED_NAME = "extracted_name"
-S_EXTRACTED_BYTES = "extracted_bytes"
+S_PROJECT_TREE = "project_tree"
+S_GENERATED_CONTEXT = "generated_context"
+S_RUBRICS_SCORE = "rubrics_score"
+S_TRACE = "trace"
+S_SPECULATION = "speculation"
+S_LAYERS_CHOICE = "layers_choice"
+S_MULTI_RESULT = "multi_result"
 
 
 # --- Tipos de Servicio ---
@@ -25,11 +35,97 @@ TYPE_LABELS = {
     "PROXY": "PROXY",
     "UNKNOWN": "UNKNOWN"
 }
+LAYER_BY_SERVICE_TYPE = {"REC": "Reception", "DOM": "Domain", "BUS": "Business", "PROXY": "Proxy"}
+LAYERS = ("Domain", "Business", "Proxy", "Reception")  # las que se pueden pedir juntas en modo multicapa
 
 # --- Extensiones de Archivo ---
 TEXT_EXTS = {".xml",".json",".yaml",".yml",".raml",".properties",".txt",".pom",".md",".js",".gradle",".groovy"}
 INVALID_WIN_CHARS = r'[:*?"<>|\\/]'
 
+# --- Arquetipos empaquetados (se procesan en streaming si no existe el directorio) ---
+BASE_DIR = Path(__file__).resolve().parent
+ARCHETYPES_DIR = BASE_DIR / "archetypes"
+ARCHETYPE_ZIPS = {
+    "generic-mule": "arquetipo-mulesoft.zip",
+    "reception": "arquetipo-reception.zip",
+}
+
+# --- Manifiesto de arquetipos ---
+# Un archivo es plantilla solo si su extensión es de texto y contiene marcadores de Jinja2.
+TEMPLATE_MARKERS = (b"{{", b"{%", b"{#")
+# Nombres (de carpeta o archivo, admite comodines) que nunca pasan al proyecto generado.
+ARCHETYPE_EXCLUDE = (".git", ".idea", ".vscode", ".DS_Store", "Thumbs.db", "__MACOSX", "*.iml")
+# Rutas relativas (comodines estilo fnmatch) que se incluyen aunque coincidan con una exclusión.
+ARCHETYPE_INCLUDE = ()
+RUBRIC_WORKERS = int(os.getenv("GENERATOR_RUBRIC_WORKERS", "4"))
+# Correcciones automáticas (autofix.py) sobre el proyecto ya generado para las reglas fallidas que las admiten.
+AUTOFIX_ENABLED = os.getenv("GENERATOR_AUTOFIX", "1") != "0"
+# XML más grandes que esto se resumen en streaming (iterparse) sin conservar el árbol completo.
+XML_STREAMING_BYTES = 256 * 1024
+
+# --- Modos de inferencia del contexto ---
+# auto: extractor local y LLM solo si faltan campos requeridos; llm: siempre LLM; local: nunca LLM.
+LLM_MODE_AUTO = "auto"
+LLM_MODE_ALWAYS = "llm"
+LLM_MODE_LOCAL = "local"
+LLM_MODE = os.getenv("GENERATOR_LLM_MODE", LLM_MODE_AUTO).lower()
+
+# --- Cliente LLM (timeouts, reintentos y límites de concurrencia) ---
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "120"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_BACKOFF_BASE_SECONDS = 0.5
+LLM_BACKOFF_MAX_SECONDS = 20.0
+# Tokens máximos de la especificación dentro del prompt (se condensa si los supera).
+SPEC_TOKEN_BUDGET = int(os.getenv("GENERATOR_SPEC_TOKEN_BUDGET", "4000"))
+# Salida estructurada (JSON con el esquema de UnifiedModel); "0" vuelve al YAML libre para
+# proveedores compatibles con OpenAI que no admiten `response_format` con json_schema.
+LLM_STRUCTURED_OUTPUT = os.getenv("GENERATOR_LLM_STRUCTURED", "1").lower() not in ("0", "false", "no")
+# Reparación: rondas que piden solo los campos inválidos y caracteres de la spec que se reenvían.
+LLM_REPAIR_ATTEMPTS = int(os.getenv("GENERATOR_LLM_REPAIR_ATTEMPTS", "1"))
+LLM_REPAIR_SPEC_CHARS = 2000
+
+# --- Trabajos en segundo plano (generaciones) ---
+JOB_WORKERS = int(os.getenv("GENERATOR_JOB_WORKERS", "4"))
+JOB_MAX_PER_OWNER = int(os.getenv("GENERATOR_JOB_MAX_PER_OWNER", "1"))
+JOB_DB_PATH = os.getenv("GENERATOR_JOB_DB") or None  # SQLite opcional para conservar el estado de los trabajos
+JOB_RETENTION_SECONDS = 3600
+JOB_POLL_SECONDS = 1.0
+# Inferencia especulativa del contexto al subir el diseño (speculation.py); "0" la desactiva.
+SPECULATION_ENABLED = os.getenv("GENERATOR_SPECULATION", "1").lower() not in ("0", "false", "no")
+
+# --- ZIPs de diseño: tope por miembro leído y bytes que se miran para detectar la spec raíz ---
+DESIGN_MEMBER_MAX_BYTES = int(os.getenv("GENERATOR_DESIGN_MEMBER_MAX_BYTES", str(20 * 1024 * 1024)))
+DESIGN_SNIFF_BYTES = 4096
+
+# --- Arranque: presupuesto de importación en frío por módulo de arranque (ver startup_report.py) ---
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv("GENERATOR_STARTUP_IMPORT_BUDGET_MS", "150"))
+
+# --- Caches persistentes ---
+CACHE_ROOT = Path(os.getenv("GENERATOR_CACHE_DIR") or Path(tempfile.gettempdir()) / "project_generator")
+JINJA_BYTECODE_DIR = CACHE_ROOT / "jinja_bytecode"
+ARCHETYPE_MANIFEST_DIR = CACHE_ROOT / "manifests"
+LLM_CACHE_DIR = CACHE_ROOT / "llm_context"
+LLM_CACHE_MAX_ENTRIES = 500
+LLM_CACHE_MAX_BYTES = 50 * 1024 * 1024
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+ARTIFACT_STORE_DIR = CACHE_ROOT / "artifacts"
+ARTIFACT_STORE_MAX_ENTRIES = 200
+ARTIFACT_STORE_MAX_BYTES = 500 * 1024 * 1024
+# Diseños subidos y specs extraídas (blob_store.py): las sesiones guardan solo el hash.
+BLOB_STORE_DIR = CACHE_ROOT / "blobs"
+BLOB_STORE_MAX_BYTES = int(os.getenv("GENERATOR_BLOB_MAX_BYTES", str(1024 * 1024 * 1024)))
+BLOB_TTL_SECONDS = float(os.getenv("GENERATOR_BLOB_TTL_SECONDS", str(6 * 3600)))
+BLOB_CHUNK_BYTES = 1024 * 1024
+
+# --- Trazas por etapa (tracing.py): JSONL local; GENERATOR_TRACE_FILE="" las desactiva ---
+_TRACE_FILE = os.getenv("GENERATOR_TRACE_FILE")
+TRACE_PATH = (Path(_TRACE_FILE) if _TRACE_FILE else None) if _TRACE_FILE is not None else CACHE_ROOT / "traces.jsonl"
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+TRACE_WINDOW = 500  # duraciones por etapa que se conservan para p50/p95
+
 # --- Avatares para el Chat ---
 ASSISTANT_AVATAR = "https://cdn-icons-png.flaticon.com/512/4712/4712109.png"
 USER_AVATAR = "https://cdn-icons-png.flaticon.com/512/1077/1077012.png"
\ No newline at end of file
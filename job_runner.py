@@ -0,0 +1,308 @@
+# job_runner.py
+# Cola local de trabajos: pool de hilos con reparto justo entre sesiones, progreso por etapa
+# y persistencia opcional en SQLite.
+
+import json
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from constants import JOB_DB_PATH, JOB_MAX_PER_OWNER, JOB_RETENTION_SECONDS, JOB_WORKERS
+
+PENDIENTE = "pendiente"
+EJECUTANDO = "ejecutando"
+OK = "ok"
+ERROR = "error"
+CANCELADO = "cancelado"
+INTERRUMPIDO = "interrumpido"  # estaba en curso cuando el proceso anterior terminó
+FINALES = (OK, ERROR, CANCELADO, INTERRUMPIDO)
+
+
+class JobCanceladoError(Exception):
+    """Se pidió cancelar el trabajo; la función lo lanza en el siguiente punto de control."""
+
+
+@dataclass
+class Job:
+    id: str
+    propietario: str
+    tipo: str
+    etapas: list[str]
+    estado: str = PENDIENTE
+    etapa: Optional[str] = None
+    tiempos: dict[str, float] = field(default_factory=dict)
+    eventos: list[tuple[str, Any]] = field(default_factory=list)
+    resultado: Any = None
+    error: Optional[str] = None
+    creado: float = field(default_factory=time.time)
+    iniciado: Optional[float] = None
+    terminado: Optional[float] = None
+    cancelacion_pedida: bool = False
+    # Solo en memoria: la función a ejecutar y sus argumentos.
+    _fn: Optional[Callable] = field(default=None, repr=False)
+    _args: tuple = field(default=(), repr=False)
+    _kwargs: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def activo(self) -> bool:
+        return self.estado in (PENDIENTE, EJECUTANDO)
+
+    @property
+    def progreso(self) -> float:
+        """Fracción de etapas completadas (la etapa en curso cuenta como media)."""
+        if self.estado == OK or not self.etapas:
+            return 1.0 if self.estado == OK else 0.0
+        hechas = sum(1 for e in self.etapas if e in self.tiempos)
+        en_curso = 0.5 if self.etapa and self.etapa not in self.tiempos else 0.0
+        return min(1.0, (hechas + en_curso) / len(self.etapas))
+
+
+class ReporteJob:
+    """Lo que recibe la función del trabajo para informar etapas y eventos (y enterarse de la cancelación)."""
+
+    def __init__(self, runner: "JobRunner", job: Job):
+        self._runner = runner
+        self._job = job
+        self._inicio_etapa: Optional[float] = None
+
+    def etapa(self, nombre: str):
+        self.verificar_cancelacion()
+        ahora = time.perf_counter()
+        with self._runner._lock:
+            if self._job.etapa is not None and self._inicio_etapa is not None:
+                self._job.tiempos[self._job.etapa] = round(ahora - self._inicio_etapa, 4)
+            self._job.etapa = nombre
+        self._inicio_etapa = ahora
+        self._runner._persistir(self._job)
+
+    def evento(self, nombre: str, valor: Any = None):
+        with self._runner._lock:
+            self._job.eventos.append((nombre, valor))
+
+    def verificar_cancelacion(self):
+        if self._job.cancelacion_pedida:
+            raise JobCanceladoError(self._job.id)
+
+    def _cerrar_etapa(self):
+        if self._job.etapa is not None and self._inicio_etapa is not None:
+            self._job.tiempos[self._job.etapa] = round(time.perf_counter() - self._inicio_etapa, 4)
+
+
+class _Persistencia:
+    """Estado de los trabajos en SQLite (sin resultados: esos viven en memoria)."""
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, propietario TEXT, tipo TEXT, estado TEXT, etapa TEXT,
+                etapas TEXT, tiempos TEXT, error TEXT, creado REAL, iniciado REAL, terminado REAL)""")
+
+    def guardar(self, job: Job):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                (job.id, job.propietario, job.tipo, job.estado, job.etapa, json.dumps(job.etapas),
+                 json.dumps(job.tiempos), job.error, job.creado, job.iniciado, job.terminado))
+
+    def marcar_interrumpidos(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("UPDATE jobs SET estado=?, terminado=? WHERE estado IN (?, ?)",
+                                     (INTERRUMPIDO, time.time(), PENDIENTE, EJECUTANDO))
+            return cur.rowcount
+
+    def cargar(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            fila = self._conn.execute("SELECT id, propietario, tipo, estado, etapa, etapas, tiempos, error, creado, "
+                                      "iniciado, terminado FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if fila is None:
+            return None
+        return Job(id=fila[0], propietario=fila[1], tipo=fila[2], estado=fila[3], etapa=fila[4],
+                   etapas=json.loads(fila[5]), tiempos=json.loads(fila[6]), error=fila[7],
+                   creado=fila[8], iniciado=fila[9], terminado=fila[10])
+
+    def purgar(self, antes_de: float):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE terminado IS NOT NULL AND terminado < ?", (antes_de,))
+
+
+class JobRunner:
+    """
+    Pool de `max_workers` hilos. Cada propietario (sesión de Streamlit, lote...) tiene su propia
+    cola FIFO y los turnos se reparten entre propietarios, así una sesión que encola muchos trabajos
+    no acapara el pool; además ningún propietario ejecuta más de `max_por_propietario` a la vez.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_por_propietario: int = JOB_MAX_PER_OWNER,
+                 db_path: Optional[str] = JOB_DB_PATH, retencion: float = JOB_RETENTION_SECONDS):
+        self.max_workers = max(1, max_workers)
+        self.max_por_propietario = max(1, max_por_propietario)
+        self.retencion = retencion
+        self._jobs: dict[str, Job] = {}
+        self._colas: dict[str, deque[Job]] = {}
+        self._turnos: dict[str, int] = {}  # propietario -> número del último turno recibido
+        self._ultimo_turno = 0
+        self._en_curso: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hay_trabajo = threading.Condition(self._lock)
+        self._termino = threading.Condition(self._lock)
+        self._hilos: list[threading.Thread] = []
+        self._db = _Persistencia(Path(db_path)) if db_path else None
+        if self._db is not None:
+            interrumpidos = self._db.marcar_interrumpidos()
+            if interrumpidos:
+                print(f"Info: {interrumpidos} trabajos quedaron interrumpidos por un reinicio.")
+
+    # --- API ---
+
+    def enviar(self, propietario: str, tipo: str, fn: Callable, *args, etapas: tuple[str, ...] = (),
+               **kwargs) -> str:
+        """Encola `fn(reporte, *args, **kwargs)` y devuelve el id del trabajo."""
+        job = Job(id=uuid.uuid4().hex, propietario=propietario, tipo=tipo, etapas=list(etapas),
+                  _fn=fn, _args=args, _kwargs=kwargs)
+        with self._lock:
+            self._purgar()
+            self._jobs[job.id] = job
+            self._colas.setdefault(propietario, deque()).append(job)
+            self._asegurar_hilos()
+            self._hay_trabajo.notify()
+        self._persistir(job)
+        return job.id
+
+    def obtener(self, job_id: str) -> Optional[Job]:
+        """Trabajo en memoria o, si el proceso se reinició, su último estado persistido."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self._db is not None:
+            return self._db.cargar(job_id)
+        return job
+
+    def esperar(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """Espera (hasta `timeout` segundos) a que el trabajo termine y lo devuelve, terminado o no."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            job = self._jobs.get(job_id)
+            while job is not None and job.activo:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    break
+                self._termino.wait(restante)
+        return job
+
+    def trabajos_de(self, propietario: str) -> list[Job]:
+        with self._lock:
+            return sorted((j for j in self._jobs.values() if j.propietario == propietario), key=lambda j: j.creado)
+
+    def cancelar(self, job_id: str) -> bool:
+        """Un trabajo pendiente se descarta; uno en curso se detiene en su próximo cambio de etapa."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.activo:
+                return False
+            job.cancelacion_pedida = True
+            if job.estado == PENDIENTE:
+                self._colas[job.propietario].remove(job)
+                job.estado, job.terminado = CANCELADO, time.time()
+                self._termino.notify_all()
+        self._persistir(job)
+        return True
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {"pendientes": sum(len(c) for c in self._colas.values()),
+                    "en_curso": sum(self._en_curso.values()), "hilos": len(self._hilos)}
+
+    # --- Planificación ---
+
+    def _asegurar_hilos(self):
+        if len(self._hilos) < self.max_workers:
+            hilo = threading.Thread(target=self._trabajar, name=f"job-worker-{len(self._hilos)}", daemon=True)
+            self._hilos.append(hilo)
+            hilo.start()
+
+    def _siguiente(self) -> Optional[Job]:
+        """
+        Entre los propietarios con trabajo y cupo libre, el que hace más tiempo que no recibe un turno
+        (uno que nunca lo recibió va primero); a igualdad, el que llegó antes.
+        """
+        elegibles = [p for p, cola in self._colas.items()
+                     if cola and self._en_curso.get(p, 0) < self.max_por_propietario]
+        if not elegibles:
+            return None
+        propietario = min(elegibles, key=lambda p: self._turnos.get(p, 0))
+        self._ultimo_turno += 1
+        self._turnos[propietario] = self._ultimo_turno
+        return self._colas[propietario].popleft()
+
+    def _trabajar(self):
+        while True:
+            with self._lock:
+                job = self._siguiente()
+                while job is None:
+                    self._hay_trabajo.wait()
+                    job = self._siguiente()
+                self._en_curso[job.propietario] = self._en_curso.get(job.propietario, 0) + 1
+                job.estado, job.iniciado = EJECUTANDO, time.time()
+            self._persistir(job)
+            self._ejecutar(job)
+            with self._lock:
+                self._en_curso[job.propietario] -= 1
+                self._hay_trabajo.notify_all()  # puede haberse liberado cupo para ese propietario
+
+    def _ejecutar(self, job: Job):
+        reporte = ReporteJob(self, job)
+        try:
+            resultado = job._fn(reporte, *job._args, **job._kwargs)
+            estado, error = OK, None
+        except JobCanceladoError:
+            resultado, estado, error = None, CANCELADO, None
+        except Exception as e:
+            print(f"Error en el trabajo {job.id} ({job.tipo}, etapa {job.etapa}): {e}\n{traceback.format_exc()}")
+            resultado, estado, error = None, ERROR, f"{type(e).__name__}: {e}"
+        with self._lock:
+            reporte._cerrar_etapa()
+            job.resultado, job.estado, job.error, job.terminado = resultado, estado, error, time.time()
+            job._fn, job._args, job._kwargs = None, (), {}
+            self._termino.notify_all()
+        self._persistir(job)
+
+    def _purgar(self):
+        """Olvida los trabajos terminados hace más de `retencion` segundos (se llama con el lock tomado)."""
+        limite = time.time() - self.retencion
+        for job_id in [j.id for j in self._jobs.values() if j.terminado and j.terminado < limite]:
+            del self._jobs[job_id]
+        for propietario in [p for p, c in self._colas.items() if not c and not self._en_curso.get(p)]:
+            del self._colas[propietario]
+            self._turnos.pop(propietario, None)
+        if self._db is not None:
+            self._db.purgar(limite)
+
+    def _persistir(self, job: Job):
+        if self._db is not None:
+            try:
+                self._db.guardar(job)
+            except sqlite3.Error as e:
+                print(f"Advertencia: No se pudo persistir el trabajo {job.id}: {e}")
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def obtener_runner() -> JobRunner:
+    """Runner compartido por todas las sesiones del proceso."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
@@ -0,0 +1,129 @@
+# llm_cache.py
+# Cache en disco de contextos `UnifiedModel` ya validados, para no repetir llamadas al LLM.
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from constants import LLM_CACHE_DIR, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS
+
+if TYPE_CHECKING:  # pydantic se importa recién al leer una entrada: la app muestra las estadísticas sin cargarlo
+    from models import UnifiedModel
+
+
+def clave_contexto(contenido_api: str, layer: str, prompt_version: str, model: str, temperature: float) -> str:
+    """Clave de cache: hash de la especificación + capa + versión del prompt + modelo + temperatura."""
+    spec_hash = hashlib.sha256(contenido_api.encode("utf-8")).hexdigest()
+    partes = json.dumps([spec_hash, layer, prompt_version, model, temperature])
+    return hashlib.sha256(partes.encode("utf-8")).hexdigest()
+
+
+class LLMContextCache:
+    """
+    Un archivo JSON por entrada. El mtime del archivo marca el último uso (LRU) y el
+    campo `created` controla el TTL. Se puede desactivar con `habilitada=False` o con
+    la variable de entorno LLM_CACHE_DISABLED=1.
+    """
+
+    def __init__(self, directorio: Path = LLM_CACHE_DIR, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES, ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+                 habilitada: bool | None = None):
+        self.directorio = Path(directorio)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        if habilitada is None:
+            habilitada = os.getenv("LLM_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+        self.habilitada = habilitada
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _ruta(self, clave: str) -> Path:
+        return self.directorio / f"{clave}.json"
+
+    def obtener(self, clave: str) -> Optional["UnifiedModel"]:
+        if not self.habilitada:
+            return None
+        ruta = self._ruta(clave)
+        try:
+            data = json.loads(ruta.read_text(encoding="utf-8"))
+            if time.time() - data["created"] > self.ttl_seconds:
+                ruta.unlink(missing_ok=True)
+                raise FileNotFoundError(ruta)
+            from models import UnifiedModel
+            modelo = UnifiedModel.model_validate(data["model"])
+            os.utime(ruta)  # marca de uso para el LRU
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return modelo
+
+    def guardar(self, clave: str, modelo: "UnifiedModel"):
+        if not self.habilitada:
+            return
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps({"created": time.time(), "model": modelo.model_dump()}, ensure_ascii=False)
+        tmp = self.directorio / f".{clave}.{uuid.uuid4().hex}.tmp"
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, self._ruta(clave))
+        self._desalojar()
+
+    def limpiar(self):
+        for ruta in self.directorio.glob("*.json"):
+            ruta.unlink(missing_ok=True)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "habilitada": self.habilitada,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            }
+
+    def _desalojar(self):
+        """Elimina entradas vencidas y, si se excede el tamaño, las menos usadas."""
+        entradas = []
+        ahora = time.time()
+        for ruta in self.directorio.glob("*.json"):
+            try:
+                st = ruta.stat()
+            except OSError:
+                continue
+            entradas.append((st.st_mtime, st.st_size, ruta))
+
+        entradas.sort()  # más antiguas primero
+        total_bytes = sum(size for _, size, _ in entradas)
+        eliminadas = 0
+        for mtime, size, ruta in entradas:
+            vencida = ahora - mtime > self.ttl_seconds
+            excedida = len(entradas) - eliminadas > self.max_entries or total_bytes > self.max_bytes
+            if not (vencida or excedida):
+                continue
+            ruta.unlink(missing_ok=True)
+            eliminadas += 1
+            total_bytes -= size
+
+        if eliminadas:
+            with self._lock:
+                self.evictions += eliminadas
+
+
+_cache = LLMContextCache()
+
+
+def obtener_cache() -> LLMContextCache:
+    """Cache compartida por todo el proceso."""
+    return _cache
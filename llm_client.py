@@ -0,0 +1,278 @@
+# llm_client.py
+# Capa asíncrona para el LLM: pool HTTP, timeouts, reintentos con backoff, rate limit y deduplicación.
+
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from constants import (LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES, LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE,
+                       LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS, LLM_MAX_CONNECTIONS)
+
+
+class LLMServiceError(Exception):
+    """Error definitivo al llamar al LLM (tras agotar reintentos o por un error no recuperable)."""
+
+
+@dataclass
+class ChatResultado:
+    content: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+
+
+class _TokenBucket:
+    """Limitador global de peticiones por minuto (token bucket)."""
+
+    def __init__(self, por_minuto: int):
+        self.capacidad = max(1, por_minuto)
+        self.tasa = self.capacidad / 60.0
+        self.tokens = float(self.capacidad)
+        self.ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self):
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.tasa)
+
+
+def _es_reintentable(error: Exception) -> bool:
+    import openai
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _espera_sugerida(error: Exception) -> Optional[float]:
+    """Respeta `Retry-After` si el servidor lo envía."""
+    response = getattr(error, "response", None)
+    valor = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(valor) if valor else None
+    except ValueError:
+        return None
+
+
+class AsyncLLMClient:
+    """
+    Cliente `AsyncOpenAI` compartido. Todas las llamadas pasan por un semáforo de concurrencia
+    y un token bucket; las peticiones idénticas en vuelo comparten una sola llamada.
+    `base_url` permite apuntarlo a un servidor local de pruebas.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: float = LLM_TIMEOUT_SECONDS, max_retries: int = LLM_MAX_RETRIES,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+                 max_connections: int = LLM_MAX_CONNECTIONS):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.max_connections = max_connections
+        self._client = None
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._bucket: Optional[_TokenBucket] = None
+        self._en_vuelo: dict[str, asyncio.Future] = {}
+        self.llamadas = 0
+        self.deduplicadas = 0
+
+    def _asegurar_cliente(self):
+        """El cliente se crea en el primer uso y dentro del event loop que lo va a usar."""
+        if self._client is not None:
+            return
+        from openai import DEFAULT_CONNECTION_LIMITS, AsyncOpenAI, DefaultAsyncHttpxClient
+
+        # Los límites se construyen con la clase del cliente HTTP que usa el SDK instalado.
+        limites = type(DEFAULT_CONNECTION_LIMITS)(max_connections=self.max_connections,
+                                                  max_keepalive_connections=self.max_connections)
+        http_client = DefaultAsyncHttpxClient(limits=limites, timeout=self.timeout)
+        self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                   timeout=self.timeout, http_client=http_client)
+        self._semaforo = asyncio.Semaphore(self.max_concurrency)
+        self._bucket = _TokenBucket(self.requests_per_minute)
+
+    async def preparar(self):
+        """Crea el cliente HTTP por adelantado (p. ej. al arrancar la app) en vez de en la primera llamada."""
+        self._asegurar_cliente()
+
+    @staticmethod
+    def _clave(messages: list[dict], model: str, temperature: float, kwargs: dict) -> str:
+        payload = json.dumps([model, temperature, messages, kwargs], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def chat(self, messages: list[dict], model: str, temperature: float, **kwargs: Any) -> ChatResultado:
+        """Completion de chat con deduplicación de peticiones idénticas en vuelo."""
+        self._asegurar_cliente()
+        clave = self._clave(messages, model, temperature, kwargs)
+        futuro = self._en_vuelo.get(clave)
+        if futuro is not None:
+            self.deduplicadas += 1
+            return await asyncio.shield(futuro)
+
+        futuro = asyncio.ensure_future(self._llamar(messages, model, temperature, kwargs))
+        self._en_vuelo[clave] = futuro
+        futuro.add_done_callback(lambda _: self._en_vuelo.pop(clave, None))
+        return await asyncio.shield(futuro)
+
+    async def _llamar(self, messages, model, temperature, kwargs) -> ChatResultado:
+        ultimo_error = None
+        for intento in range(self.max_retries + 1):
+            try:
+                async with self._semaforo:
+                    await self._bucket.adquirir()
+                    self.llamadas += 1
+                    resp = await self._client.chat.completions.create(
+                        model=model, messages=messages, temperature=temperature, **kwargs)
+                usage = getattr(resp, "usage", None)
+                return ChatResultado(
+                    content=(resp.choices[0].message.content or "").strip(),
+                    prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                    completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                    retries=intento,
+                )
+            except Exception as e:
+                ultimo_error = e
+                if not _es_reintentable(e) or intento == self.max_retries:
+                    break
+                tope = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * (2 ** intento))
+                espera = _espera_sugerida(e) or random.uniform(0, tope)  # full jitter
+                print(f"Reintento {intento + 1}/{self.max_retries} del LLM en {espera:.2f}s: {e}")
+                await asyncio.sleep(espera)
+        raise LLMServiceError(f"Error llamando a la API de OpenAI: {ultimo_error}") from ultimo_error
+
+    async def chat_stream(self, messages: list[dict], model: str, temperature: float,
+                          uso: Optional[ChatResultado] = None, **kwargs: Any) -> AsyncIterator[str]:
+        """
+        Completion en streaming: produce los trozos de texto a medida que llegan.
+        Solo se reintenta si el error ocurre antes del primer trozo; cerrar el generador
+        corta la conexión y deja de consumir tokens. Con `uso`, se piden los tokens consumidos
+        (llegan en el último trozo) y se anotan ahí junto con los reintentos.
+        """
+        self._asegurar_cliente()
+        if uso is not None:
+            kwargs.setdefault("stream_options", {"include_usage": True})
+        for intento in range(self.max_retries + 1):
+            emitido = False
+            if uso is not None:
+                uso.retries = intento
+            try:
+                async with self._semaforo:
+                    await self._bucket.adquirir()
+                    self.llamadas += 1
+                    stream = await self._client.chat.completions.create(
+                        model=model, messages=messages, temperature=temperature, stream=True, **kwargs)
+                    try:
+                        async for chunk in stream:
+                            if uso is not None and getattr(chunk, "usage", None) is not None:
+                                uso.prompt_tokens = chunk.usage.prompt_tokens or 0
+                                uso.completion_tokens = chunk.usage.completion_tokens or 0
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if delta:
+                                emitido = True
+                                yield delta
+                    finally:
+                        await stream.close()
+                return
+            except Exception as e:
+                if emitido or not _es_reintentable(e) or intento == self.max_retries:
+                    raise LLMServiceError(f"Error llamando a la API de OpenAI: {e}") from e
+                tope = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * (2 ** intento))
+                espera = _espera_sugerida(e) or random.uniform(0, tope)
+                print(f"Reintento {intento + 1}/{self.max_retries} del LLM en {espera:.2f}s: {e}")
+                await asyncio.sleep(espera)
+
+    async def cerrar(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class _LoopEnSegundoPlano:
+    """Event loop dedicado para que el código síncrono (Streamlit, CLI) use el cliente asíncrono."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-loop", daemon=True).start()
+            return self._loop
+
+    def ejecutar(self, coro, timeout: Optional[float] = None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop()).result(timeout)
+
+
+_loop = _LoopEnSegundoPlano()
+_cliente: Optional[AsyncLLMClient] = None
+_cliente_lock = threading.Lock()
+
+
+def obtener_cliente_llm() -> AsyncLLMClient:
+    """Cliente compartido por todo el proceso (se configura por variables de entorno)."""
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            _cliente = AsyncLLMClient()
+        return _cliente
+
+
+def chat_sync(messages: list[dict], model: str, temperature: float, **kwargs: Any) -> ChatResultado:
+    """Puente síncrono: ejecuta la llamada en el loop de fondo y espera el resultado."""
+    return _loop.ejecutar(obtener_cliente_llm().chat(messages, model, temperature, **kwargs))
+
+
+def chat_stream_sync(messages: list[dict], model: str, temperature: float, uso: Optional[ChatResultado] = None,
+                     **kwargs: Any) -> Iterator[str]:
+    """
+    Puente síncrono para el streaming: los trozos llegan por una cola desde el loop de fondo.
+    Si quien consume deja de iterar (p. ej. por una violación de esquema), se cancela la llamada.
+    """
+    cola: queue.Queue = queue.Queue()
+    fin = object()
+
+    async def _productor():
+        try:
+            async for trozo in obtener_cliente_llm().chat_stream(messages, model, temperature, uso, **kwargs):
+                cola.put(trozo)
+        except Exception as e:
+            cola.put(e)
+        finally:
+            cola.put(fin)
+
+    futuro = asyncio.run_coroutine_threadsafe(_productor(), _loop.loop())
+    try:
+        while True:
+            item = cola.get()
+            if item is fin:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        futuro.cancel()
+
+
+def ejecutar_en_loop(coro, timeout: Optional[float] = None):
+    """Ejecuta cualquier corrutina en el loop compartido del LLM."""
+    return _loop.ejecutar(coro, timeout)
@@ -1,15 +1,29 @@
-import os
+import hashlib
+import json
 import re
+import time
 import yaml
-from openai import OpenAI
-from typing import Optional
+from typing import Any, Callable, Optional
 
 # Importamos el modelo desde nuestro nuevo archivo centralizado
 from models import UnifiedModel
+from pydantic import ValidationError
+
+from constants import (LLM_MODE, LLM_MODE_ALWAYS, LLM_MODE_LOCAL, LLM_REPAIR_ATTEMPTS, LLM_REPAIR_SPEC_CHARS,
+                       LLM_STRUCTURED_OUTPUT)
+from job_runner import JobCanceladoError
+from llm_cache import clave_contexto, obtener_cache
+from llm_client import ChatResultado, LLMServiceError, chat_stream_sync, chat_sync
+from spec_condenser import condensar_spec
+from spec_extractor import combinar_contextos, extraer_contexto_local, ids_por_capa
+from structured_output import campos_invalidos, esquema_estricto, quitar, response_format, subesquema
+from tracing import registrar, span
+from yaml_stream import EsquemaVioladoError, ParserJsonIncremental, ParserYamlIncremental
 
 # --- OpenAI Client Setup ---
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# El cliente (AsyncOpenAI con pool, reintentos y rate limit) vive en llm_client y se crea en el primer uso.
 MODEL_BASE = "gpt-4o-mini"
+TEMPERATURE_BASE = 0.1
 
 PROMPT_UNIFICADO = """
 Responde con un ÚNICO YAML válido. Eres un generador de proyectos para cuatro capas:
@@ -63,46 +77,399 @@ Reglas:
 - Responde únicamente con el bloque de código YAML, sin explicaciones.
 """
 
+PROMPT_ESTRUCTURADO = """
+Eres un generador de proyectos para cuatro capas: domain, business, proxy (Mule 4) y reception (Apigee).
+A partir de una ESPECIFICACIÓN (OpenAPI/RAML/texto) y la CAPA seleccionada ({capa}), completa el objeto
+JSON del esquema con la metadata para renderizar las plantillas del arquetipo.
 
-def _gpt(messages, temperature=0.1, model=MODEL_BASE) -> str:
-    """Función base para llamar a la API de OpenAI."""
-    try:
-        resp = client.chat.completions.create(model=model, messages=messages, temperature=temperature)
-        return resp.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"Error llamando a la API de OpenAI: {e}")
-        return ""
+Reglas:
+- layer: {capa}.
+- names.artifact_id y names.api_name en kebab-case; group_id tipo com.company.domain; version "1.0.0" si no hay.
+- paths.base_path es la ruta base ("/v1/resource"); base_uri y target_base_url la URL completa.
+- No inventes hosts/URLs si no están en la especificación: usa null.
+- notes: supuestos y aclaraciones breves.
+"""
+
+PROMPT_REPARACION = """
+Un contexto de proyecto (capa {capa}) generado a partir de una especificación tiene campos inválidos o
+faltantes. Responde SOLO esos campos:
+{campos}
+
+Campos ya válidos (no los repitas):
+{contexto}
+
+=== EXTRACTO DE LA ESPECIFICACIÓN ===
+{extracto}
+"""
+
+# Esquema de la salida estructurada (los mapas libres como `transformations` no se piden).
+ESQUEMA_CONTEXTO = esquema_estricto(UnifiedModel)
 
+# Cambia automáticamente cuando se edita el prompt (o el esquema), invalidando la cache de contextos.
+_PROMPT_ACTIVO = (PROMPT_ESTRUCTURADO + json.dumps(ESQUEMA_CONTEXTO, sort_keys=True) if LLM_STRUCTURED_OUTPUT
+                  else PROMPT_UNIFICADO)
+PROMPT_VERSION = hashlib.sha256(_PROMPT_ACTIVO.encode("utf-8")).hexdigest()[:12]
 
-def inferir_contexto_unificado(contenido_api: str, layer_choice: str) -> Optional[UnifiedModel]:
+PROMPT_MULTICAPA = """
+Responde con un ÚNICO YAML válido. Eres un generador de proyectos y necesitas el contexto de VARIAS
+capas ({capas}) para la misma ESPECIFICACIÓN (OpenAPI/RAML/texto). Capas posibles:
+- domain, business, proxy (Mule 4)
+- reception (Apigee)
+
+Lo que es igual para todas las capas va una sola vez en `comun`; en `capas` va, por cada capa pedida,
+solo lo que difiere (como mínimo names.artifact_id y notes).
+
+Estructura obligatoria del YAML:
+
+comun:
+  names:
+    project_name: string
+    version: "1.0.0"
+    group_id: com.company.domain
+    api_display_name: string
+    api_name: string-kebab
+  paths:
+    base_path: "/v1/resource"
+    base_uri: "https://host/v1"
+    target_base_url: "https://host/v1"
+  upstream:
+    protocol: HTTP|HTTPS|null
+    host: string|null
+    path: "/v1" | "/" | null
+  security:
+    auth: none | apikey | oauth2
+    cors: true|false
+    quota: {{enabled: true|false, interval: 1, timeUnit: minute|hour|day, limit: 60}}
+    spike_arrest: {{enabled: true|false, rate: "10ps"}}
+capas:
+  <capa>:
+    names:
+      artifact_id: string-kebab (distinto por capa)
+    transformations:
+      - set_mule_pom: true
+    notes: "supuestos y aclaraciones breves"
+
+Reglas:
+- Incluye en `capas` exactamente las capas pedidas: {capas}.
+- Deriva artifact_id y api_name en kebab-case si faltan.
+- No inventes hosts/URLs si no están en la especificación: deja null.
+- Responde únicamente con el bloque de código YAML, sin explicaciones.
+"""
+
+PROMPT_MULTICAPA_ESTRUCTURADO = """
+Eres un generador de proyectos y necesitas el contexto de VARIAS capas ({capas}) para la misma
+ESPECIFICACIÓN (OpenAPI/RAML/texto). Capas posibles: domain, business, proxy (Mule 4) y reception (Apigee).
+Completa el objeto JSON del esquema: lo que es igual para todas las capas va una sola vez en `comun`;
+en `capas`, por cada capa pedida, solo lo que difiere.
+
+Reglas:
+- capas.<capa>.names.artifact_id en kebab-case y distinto por capa.
+- names.api_name en kebab-case; group_id tipo com.company.domain; version "1.0.0" si no hay.
+- paths.base_path es la ruta base ("/v1/resource"); base_uri y target_base_url la URL completa.
+- No inventes hosts/URLs si no están en la especificación: usa null.
+- notes: supuestos y aclaraciones breves de cada capa.
+"""
+
+
+def esquema_multicapa(capas: list[str]) -> dict:
+    """Esquema estricto de la respuesta multicapa: `comun` una vez y, por capa, artifact_id y notes."""
+    nombres = [("names", c) for c in ESQUEMA_CONTEXTO["properties"]["names"]["properties"] if c != "artifact_id"]
+    comun = subesquema(ESQUEMA_CONTEXTO, nombres + [("paths",), ("upstream",), ("security",)])
+    propio = subesquema(ESQUEMA_CONTEXTO, [("names", "artifact_id"), ("notes",)])
+    return {
+        "type": "object",
+        "properties": {
+            "comun": comun,
+            "capas": {"type": "object", "properties": {k: propio for k in capas}, "required": list(capas),
+                      "additionalProperties": False},
+        },
+        "required": ["comun", "capas"],
+        "additionalProperties": False,
+    }
+
+
+_PROMPT_MULTICAPA_ACTIVO = (PROMPT_MULTICAPA_ESTRUCTURADO + json.dumps(ESQUEMA_CONTEXTO, sort_keys=True)
+                            if LLM_STRUCTURED_OUTPUT else PROMPT_MULTICAPA)
+PROMPT_MULTICAPA_VERSION = hashlib.sha256(_PROMPT_MULTICAPA_ACTIVO.encode("utf-8")).hexdigest()[:12]
+
+LAYER_KEYS = {"Domain": "domain", "Business": "business", "Proxy": "proxy", "Reception": "reception"}
+
+
+def _gpt(messages, temperature=TEMPERATURE_BASE, model=MODEL_BASE, **kwargs) -> str:
+    """Función base para llamar a la API de OpenAI. Lanza LLMServiceError si la llamada falla."""
+    with span("llm", modelo=model, streaming=False) as s:
+        resultado = chat_sync(messages, model=model, temperature=temperature, **kwargs)
+        s.atributos.update(prompt_tokens=resultado.prompt_tokens, completion_tokens=resultado.completion_tokens,
+                           retries=resultado.retries)
+    return resultado.content
+
+
+def _gpt_stream_secciones(messages, on_section: Callable[[str, Any], None], parser=None,
+                          temperature=TEMPERATURE_BASE, model=MODEL_BASE, **kwargs) -> dict:
+    """
+    Consume la respuesta en streaming y valida cada sección de primer nivel apenas se completa.
+    Ante la primera violación del esquema corta el stream (EsquemaVioladoError); las secciones
+    válidas hasta ese punto quedan en `parser.datos`.
+    El tiempo de parseo/validación de secciones se reporta aparte del span del LLM.
+    """
+    parser = parser if parser is not None else ParserYamlIncremental()
+    uso = ChatResultado(content="")
+    parseo = 0.0
+    with span("llm", modelo=model, streaming=True) as s:
+        stream = chat_stream_sync(messages, model=model, temperature=temperature, uso=uso, **kwargs)
+        try:
+            for trozo in stream:
+                t0 = time.perf_counter()
+                secciones = parser.feed(trozo)
+                parseo += time.perf_counter() - t0
+                for nombre, valor in secciones:
+                    on_section(nombre, valor)
+            t0 = time.perf_counter()
+            secciones = parser.finish()
+            parseo += time.perf_counter() - t0
+            for nombre, valor in secciones:
+                on_section(nombre, valor)
+        finally:
+            stream.close()
+            s.atributos.update(prompt_tokens=uso.prompt_tokens, completion_tokens=uso.completion_tokens,
+                               retries=uso.retries)
+    registrar("yaml", parseo, streaming=True)
+    return parser.datos
+
+
+def inferir_contexto_unificado(contenido_api: str, layer_choice: str, usar_cache: bool = True,
+                               modo: str = LLM_MODE,
+                               on_section: Optional[Callable[[str, Any], None]] = None) -> Optional[UnifiedModel]:
     """
     Realiza la ÚNICA llamada al LLM para obtener el contexto y lo valida con Pydantic.
+    Con `on_section` la respuesta se consume en streaming: cada sección (`layer`, `names`...) se
+    entrega validada apenas se completa y el stream se aborta si la salida viola el esquema.
+    Los errores de red/API se propagan como LLMServiceError.
+    Antes intenta extraer el contexto localmente: si la especificación trae los campos requeridos
+    (o `modo` es "local") no se llama al LLM. Si la misma especificación y capa ya se procesaron,
+    devuelve el contexto cacheado sin tocar la red.
     """
-    layer_key = {
-        "Domain": "domain", "Business": "business", "Proxy": "proxy", "Reception": "reception"
-    }.get(layer_choice, "domain")
+    layer_key = LAYER_KEYS.get(layer_choice, "domain")
 
-    prompt = PROMPT_UNIFICADO.format(capa=layer_key)
-    messages = [
-        {"role": "system", "content": "Responde solo con un bloque de código YAML válido."},
-        {"role": "user", "content": f"{prompt}\n\n=== ESPECIFICACIÓN ===\n{contenido_api}"}
-    ]
+    local = None
+    if modo != LLM_MODE_ALWAYS:
+        with span("extraccion", capa=layer_key) as s:
+            local = extraer_contexto_local(contenido_api, layer_key)
+            s.atributos.update(kind=local.kind, completa=local.completa)
+        if local.completa or modo == LLM_MODE_LOCAL:
+            print(f"Contexto extraído localmente ({local.kind}). Sin determinar: {local.faltantes or 'ninguno'}")
+            return local.modelo
+        print(f"Extractor local incompleto, se consulta al LLM. Faltan: {local.faltantes}")
+
+    # El prompt solo necesita metadatos: se envía la vista condensada de la especificación.
+    with span("condensacion") as s:
+        spec = condensar_spec(contenido_api)
+        s.atributos.update(nivel=spec.nivel, tokens_originales=spec.tokens_originales,
+                           tokens_condensados=spec.tokens_condensados)
+    if spec.nivel:
+        print(f"Especificación condensada (nivel {spec.nivel}): {spec.tokens_originales} -> "
+              f"{spec.tokens_condensados} tokens ({spec.ahorro:.0%} menos).")
 
-    raw_yaml = _gpt(messages)
+    cache = obtener_cache()
+    clave = clave_contexto(spec.texto, layer_key, PROMPT_VERSION, MODEL_BASE, TEMPERATURE_BASE)
+    if usar_cache:
+        cacheado = cache.obtener(clave)
+        if cacheado is not None:
+            print(f"Contexto recuperado de la cache ({layer_key}).")
+            return combinar_contextos(local, cacheado) if local else cacheado
 
-    match = re.search(r"```(?:yaml|yml)?\s*(.*?)```", raw_yaml, re.DOTALL)
-    clean_yaml = match.group(1).strip() if match else raw_yaml
+    if LLM_STRUCTURED_OUTPUT:
+        prompt, sistema = PROMPT_ESTRUCTURADO.format(capa=layer_key), "Responde solo con el objeto JSON pedido."
+        extra = {"response_format": response_format("unified_model", ESQUEMA_CONTEXTO)}
+    else:
+        prompt, sistema = PROMPT_UNIFICADO.format(capa=layer_key), "Responde solo con un bloque de código YAML válido."
+        extra = {}
+    messages = [
+        {"role": "system", "content": sistema},
+        {"role": "user", "content": f"{prompt}\n\n=== ESPECIFICACIÓN ===\n{spec.texto}"}
+    ]
 
+    clean_yaml = ""
+    abortado = False
     try:
-        data = yaml.safe_load(clean_yaml)
-        if not data:
-            print("Advertencia: El LLM devolvió un YAML vacío.")
+        if on_section is not None:
+            parser = ParserJsonIncremental() if LLM_STRUCTURED_OUTPUT else ParserYamlIncremental()
+            try:
+                data = _gpt_stream_secciones(messages, on_section, parser=parser, **extra)
+            except EsquemaVioladoError as e:
+                # Lo que llegó válido se conserva; la sección rota y las siguientes se reparan.
+                print(f"Streaming abortado: la respuesta del LLM no cumple el esquema. {e}")
+                data, abortado = parser.datos, True
+        else:
+            raw_yaml = _gpt(messages, **extra)
+            with span("yaml", streaming=False, estructurada=LLM_STRUCTURED_OUTPUT):
+                clean_yaml = _sin_fence(raw_yaml)
+                data = json.loads(clean_yaml) if LLM_STRUCTURED_OUTPUT else yaml.safe_load(clean_yaml)
+
+        if not data and not abortado:
+            print("Advertencia: El LLM devolvió una respuesta vacía.")
             return None
 
-        validated_data = UnifiedModel.model_validate(data)  # .model_validate para Pydantic v2
-        return validated_data
+        validated_data = _validar_con_reparacion(data, spec.texto, layer_key)
+        if validated_data is None:
+            return None
+        if usar_cache:
+            cache.guardar(clave, validated_data)
+        return combinar_contextos(local, validated_data) if local else validated_data
 
+    except (LLMServiceError, JobCanceladoError):
+        raise
     except (yaml.YAMLError, Exception) as e:
         print(f"Error al parsear o validar el YAML del LLM: {e}")
         print(f"--- YAML recibido ---\n{clean_yaml}\n--------------------")
-        return None
\ No newline at end of file
+        return None
+
+
+def _sin_fence(texto: str) -> str:
+    match = re.search(r"```(?:yaml|yml|json)?\s*(.*?)```", texto, re.DOTALL)
+    return match.group(1).strip() if match else texto
+
+
+def _validar_con_reparacion(data: dict, spec_texto: str, layer_key: str) -> Optional[UnifiedModel]:
+    """
+    Valida `data`; si faltan secciones o hay campos inválidos, en vez de regenerar todo pide al LLM
+    solo esos campos (prompt corto, subesquema) hasta `LLM_REPAIR_ATTEMPTS` veces.
+    """
+    for intento in range(LLM_REPAIR_ATTEMPTS + 1):
+        motivos = {(k,): "falta la sección" for k in ESQUEMA_CONTEXTO["required"] if k not in data}
+        try:
+            with span("validacion"):
+                validado = UnifiedModel.model_validate(data)  # .model_validate para Pydantic v2
+            if not motivos:
+                return validado
+        except ValidationError as e:
+            errores = {tuple(str(p) for p in err["loc"]): err["msg"] for err in e.errors()}
+            for ruta in campos_invalidos(e):
+                motivos.setdefault(ruta, next((m for loc, m in errores.items() if loc[:len(ruta)] == ruta), "inválido"))
+            validado = None
+        if intento == LLM_REPAIR_ATTEMPTS:
+            if validado is None:
+                print(f"Contexto inválido tras {intento} reparaciones: {', '.join('.'.join(r) for r in motivos)}")
+            return validado  # con secciones faltantes, los valores por defecto del modelo
+        print(f"Contexto incompleto o inválido; se piden solo estos campos: {', '.join('.'.join(r) for r in motivos)}")
+        try:
+            data = _fusionar(data, _pedir_campos(data, motivos, spec_texto, layer_key))
+        except (ValueError, yaml.YAMLError) as e:
+            print(f"Error al parsear la reparación del LLM: {e}")
+            return validado
+    return None
+
+
+def _pedir_campos(data: dict, motivos: dict[tuple[str, ...], str], spec_texto: str, layer_key: str) -> dict:
+    """Una llamada corta al LLM que devuelve solo los campos de `motivos` (el resto se le muestra como válido)."""
+    rutas = list(motivos)
+    prompt = PROMPT_REPARACION.format(
+        capa=layer_key,
+        campos="\n".join(f"- {'.'.join(r)}: {m}" for r, m in motivos.items()),
+        contexto=json.dumps(quitar(data, rutas), ensure_ascii=False, default=str),
+        extracto=spec_texto[:LLM_REPAIR_SPEC_CHARS])
+    extra = {"response_format": response_format("campos", subesquema(ESQUEMA_CONTEXTO, rutas))} \
+        if LLM_STRUCTURED_OUTPUT else {}
+    with span("reparacion", campos=len(rutas)):
+        crudo = _sin_fence(_gpt([{"role": "system", "content": "Responde solo con un objeto JSON."},
+                                 {"role": "user", "content": prompt}], **extra))
+    parcial = json.loads(crudo) if LLM_STRUCTURED_OUTPUT else yaml.safe_load(crudo)
+    if not isinstance(parcial, dict):
+        raise ValueError("la reparación no devolvió un objeto")
+    return parcial
+
+
+def _fusionar(base: dict, cambios: dict) -> dict:
+    """`base` con `cambios` encima; los diccionarios anidados se fusionan en vez de reemplazarse."""
+    fusion = dict(base)
+    for clave, valor in cambios.items():
+        if isinstance(valor, dict) and isinstance(fusion.get(clave), dict):
+            fusion[clave] = _fusionar(fusion[clave], valor)
+        else:
+            fusion[clave] = valor
+    return fusion
+
+
+def inferir_contextos_multicapa(contenido_api: str, layer_choices: list[str], usar_cache: bool = True,
+                                modo: str = LLM_MODE) -> dict[str, UnifiedModel]:
+    """
+    Un `UnifiedModel` por capa pedida con UNA sola llamada al LLM: el modelo responde names, paths,
+    upstream y security una vez y por capa solo lo que cambia. La extracción local se hace una vez
+    para todas las capas y cada capa se guarda en la cache por separado (también se reutiliza lo que
+    ya dejó una generación de una sola capa). Devuelve solo las capas que se pudieron obtener, cada
+    una con su propio `artifact_id`.
+    """
+    layer_keys = list(dict.fromkeys(LAYER_KEYS.get(c, "domain") for c in layer_choices))
+
+    local = None
+    if modo != LLM_MODE_ALWAYS:
+        with span("extraccion", capas=",".join(layer_keys)) as s:
+            local = extraer_contexto_local(contenido_api, layer_keys[0])
+            s.atributos.update(kind=local.kind, completa=local.completa)
+        if local.completa or modo == LLM_MODE_LOCAL:
+            print(f"Contextos extraídos localmente ({local.kind}). Sin determinar: {local.faltantes or 'ninguno'}")
+            return ids_por_capa({k: local.modelo.model_copy(update={"layer": k}, deep=True) for k in layer_keys})
+        print(f"Extractor local incompleto, se consulta al LLM. Faltan: {local.faltantes}")
+
+    with span("condensacion") as s:
+        spec = condensar_spec(contenido_api)
+        s.atributos.update(nivel=spec.nivel, tokens_originales=spec.tokens_originales,
+                           tokens_condensados=spec.tokens_condensados)
+
+    cache = obtener_cache()
+    claves = {k: clave_contexto(spec.texto, k, PROMPT_MULTICAPA_VERSION, MODEL_BASE, TEMPERATURE_BASE)
+              for k in layer_keys}
+    contextos: dict[str, UnifiedModel] = {}
+    if usar_cache:
+        for k in layer_keys:
+            cacheado = (cache.obtener(clave_contexto(spec.texto, k, PROMPT_VERSION, MODEL_BASE, TEMPERATURE_BASE))
+                        or cache.obtener(claves[k]))
+            if cacheado is not None:
+                contextos[k] = combinar_contextos(local, cacheado, multicapa=True) if local else cacheado
+    pendientes = [k for k in layer_keys if k not in contextos]
+    if not pendientes:
+        print(f"Contextos recuperados de la cache ({', '.join(layer_keys)}).")
+        return ids_por_capa(contextos)
+
+    if LLM_STRUCTURED_OUTPUT:
+        prompt, sistema = (PROMPT_MULTICAPA_ESTRUCTURADO.format(capas=", ".join(pendientes)),
+                           "Responde solo con el objeto JSON pedido.")
+        extra = {"response_format": response_format("contextos_multicapa", esquema_multicapa(pendientes))}
+    else:
+        prompt, sistema = (PROMPT_MULTICAPA.format(capas=", ".join(pendientes)),
+                           "Responde solo con un bloque de código YAML válido.")
+        extra = {}
+    messages = [
+        {"role": "system", "content": sistema},
+        {"role": "user", "content": f"{prompt}\n\n=== ESPECIFICACIÓN ===\n{spec.texto}"}
+    ]
+    clean_yaml = ""
+    try:
+        raw_yaml = _gpt(messages, **extra)
+        with span("yaml", streaming=False, estructurada=LLM_STRUCTURED_OUTPUT):
+            clean_yaml = _sin_fence(raw_yaml)
+            data = json.loads(clean_yaml) if LLM_STRUCTURED_OUTPUT else yaml.safe_load(clean_yaml)
+    except LLMServiceError:
+        raise
+    except (ValueError, yaml.YAMLError) as e:
+        print(f"Error al parsear la respuesta multicapa del LLM: {e}")
+        print(f"--- Respuesta recibida ---\n{clean_yaml}\n--------------------")
+        return ids_por_capa(contextos)
+
+    comun = data.get("comun") if isinstance(data, dict) else None
+    por_capa = data.get("capas") if isinstance(data, dict) else None
+    comun, por_capa = (comun if isinstance(comun, dict) else {}), (por_capa if isinstance(por_capa, dict) else {})
+    for k in pendientes:
+        propio = por_capa.get(k)
+        if not isinstance(propio, dict):
+            print(f"Advertencia: La respuesta multicapa no trae la capa '{k}'; se reparan sus campos.")
+            propio = {}
+        # Cada capa pasa por la misma validación que una sola capa: solo se piden de nuevo sus campos inválidos.
+        validated_data = _validar_con_reparacion({**_fusionar(comun, propio), "layer": k}, spec.texto, k)
+        if validated_data is None:
+            print(f"Error al validar el contexto de la capa '{k}'.")
+            continue
+        if usar_cache:
+            cache.guardar(claves[k], validated_data)
+        contextos[k] = combinar_contextos(local, validated_data, multicapa=True) if local else validated_data
+    return ids_por_capa({k: contextos[k] for k in layer_keys if k in contextos})
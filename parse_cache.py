@@ -0,0 +1,169 @@
+# parse_cache.py
+# Cache de documentos parseados (XML, OAS, RAML) sobre el árbol del proyecto, compartida por todas las reglas.
+
+import io
+import json
+import threading
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Any, Callable, Optional
+
+import yaml
+
+from constants import XML_STREAMING_BYTES
+from project_tree import ProjectTree
+from spec_extractor import RamlLoader
+
+_YAMLLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _texto(elem: Optional[ET.Element]) -> str:
+    return (elem.text or "").strip() if elem is not None else ""
+
+
+def _textos(elem: ET.Element, tag: str) -> list[str]:
+    return [_texto(e) for e in elem.iter(tag) if _texto(e)]
+
+
+# --- Extractores: tag (con el prefijo usado en el documento) -> (lookup, función sobre el elemento) ---
+# Se ejecutan al cerrarse cada elemento durante el parseo, así que funcionan igual en streaming.
+
+_EXTRACTORES: dict[str, tuple[str, Callable[[ET.Element], Any]]] = {
+    # Mule
+    "flow": ("flows", lambda e: {"tipo": "flow", "name": e.get("name", "")}),
+    "sub-flow": ("flows", lambda e: {"tipo": "sub-flow", "name": e.get("name", ""),
+                                     "raise_errors": [r.get("type", "") for r in e.iter("raise-error")]}),
+    "error-handler": ("error_handlers", lambda e: {
+        "name": e.get("name", ""),
+        "tipos": [t for h in e if h.tag in ("on-error-propagate", "on-error-continue")
+                  for t in (h.get("type") or "ANY").replace(" ", "").split(",")],
+    }),
+    "apikit:config": ("apikit_configs", lambda e: {"name": e.get("name", ""), "api": e.get("api", "")}),
+    "secure-properties:config": ("secure_properties", lambda e: {"file": e.get("file", "")}),
+    "api-gateway:autodiscovery": ("autodiscovery", lambda e: {"apiId": e.get("apiId", "")}),
+    # Apigee
+    "Flow": ("apigee_flows", lambda e: {"name": e.get("name", ""), "condition": _texto(e.find("Condition"))}),
+    "PreFlow": ("apigee_preflow", lambda e: {"steps": _textos(e, "Name")}),
+    "BasePath": ("apigee_basepath", _texto),
+    "VirtualHost": ("apigee_virtualhosts", _texto),
+    "HTTPTargetConnection": ("apigee_targets", lambda e: {
+        "url": _texto(e.find("URL")),
+        "servers": [s.get("name", "") for s in e.iter("Server")],
+        "properties": {p.get("name", ""): _texto(p) for p in e.iter("Property")},
+    }),
+    "StatusCode": ("status_codes", _texto),
+    "Payload": ("payloads", lambda e: {"contentType": e.get("contentType", "")}),
+}
+
+
+@dataclass
+class DocumentoXml:
+    """Resumen de un XML: elemento raíz, hallazgos por lookup y (si es chico) el árbol completo."""
+    raiz_tag: str
+    raiz_attrib: dict
+    hallazgos: dict[str, list] = field(default_factory=dict)
+    raiz: Optional[ET.Element] = None
+
+    def lookup(self, nombre: str) -> list:
+        return self.hallazgos.get(nombre, [])
+
+
+def parsear_xml(datos: bytes, conservar_arbol: bool = True) -> DocumentoXml:
+    """
+    Parsea con `iterparse`: los tags quedan con el prefijo que usa el documento (`apikit:config`,
+    `flow`), los extractores corren al cerrarse cada elemento y, sin `conservar_arbol`, cada hijo
+    directo de la raíz se libera apenas se procesa.
+    """
+    prefijos: dict[str, str] = {}
+    pila: list[ET.Element] = []
+    hallazgos: dict[str, list] = {}
+    raiz = None
+    for evento, valor in ET.iterparse(io.BytesIO(datos), events=("start-ns", "start", "end")):
+        if evento == "start-ns":
+            prefijo, uri = valor
+            prefijos.setdefault(uri, prefijo)
+            continue
+        elem = valor
+        if evento == "start":
+            if elem.tag.startswith("{"):
+                uri, local = elem.tag[1:].split("}", 1)
+                prefijo = prefijos.get(uri, "")
+                elem.tag = f"{prefijo}:{local}" if prefijo else local
+            if raiz is None:
+                raiz = elem
+            pila.append(elem)
+            continue
+
+        pila.pop()
+        extractor = _EXTRACTORES.get(elem.tag)
+        if extractor is not None:
+            nombre, fn = extractor
+            hallazgos.setdefault(nombre, []).append(fn(elem))
+        if not conservar_arbol and len(pila) == 1:
+            pila[0].remove(elem)  # el hijo ya se procesó: no hace falta en memoria
+    return DocumentoXml(raiz_tag=raiz.tag if raiz is not None else "", raiz_attrib=dict(raiz.attrib) if raiz is not None else {},
+                        hallazgos=hallazgos, raiz=raiz if conservar_arbol else None)
+
+
+class ParseCache:
+    """
+    Cada archivo del árbol se parsea como mucho una vez, aunque lo pidan varias reglas a la vez.
+    Los errores de parseo se cachean también (el documento queda como None).
+    """
+
+    def __init__(self, tree: ProjectTree, streaming_bytes: int = XML_STREAMING_BYTES):
+        self.tree = tree
+        self.streaming_bytes = streaming_bytes
+        self._docs: dict[tuple[str, str], Any] = {}
+        self._locks: dict[tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.parseos = 0
+
+    def _memo(self, tipo: str, rel: str, parsear: Callable[[bytes], Any]):
+        clave = (tipo, rel)
+        if clave in self._docs:
+            return self._docs[clave]
+        with self._lock:
+            lock = self._locks.setdefault(clave, threading.Lock())
+        with lock:
+            if clave not in self._docs:
+                try:
+                    self._docs[clave] = parsear(self.tree.leer(rel))
+                except Exception as e:
+                    print(f"Info: No se pudo parsear '{rel}': {e}")
+                    self._docs[clave] = None
+                with self._lock:
+                    self.parseos += 1
+        return self._docs[clave]
+
+    def xml(self, rel: str) -> Optional[DocumentoXml]:
+        return self._memo("xml", rel, lambda datos: parsear_xml(datos, len(datos) <= self.streaming_bytes))
+
+    def spec(self, rel: str) -> Optional[Any]:
+        """OAS (JSON/YAML) o RAML ya cargado como estructura de Python."""
+        def cargar(datos: bytes):
+            texto = datos.decode("utf-8", "ignore")
+            sufijo = PurePosixPath(rel).suffix.lower()
+            if sufijo == ".json":
+                return json.loads(texto)
+            return yaml.load(texto, Loader=RamlLoader if sufijo == ".raml" else _YAMLLoader)
+        return self._memo("spec", rel, cargar)
+
+    # --- Lookups precalculados (agregan los hallazgos de varios archivos) ---
+
+    def hallazgos(self, nombre: str, rutas: list[str]) -> list[tuple[str, Any]]:
+        salida = []
+        for rel in rutas:
+            doc = self.xml(rel)
+            if doc is not None:
+                salida += [(rel, h) for h in doc.lookup(nombre)]
+        return salida
+
+    def raices(self, rutas: list[str]) -> dict[str, DocumentoXml]:
+        return {rel: doc for rel in rutas if (doc := self.xml(rel)) is not None}
+
+    def politicas(self, rutas: list[str]) -> dict[str, str]:
+        """Nombre de política Apigee -> tipo (elemento raíz)."""
+        return {doc.raiz_attrib.get("name") or PurePosixPath(rel).stem: doc.raiz_tag
+                for rel, doc in self.raices(rutas).items()}
@@ -0,0 +1,229 @@
+# pipeline.py
+# Etapas de generación reutilizables fuera de Streamlit (CLI por lotes, procesos en segundo plano).
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+from autofix import ResultadoAutofix, corregir
+from constants import LAYER_BY_SERVICE_TYPE
+from job_runner import ReporteJob
+from llm_service import LAYER_KEYS, inferir_contexto_unificado, inferir_contextos_multicapa
+from models import UnifiedModel
+from project_generator import (DiffProyecto, archetype_for_layer, obtener_proyecto, regenerar_proyecto,
+                               resolver_arquetipo)
+from project_tree import ProjectTree
+from rubric_engine import ResultadoRubricas
+from rubrics_service import analizar_con_puntaje, leer_rubricas
+from spec_loader import ZipIndex, map_prefix_to_type
+from tracing import Traza, span
+
+
+@dataclass
+class DisenoLeido:
+    """Especificación principal extraída de un ZIP de diseño."""
+    nombre: str
+    service_type: str
+    kind: str
+    inner_name: str
+    spec_bytes: bytes
+    referencias_faltantes: list[str] = field(default_factory=list)
+
+    @property
+    def ctx_text(self) -> str:
+        return self.spec_bytes.decode("utf-8", "ignore")
+
+
+def leer_zip_diseno(path: Path) -> DisenoLeido:
+    path = Path(path)
+    with span("lectura_spec", diseno=path.name) as s, ZipIndex(path) as indice:
+        kind, inner_name, inner_bytes = indice.principal()
+        faltantes = indice.resolver(inner_name).faltantes if inner_name else []
+        s.atributos.update(kind=kind, bytes=len(inner_bytes))
+    return DisenoLeido(nombre=path.name, service_type=map_prefix_to_type(path.name) or "UNKNOWN",
+                       kind=kind, inner_name=inner_name, spec_bytes=inner_bytes, referencias_faltantes=faltantes)
+
+
+def resolver_capa(choice: str, service_type: str) -> str:
+    """Traduce la opción 'Automático' a la capa inferida por el nombre del ZIP."""
+    if choice == "Automático":
+        return LAYER_BY_SERVICE_TYPE.get(service_type, "Domain")
+    return choice
+
+
+def rubrics_kind_para(layer_key: str) -> str:
+    return "apigee" if layer_key == "reception" else "mule"
+
+
+def analizar(proyecto: ProjectTree, rubrics_kind: str) -> tuple[list[dict], list[str], ResultadoRubricas | None]:
+    """Rúbricas del proyecto: definiciones leídas, observaciones y puntaje por criterio."""
+    try:
+        rubrics_defs = leer_rubricas(rubrics_kind)
+    except (OSError, ValueError) as e:
+        print(f"Advertencia: No se pudieron cargar las rúbricas '{rubrics_kind}': {e}")
+        rubrics_defs = []
+    observaciones, puntaje = analizar_con_puntaje(proyecto, rubrics_kind, rubrics_defs)
+    return rubrics_defs, observaciones, puntaje
+
+
+def analizar_y_corregir(proyecto: ProjectTree, contexto: UnifiedModel, rubrics_kind: str) -> ResultadoAutofix:
+    """Rúbricas y, para las reglas fallidas que lo admiten, correcciones automáticas sobre el mismo árbol."""
+    rubrics_defs, observaciones, puntaje = analizar(proyecto, rubrics_kind)
+    return corregir(proyecto, contexto, rubrics_kind, rubrics_defs, observaciones, puntaje)
+
+
+def construir(contexto: UnifiedModel, spec_bytes: bytes, spec_kind: str) -> ProjectTree:
+    """Arma en memoria el proyecto de la capa del contexto."""
+    arquetipo_path = resolver_arquetipo(archetype_for_layer(contexto.layer))
+    if not arquetipo_path:
+        raise FileNotFoundError(f"No se encontró el arquetipo para la capa '{contexto.layer}'.")
+    return obtener_proyecto(arquetipo_path, contexto, spec_bytes, spec_kind)
+
+
+def construir_y_analizar(contexto: UnifiedModel, spec_bytes: bytes, spec_kind: str) -> ResultadoAutofix:
+    """Arma el proyecto en memoria, lo pasa por las rúbricas y aplica las correcciones automáticas (sin UI)."""
+    proyecto = construir(contexto, spec_bytes, spec_kind)
+    return analizar_y_corregir(proyecto, contexto, rubrics_kind_para(contexto.layer))
+
+
+# Etapas de una generación completa (las informa el trabajo en segundo plano).
+ETAPAS_GENERACION = ("contexto", "construccion", "rubricas", "autofix")
+
+
+@dataclass
+class ResultadoGeneracion:
+    contexto: UnifiedModel
+    proyecto: ProjectTree
+    observaciones: list[str]
+    puntaje: ResultadoRubricas | None
+    rubrics_kind: str
+    diff: DiffProyecto | None = None
+    traza: Traza | None = None
+    corregidas: list[str] = field(default_factory=list)  # reglas resueltas por la etapa de autofix
+
+
+def especular_contexto(reporte: ReporteJob, ctx_text: str, choice: str) -> Optional[UnifiedModel]:
+    """
+    Solo la etapa de contexto, lanzada al subir el diseño (ver speculation.py). Va en streaming para
+    que una cancelación corte la respuesta en la siguiente sección en vez de esperarla completa.
+    """
+    reporte.etapa("contexto")
+    with Traza("especulacion", capa=choice):
+        contexto = inferir_contexto_unificado(ctx_text, choice,
+                                              on_section=lambda nombre, valor: reporte.verificar_cancelacion())
+    return contexto
+
+
+def generar_proyecto(reporte: ReporteJob, ctx_text: str, choice: str, spec_bytes: bytes, spec_kind: str,
+                     previo: tuple[UnifiedModel, ProjectTree] | None = None,
+                     especulado: Optional[Callable[[ReporteJob], Optional[UnifiedModel]]] = None) -> ResultadoGeneracion:
+    """
+    Generación completa sin UI, pensada para correr como trabajo del `JobRunner`: contexto (las
+    secciones del LLM llegan como eventos `seccion`), construcción (incremental si hay un `previo`
+    del mismo arquetipo), rúbricas y correcciones automáticas. Los spans de todas las etapas quedan
+    en `resultado.traza`.
+    Con `especulado` el contexto sale de una especulación ya lanzada; si no dio resultado se infiere.
+    """
+    with Traza("generacion", capa=choice, spec_kind=spec_kind) as traza:
+        resultado = _generar(reporte, ctx_text, choice, spec_bytes, spec_kind, previo, especulado)
+    resultado.traza = traza
+    return resultado
+
+
+def _generar(reporte: ReporteJob, ctx_text: str, choice: str, spec_bytes: bytes, spec_kind: str,
+             previo: tuple[UnifiedModel, ProjectTree] | None,
+             especulado: Optional[Callable[[ReporteJob], Optional[UnifiedModel]]]) -> ResultadoGeneracion:
+    reporte.etapa("contexto")
+    contexto = None
+    if especulado is not None:
+        with span("especulacion") as s:
+            contexto = especulado(reporte)
+            s.atributos["acierto"] = contexto is not None
+    if contexto is None:
+        contexto = inferir_contexto_unificado(
+            ctx_text, choice, on_section=lambda nombre, valor: reporte.evento("seccion", (nombre, valor)))
+    if not contexto:
+        raise ValueError("El LLM no pudo generar un contexto válido.")
+
+    reporte.etapa("construccion")
+    layer_key = choice.lower()
+    arquetipo_path = resolver_arquetipo(archetype_for_layer(layer_key))
+    if not arquetipo_path:
+        raise FileNotFoundError(f"No se encontró el arquetipo '{archetype_for_layer(layer_key)}'.")
+    diff = None
+    with span("construccion", incremental=previo is not None) as s:
+        if previo is not None and archetype_for_layer(previo[0].layer.lower()) == archetype_for_layer(layer_key):
+            # Se regenera sobre el árbol sin correcciones: el autofix vuelve a correr al final.
+            tree_previo = previo[1].original or previo[1]
+            proyecto, diff = regenerar_proyecto(arquetipo_path, previo[0], tree_previo, contexto, spec_bytes, spec_kind)
+        else:
+            proyecto = obtener_proyecto(arquetipo_path, contexto, spec_bytes, spec_kind)
+        s.atributos["archivos"] = len(proyecto)
+
+    reporte.etapa("rubricas")
+    rubrics_kind = rubrics_kind_para(layer_key)
+    rubrics_defs, observaciones, puntaje = analizar(proyecto, rubrics_kind)
+
+    reporte.etapa("autofix")
+    r = corregir(proyecto, contexto, rubrics_kind, rubrics_defs, observaciones, puntaje)
+    return ResultadoGeneracion(contexto, r.proyecto, r.observaciones, r.puntaje, rubrics_kind, diff,
+                               corregidas=r.corregidas)
+
+
+# --- Varias capas en una pasada ---
+
+# Las mismas etapas que una generación de una capa; cada una corre para todas las capas a la vez.
+ETAPAS_MULTICAPA = ETAPAS_GENERACION
+
+
+@dataclass
+class ResultadoMulticapa:
+    capas: dict[str, ResultadoGeneracion]  # por layer_key, en el orden pedido
+    traza: Traza | None = None
+
+
+def _por_capa(pool: ThreadPoolExecutor, fn: Callable, argumentos: dict) -> dict:
+    """
+    `fn(*argumentos[k])` para cada capa en paralelo. Cada hilo corre en una copia del contexto actual
+    para que sus spans caigan en la traza del trabajo.
+    """
+    futuros = {k: pool.submit(contextvars.copy_context().run, fn, *args) for k, args in argumentos.items()}
+    return {k: f.result() for k, f in futuros.items()}
+
+
+def generar_multicapa(reporte: ReporteJob, ctx_text: str, choices: list[str], spec_bytes: bytes,
+                      spec_kind: str) -> ResultadoMulticapa:
+    """
+    Varias capas del mismo diseño: una sola inferencia devuelve el contexto de todas y luego las
+    etapas de construcción, rúbricas y autofix corren para todas las capas a la vez (una por hilo),
+    así el trabajo informa cada etapa como en una generación de una capa. El ZIP combinado se arma
+    al descargar (`empaquetar_bundle`).
+    """
+    with Traza("generacion_multicapa", capas=",".join(choices), spec_kind=spec_kind) as traza:
+        reporte.etapa("contexto")
+        contextos = inferir_contextos_multicapa(ctx_text, choices)
+        faltantes = [c for c in choices if LAYER_KEYS.get(c, "domain") not in contextos]
+        if faltantes:
+            raise ValueError(f"El LLM no pudo generar un contexto válido para: {', '.join(faltantes)}.")
+
+        def construir_capa(contexto: UnifiedModel) -> ProjectTree:
+            with span("construccion", capa=contexto.layer) as s:
+                proyecto = construir(contexto, spec_bytes, spec_kind)
+                s.atributos["archivos"] = len(proyecto)
+            return proyecto
+
+        tipos = {k: rubrics_kind_para(k) for k in contextos}
+        with ThreadPoolExecutor(max_workers=len(contextos), thread_name_prefix="multicapa") as pool:
+            reporte.etapa("construccion")
+            proyectos = _por_capa(pool, construir_capa, {k: (c,) for k, c in contextos.items()})
+            reporte.etapa("rubricas")
+            analisis = _por_capa(pool, analizar, {k: (proyectos[k], tipos[k]) for k in contextos})
+            reporte.etapa("autofix")
+            corregidos = _por_capa(pool, corregir, {k: (proyectos[k], contextos[k], tipos[k], *analisis[k])
+                                                    for k in contextos})
+        resultados = {k: ResultadoGeneracion(contextos[k], r.proyecto, r.observaciones, r.puntaje, tipos[k],
+                                             corregidas=r.corregidas)
+                      for k, r in corregidos.items()}
+    return ResultadoMulticapa(resultados, traza)
@@ -1,50 +1,102 @@
-import os
 import tempfile
-import zipfile
 import shutil
+from dataclasses import dataclass, field
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader
 
-from constants import TEXT_EXTS
+from archetype_registry import TODO_EL_CONTEXTO, ArchetypeEntry, obtener_registro
+from artifact_store import clave_artefacto, clave_bundle, obtener_store
+from constants import ARCHETYPES_DIR, ARCHETYPE_ZIPS
 from models import UnifiedModel
+from project_tree import ProjectTree, ZipRef
+from tracing import span
 
-def render_template_directory(src_dir: Path, dest_dir: Path, context: UnifiedModel):
-    """
-    Renderiza un directorio completo de plantillas Jinja2.
-    """
-    env = Environment(loader=FileSystemLoader(searchpath=str(src_dir)), autoescape=False)
-
-    # Usamos .model_dump() para Pydantic v2+ para pasarlo a Jinja
-    ctx_dict = context.model_dump()
+def archetype_for_layer(layer_key: str) -> str:
+    """Nombre del arquetipo que corresponde a una capa (domain/business/proxy/reception)."""
+    return "reception" if layer_key == "reception" else "generic-mule"
 
-    for path_plantilla in src_dir.rglob("*"):
-        ruta_relativa = path_plantilla.relative_to(src_dir)
-        path_destino = dest_dir / ruta_relativa
-        path_destino.parent.mkdir(parents=True, exist_ok=True)
 
-        if path_plantilla.is_dir():
-            continue
+def resolver_arquetipo(layer: str) -> str | None:
+    """Ruta al arquetipo: el directorio si existe, si no el ZIP empaquetado."""
+    archetype_path = ARCHETYPES_DIR / layer
+    if archetype_path.is_dir():
+        return str(archetype_path)
+    zip_path = ARCHETYPES_DIR / ARCHETYPE_ZIPS.get(layer, f"{layer}.zip")
+    if zip_path.is_file():
+        return str(zip_path)
+    return None
 
-        if path_plantilla.suffix.lower() not in TEXT_EXTS and path_plantilla.name.lower() != "pom.xml":
-            shutil.copy(path_plantilla, path_destino)
-            continue
 
+def renderizar_plantillas(arquetipo: ArchetypeEntry, ctx_dict: dict,
+                          rutas: list[str] | None = None) -> dict[str, str | None]:
+    """
+    Renderiza las plantillas del manifiesto (o solo `rutas`). Devuelve rel -> contenido, o None si
+    la plantilla falló (en ese caso se copia el original). El render de Jinja es CPU puro y retiene
+    el GIL: en un pool de hilos no avanza más rápido, solo agrega cambios de contexto.
+    """
+    def _render(rel: str) -> tuple[str, str | None]:
         try:
-            template_name = str(ruta_relativa).replace(os.path.sep, '/')  # Jinja prefiere slashes
-            template = env.get_template(template_name)
-            contenido_renderizado = template.render(ctx_dict)
-            path_destino.write_text(contenido_renderizado, encoding="utf-8")
+            return rel, arquetipo.templates[rel].render(ctx_dict)
         except Exception as e:
-            print(f"Info: No se pudo renderizar '{ruta_relativa}' como plantilla. Copiando original. Error: {e}")
-            shutil.copy(path_plantilla, path_destino)
+            print(f"Info: No se pudo renderizar '{rel}' como plantilla. Copiando original. Error: {e}")
+            return rel, None
 
+    if rutas is None:
+        rutas = list(arquetipo.templates)
+        for rel, error in arquetipo.errores.items():
+            print(f"Info: No se pudo renderizar '{rel}' como plantilla. Copiando original. Error: {error}")
+    # Secuencial a propósito: con 121 plantillas (arquetipo sintético de 1200 archivos) el render
+    # tarda ~3 ms y un pool de 8 hilos ~6 ms. Un pool de procesos tampoco compensa: las `Template`
+    # compiladas no se serializan y cada proceso tendría que recompilar el arquetipo.
+    with span("render", plantillas=len(rutas)):
+        return dict(map(_render, rutas))
 
-def post_process_mule_project(project_root: Path, context: UnifiedModel):
+
+def render_template_directory(src_dir: Path, dest_dir: Path, context: UnifiedModel):
     """
-    Aplica lógicas específicas de Mule que son difíciles de manejar solo con plantillas.
+    Renderiza un arquetipo completo (directorio o ZIP) de plantillas Jinja2 en `dest_dir`.
+    Las plantillas compiladas vienen del registro de arquetipos y se renderizan en secuencia (el
+    render retiene el GIL; ver `renderizar_plantillas`), así que solo se paga `render`. Los
+    estáticos de un directorio se copian en bloque; los de un ZIP se extraen de sus entradas.
     """
-    readme_path = project_root / "README.md"
-    readme_content = f"""
+    arquetipo = obtener_registro().obtener(src_dir)
+    # Usamos .model_dump() para Pydantic v2+ para pasarlo a Jinja
+    renderizados = renderizar_plantillas(arquetipo, context.model_dump())
+
+    if arquetipo.es_zip:
+        # copytree no sirve sobre un ZIP: los estáticos se leen de sus entradas vía el árbol.
+        tree = ProjectTree()
+        for rel in arquetipo.archivos:
+            if renderizados.get(rel) is None:
+                _agregar_estatico(tree, arquetipo, rel, rel)
+        for rel in arquetipo.directorios:
+            (dest_dir / rel).mkdir(parents=True, exist_ok=True)
+        for rel in tree:
+            path_destino = dest_dir / rel
+            path_destino.parent.mkdir(parents=True, exist_ok=True)
+            path_destino.write_bytes(tree.leer(rel))
+    else:
+        estaticos = set(arquetipo.estaticos) | set(arquetipo.errores)
+        estaticos |= {rel for rel, contenido in renderizados.items() if contenido is None}
+
+        def _ignorar(carpeta, nombres):
+            rel_carpeta = Path(carpeta).relative_to(arquetipo.origen).as_posix()
+            prefijo = "" if rel_carpeta == "." else rel_carpeta + "/"
+            excluidos = {e.rstrip("/") for e in arquetipo.excluidos}
+            return {n for n in nombres
+                    if prefijo + n in excluidos
+                    or (prefijo + n in arquetipo.templates and prefijo + n not in estaticos)}
+
+        shutil.copytree(arquetipo.origen, dest_dir, ignore=_ignorar, dirs_exist_ok=True)
+
+    for rel, contenido in renderizados.items():
+        if contenido is not None:
+            path_destino = dest_dir / rel
+            path_destino.parent.mkdir(parents=True, exist_ok=True)
+            path_destino.write_text(contenido, encoding="utf-8")
+
+
+def _readme_mule(context: UnifiedModel) -> str:
+    return f"""
 # {context.names.project_name}
 
 Proyecto generado automáticamente.
@@ -55,46 +107,242 @@ Proyecto generado automáticamente.
 - **Versión:** `{context.names.version}`
 - **Path Base:** `{context.paths.base_path}`
 """
-    readme_path.write_text(readme_content, encoding="utf-8")
 
 
-def procesar_arquetipo(arquetipo_dir: str, context: UnifiedModel, spec_bytes: bytes, spec_kind: str) -> str:
+def post_process_mule_project(project_root: Path, context: UnifiedModel):
     """
-    Función unificada para procesar cualquier arquetipo.
+    Aplica lógicas específicas de Mule que son difíciles de manejar solo con plantillas.
+    """
+    readme_path = project_root / "README.md"
+    readme_path.write_text(_readme_mule(context), encoding="utf-8")
+
+
+def _ubicar_bundle_apigee(rutas) -> str | None:
+    """Ruta relativa (sin '/' final) de la carpeta que contiene `apiproxy/`, o None si no existe."""
+    for rel in rutas:
+        partes = rel.rstrip("/").split("/")
+        if "apiproxy" in partes:
+            return "/".join(partes[:partes.index("apiproxy")])
+    return None
+
+
+def _reescritor_rutas(rutas, context: UnifiedModel):
+    """
+    Traduce el renombrado del bundle de Apigee a una reescritura de rutas.
+    Devuelve (función rel -> rel, carpeta final del bundle o None).
+    """
+    if context.layer != "reception":
+        return (lambda rel: rel), None
+
+    bundle = _ubicar_bundle_apigee(rutas)
+    if bundle is None:
+        print("Advertencia: No se pudo procesar el bundle de Apigee. No se encontró la carpeta `apiproxy`.")
+        return (lambda rel: rel), None
+
+    padre, _, nombre = bundle.rpartition("/")
+    api_name = context.names.api_name
+    if not api_name or nombre == api_name:
+        return (lambda rel: rel), bundle
+
+    nuevo = f"{padre}/{api_name}" if padre else api_name
+    origen = bundle + "/"
+    return (lambda rel: nuevo + "/" + rel[len(origen):] if rel.startswith(origen) else rel), nuevo
+
+
+def _agregar_estatico(tree: ProjectTree, arquetipo, rel: str, destino: str):
+    """Los archivos estáticos no se leen: el árbol guarda una referencia al original."""
+    if arquetipo.es_zip:
+        ref = ZipRef(arquetipo.origen, arquetipo.miembros[rel], arquetipo.offsets[rel])
+        tree.agregar_desde_zip(destino, ref)
+    else:
+        tree.agregar_diferido(destino, (arquetipo.origen / rel).read_bytes)
+
+
+def construir_proyecto(arquetipo_dir: str, context: UnifiedModel, spec_bytes: bytes, spec_kind: str) -> ProjectTree:
+    """
+    Genera el proyecto en memoria a partir de un arquetipo (directorio o ZIP).
+    Los renombrados e inyecciones de la especificación se aplican como reescrituras de ruta;
+    nada se escribe a disco hasta que se serializa el árbol.
     """
-    src_path = Path(arquetipo_dir)
-    dest_path = Path(tempfile.mkdtemp())
+    arquetipo = obtener_registro().obtener(Path(arquetipo_dir))
+    ctx_dict = context.model_dump()
+    reescribir, bundle = _reescritor_rutas([*arquetipo.directorios, *arquetipo.archivos], context)
+
+    renderizados = renderizar_plantillas(arquetipo, ctx_dict)
+
+    tree = ProjectTree()
+    for rel in arquetipo.directorios:
+        tree.agregar_directorio(reescribir(rel))
 
-    print(f"Generando proyecto en: {dest_path}")
+    for rel in arquetipo.archivos:
+        destino = reescribir(rel)
+        contenido = renderizados.get(rel)
+        if contenido is not None:
+            tree.agregar(destino, contenido)
+        else:
+            _agregar_estatico(tree, arquetipo, rel, destino)
 
-    render_template_directory(src_path, dest_path, context)
+    _agregar_generados(tree, context, spec_bytes, spec_kind, bundle)
+    tree.version_arquetipo = arquetipo.version
+    tree.fijar_clave(clave_artefacto(arquetipo.version, context, spec_bytes, spec_kind))
+    return tree
 
+
+def _agregar_generados(tree: ProjectTree, context: UnifiedModel, spec_bytes: bytes, spec_kind: str,
+                       bundle: str | None) -> list[str]:
+    """Archivos que no salen del arquetipo (especificación y README). Devuelve sus rutas."""
     if context.layer in ["domain", "business", "proxy"]:
-        api_dir = dest_path / "src/main/resources/api"
-        api_dir.mkdir(parents=True, exist_ok=True)
         spec_filename = "api.raml" if spec_kind == "RAML" else "openapi.yaml"
-        (api_dir / spec_filename).write_bytes(spec_bytes)
-        post_process_mule_project(dest_path, context)
+        tree.agregar(f"src/main/resources/api/{spec_filename}", spec_bytes)
+        tree.agregar("README.md", _readme_mule(context))
+        return [f"src/main/resources/api/{spec_filename}", "README.md"]
+    if context.layer == "reception" and bundle is not None:
+        tree.agregar(f"{bundle}/apiproxy/resources/oas/openapi.json", spec_bytes)
+        return [f"{bundle}/apiproxy/resources/oas/openapi.json"]
+    return []
 
-    elif context.layer == "reception":
-        try:
-            bundle_parent = next(dest_path.glob("*/apiproxy")).parent
-            if bundle_parent.name != context.names.api_name:
-                target_dir = bundle_parent.parent / context.names.api_name
-                shutil.move(str(bundle_parent), str(target_dir))
-                oas_dir = target_dir / "apiproxy/resources/oas"
+
+# --- Regeneración incremental ---
+
+@dataclass
+class DiffProyecto:
+    """Diferencia a nivel de archivo entre dos generaciones del mismo proyecto."""
+    agregados: list[str] = field(default_factory=list)
+    modificados: list[str] = field(default_factory=list)
+    eliminados: list[str] = field(default_factory=list)
+    campos: list[str] = field(default_factory=list)
+    rerenderizados: int = 0
+    reutilizados: int = 0  # entradas tomadas tal cual del árbol anterior
+    completa: bool = False
+
+    @property
+    def vacio(self) -> bool:
+        return not (self.agregados or self.modificados or self.eliminados)
+
+
+def campos_cambiados(anterior: dict, nuevo: dict, prefijo: str = "") -> set[str]:
+    """Rutas con puntos (`security.quota.limit`) de los valores hoja que difieren entre dos contextos."""
+    cambios = set()
+    for clave in anterior.keys() | nuevo.keys():
+        ruta = f"{prefijo}{clave}"
+        a, b = anterior.get(clave), nuevo.get(clave)
+        if isinstance(a, dict) and isinstance(b, dict):
+            cambios |= campos_cambiados(a, b, ruta + ".")
+        elif a != b or clave not in anterior or clave not in nuevo:
+            cambios.add(ruta)
+    return cambios
+
+
+def _afectada(dependencias: frozenset[str], cambios: set[str]) -> bool:
+    if TODO_EL_CONTEXTO in dependencias:
+        return True
+    return any(d == c or d.startswith(c + ".") or c.startswith(d + ".") for d in dependencias for c in cambios)
+
+
+def _diferencias(previo: ProjectTree, nuevo: ProjectTree, candidatos) -> DiffProyecto:
+    """Altas/bajas por ruta; solo se comparan bytes de los archivos que pudieron cambiar."""
+    antes, despues = set(previo.archivos()), set(nuevo.archivos())
+    modificados = sorted(r for r in set(candidatos) & antes & despues if previo.leer(r) != nuevo.leer(r))
+    return DiffProyecto(agregados=sorted(despues - antes), modificados=modificados, eliminados=sorted(antes - despues))
+
+
+def regenerar_proyecto(arquetipo_dir: str, contexto_previo: UnifiedModel, tree_previo: ProjectTree,
+                       context: UnifiedModel, spec_bytes: bytes, spec_kind: str) -> tuple[ProjectTree, DiffProyecto]:
+    """
+    Regenera un proyecto ya generado tras un cambio de contexto: solo se re-renderizan las
+    plantillas que leen algún campo modificado y el resto de las entradas se reutiliza del árbol
+    anterior. Si cambia la capa, el nombre del bundle de Apigee o el arquetipo, se reconstruye entero.
+    """
+    arquetipo = obtener_registro().obtener(Path(arquetipo_dir))
+    anterior, nuevo = contexto_previo.model_dump(), context.model_dump()
+    cambios = campos_cambiados(anterior, nuevo)
+
+    reconstruir = (tree_previo.version_arquetipo != arquetipo.version or "layer" in cambios
+                   or (context.layer == "reception" and "names.api_name" in cambios))
+    if reconstruir:
+        tree = construir_proyecto(arquetipo_dir, context, spec_bytes, spec_kind)
+        diff = _diferencias(tree_previo, tree, tree.archivos())
+        diff.rerenderizados, diff.completa = len(arquetipo.templates), True
+    else:
+        reescribir, bundle = (lambda rel: rel), None
+        if context.layer == "reception":
+            reescribir, bundle = _reescritor_rutas([*arquetipo.directorios, *arquetipo.archivos], context)
+        afectadas = [rel for rel in arquetipo.templates if _afectada(arquetipo.dependencias(rel), cambios)]
+
+        tree = tree_previo.copia()
+        candidatos = []
+        for rel, contenido in renderizar_plantillas(arquetipo, nuevo, afectadas).items():
+            if contenido is not None:
+                tree.agregar(reescribir(rel), contenido)
             else:
-                oas_dir = bundle_parent / "apiproxy/resources/oas"
+                _agregar_estatico(tree, arquetipo, rel, reescribir(rel))
+            candidatos.append(reescribir(rel))
+        candidatos += _agregar_generados(tree, context, spec_bytes, spec_kind, bundle)
+        diff = _diferencias(tree_previo, tree, candidatos)
+        diff.rerenderizados = len(afectadas)
+        diff.reutilizados = len(tree) - len(set(candidatos))
+
+    diff.campos = sorted(cambios)
+    tree.fijar_clave(clave_artefacto(arquetipo.version, context, spec_bytes, spec_kind))
+    print(f"Regeneración {'completa' if diff.completa else 'incremental'}: {diff.rerenderizados} plantillas, "
+          f"{len(diff.modificados)} modificados, {len(diff.agregados)} nuevos, {len(diff.eliminados)} eliminados")
+    return tree, diff
+
+
+def obtener_proyecto(arquetipo_dir: str, context: UnifiedModel, spec_bytes: bytes, spec_kind: str) -> ProjectTree:
+    """
+    Como `construir_proyecto`, pero si el store ya tiene el artefacto para estas mismas entradas
+    devuelve un árbol sobre ese ZIP sin volver a renderizar.
+    """
+    arquetipo = obtener_registro().obtener(Path(arquetipo_dir))
+    clave = clave_artefacto(arquetipo.version, context, spec_bytes, spec_kind)
+    existente = obtener_store().obtener(clave, f"{context.names.artifact_id}.zip")
+    if existente is None:
+        return construir_proyecto(arquetipo_dir, context, spec_bytes, spec_kind)
+    tree = ProjectTree.desde_zip(existente)
+    tree.version_arquetipo = arquetipo.version
+    tree.fijar_clave(clave)
+    return tree
 
-            oas_dir.mkdir(parents=True, exist_ok=True)
-            (oas_dir / "openapi.json").write_bytes(spec_bytes)
-        except (StopIteration, Exception) as e:
-            print(f"Advertencia: No se pudo procesar el bundle de Apigee. {e}")
 
-    output_zip_path = Path(tempfile.gettempdir()) / f"{context.names.artifact_id}.zip"
-    with zipfile.ZipFile(output_zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-        for p in dest_path.rglob("*"):
-            z.write(p, p.relative_to(dest_path))
+def empaquetar_proyecto(tree: ProjectTree, context: UnifiedModel) -> str:
+    """
+    Devuelve el ZIP del árbol desde el store de artefactos (se escribe solo la primera vez).
+    Un árbol modificado a mano, sin clave, se escribe en un directorio temporal propio.
+    """
+    nombre = f"{context.names.artifact_id}.zip"
+    if tree.clave is None:
+        return tree.escribir_zip(Path(tempfile.mkdtemp(prefix="proyecto-")) / nombre)
+    return obtener_store().obtener_o_construir(tree.clave, nombre, tree.escribir_zip)
 
-    shutil.rmtree(dest_path)
-    return str(output_zip_path)
\ No newline at end of file
+
+def empaquetar_bundle(proyectos: dict[str, tuple[ProjectTree, UnifiedModel]], nombre: str) -> str:
+    """
+    Un solo ZIP con varios proyectos, cada uno en `<capa>/<artifact_id>/`. Las entradas que vienen
+    del arquetipo o de un artefacto previo se copian sin recomprimir; si todos los árboles tienen
+    clave, el paquete también pasa por el store de artefactos.
+    """
+    bundle = ProjectTree()
+    claves = {}
+    for capa, (tree, context) in sorted(proyectos.items()):
+        carpeta = f"{capa}/{context.names.artifact_id}"
+        bundle.incluir(carpeta, tree)
+        claves[carpeta] = tree.clave
+    if None in claves.values():
+        return bundle.escribir_zip(Path(tempfile.mkdtemp(prefix="proyectos-")) / nombre)
+    return obtener_store().obtener_o_construir(clave_bundle(claves), nombre, bundle.escribir_zip)
+
+
+def procesar_arquetipo(arquetipo_dir: str, context: UnifiedModel, spec_bytes: bytes, spec_kind: str) -> str:
+    """
+    Función unificada para procesar cualquier arquetipo.
+    `arquetipo_dir` puede ser un directorio o el ZIP del arquetipo; en ambos casos el proyecto
+    se arma en memoria y se escribe directamente al store de artefactos. Si las mismas entradas
+    ya se generaron, se devuelve el ZIP existente sin renderizar.
+    """
+    print(f"Generando proyecto desde: {Path(arquetipo_dir).name}")
+    arquetipo = obtener_registro().obtener(Path(arquetipo_dir))
+    clave = clave_artefacto(arquetipo.version, context, spec_bytes, spec_kind)
+    return obtener_store().obtener_o_construir(
+        clave, f"{context.names.artifact_id}.zip",
+        lambda destino: construir_proyecto(arquetipo_dir, context, spec_bytes, spec_kind).escribir_zip(destino))
@@ -0,0 +1,237 @@
+# project_tree.py
+# Árbol de proyecto en memoria (ruta -> bytes o contenido diferido) compartido entre generación y rúbricas.
+
+import re
+import threading
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from tracing import span
+from zip_utils import (admite_copia_cruda, admite_escritura_cruda, escribir_entrada_cruda, leer_entrada,
+                       offset_datos)
+
+
+@dataclass
+class ZipRef:
+    """Referencia a una entrada de otro ZIP; permite copiarla sin recomprimir."""
+    zip_path: Path
+    info: zipfile.ZipInfo
+    offset: int
+
+    def leer(self) -> bytes:
+        # Con el offset ya calculado se lee solo esta entrada: abrir el ZipFile por cada lectura
+        # re-parsea el directorio central y vuelve cuadrático el análisis de un árbol grande.
+        return leer_entrada(self.zip_path, self.info, self.offset)
+
+
+@dataclass
+class Entrada:
+    datos: Optional[bytes] = None
+    cargar: Optional[Callable[[], bytes]] = None
+    zip_ref: Optional[ZipRef] = None
+
+    def leer(self) -> bytes:
+        if self.datos is not None:
+            return self.datos
+        if self.zip_ref is not None:
+            return self.zip_ref.leer()
+        return self.cargar()
+
+
+def _patron_a_regex(patron: str) -> re.Pattern:
+    """Traduce un glob estilo pathlib ('**' = cualquier número de carpetas) a regex sobre rutas '/'."""
+    segmentos = patron.strip("/").split("/")
+    rx = ""
+    for i, segmento in enumerate(segmentos):
+        ultimo = i == len(segmentos) - 1
+        if segmento == "**":
+            rx += ".*" if ultimo else "(?:[^/]+/)*"
+            continue
+        rx += re.escape(segmento).replace(r"\*", "[^/]*").replace(r"\?", "[^/]")
+        rx += "" if ultimo else "/"
+    return re.compile(rx + "$")
+
+
+class ProjectTree:
+    """
+    Proyecto generado que vive en memoria. Las rúbricas lo consultan con `exists`/`glob` y
+    solo se serializa a ZIP una vez, cuando se descarga.
+    """
+
+    def __init__(self):
+        self._entradas: dict[str, Entrada] = {}
+        self._dirs: set[str] = set()
+        self._lock = threading.Lock()
+        self._version = 0
+        self._serializado: tuple[str, int] | None = None
+        self._clave: tuple[str, int] | None = None
+        # Versión del arquetipo que produjo el árbol (para regenerarlo de forma incremental).
+        self.version_arquetipo: Optional[str] = None
+        # Árbol tal como salió del generador, si este es una copia con correcciones automáticas.
+        self.original: Optional["ProjectTree"] = None
+
+    # --- Construcción ---
+
+    def fijar_clave(self, clave: str):
+        """Asocia el árbol a la clave de las entradas que lo produjeron (store de artefactos)."""
+        self._clave = (clave, self._version)
+
+    @property
+    def clave(self) -> Optional[str]:
+        """Clave de origen, o None si el árbol se modificó después de fijarla."""
+        if self._clave is None or self._clave[1] != self._version:
+            return None
+        return self._clave[0]
+
+    def _registrar_padres(self, rel: str):
+        partes = rel.split("/")[:-1]
+        for i in range(1, len(partes) + 1):
+            self._dirs.add("/".join(partes[:i]))
+
+    def _poner(self, rel: str, entrada: Entrada):
+        rel = rel.strip("/")
+        self._entradas[rel] = entrada
+        self._registrar_padres(rel)
+        self._version += 1
+
+    def agregar(self, rel: str, datos: bytes | str):
+        if isinstance(datos, str):
+            datos = datos.encode("utf-8")
+        self._poner(rel, Entrada(datos=datos))
+
+    def agregar_diferido(self, rel: str, cargar: Callable[[], bytes]):
+        self._poner(rel, Entrada(cargar=cargar))
+
+    def agregar_desde_zip(self, rel: str, ref: ZipRef):
+        self._poner(rel, Entrada(zip_ref=ref))
+
+    def agregar_directorio(self, rel: str):
+        rel = rel.strip("/")
+        if rel:
+            self._dirs.add(rel)
+            self._registrar_padres(rel + "/")
+            self._version += 1
+
+    def eliminar(self, rel: str):
+        if self._entradas.pop(rel.strip("/"), None) is not None:
+            self._version += 1
+
+    def incluir(self, prefijo: str, otro: "ProjectTree"):
+        """Agrega el contenido de `otro` bajo la carpeta `prefijo` (comparte sus entradas, sin leerlas)."""
+        prefijo = prefijo.strip("/")
+        self.agregar_directorio(prefijo)
+        for rel in otro.directorios():
+            self.agregar_directorio(f"{prefijo}/{rel}")
+        for rel in otro.archivos():
+            self._poner(f"{prefijo}/{rel}", otro._entradas[rel])
+
+    def copia(self) -> "ProjectTree":
+        """Copia superficial: comparte las entradas (bytes o referencias) con el árbol original."""
+        tree = ProjectTree()
+        tree._entradas = dict(self._entradas)
+        tree._dirs = set(self._dirs)
+        tree.version_arquetipo = self.version_arquetipo
+        tree.original = self.original
+        return tree
+
+    @classmethod
+    def desde_directorio(cls, root: Path) -> "ProjectTree":
+        """Envuelve un directorio en disco; el contenido se lee solo si alguien lo pide."""
+        tree = cls()
+        root = Path(root)
+        for p in sorted(root.rglob("*")):
+            rel = p.relative_to(root).as_posix()
+            if p.is_dir():
+                tree.agregar_directorio(rel)
+            else:
+                tree.agregar_diferido(rel, p.read_bytes)
+        return tree
+
+    @classmethod
+    def desde_zip(cls, zip_path: Path) -> "ProjectTree":
+        """Envuelve un ZIP existente sin descomprimirlo."""
+        tree = cls()
+        zip_path = Path(zip_path)
+        with zipfile.ZipFile(zip_path) as z, open(zip_path, "rb") as fp:
+            for info in z.infolist():
+                if info.is_dir():
+                    tree.agregar_directorio(info.filename)
+                else:
+                    tree.agregar_desde_zip(info.filename, ZipRef(zip_path, info, offset_datos(fp, info)))
+        return tree
+
+    # --- Consulta (API mínima estilo pathlib que usan las rúbricas) ---
+
+    def archivos(self) -> list[str]:
+        return sorted(self._entradas)
+
+    def directorios(self) -> list[str]:
+        return sorted(self._dirs)
+
+    def is_file(self, rel: str) -> bool:
+        return rel.strip("/") in self._entradas
+
+    def is_dir(self, rel: str) -> bool:
+        return rel.strip("/") in self._dirs
+
+    def exists(self, rel: str) -> bool:
+        return self.is_file(rel) or self.is_dir(rel)
+
+    def glob(self, patron: str) -> list[str]:
+        """Rutas (archivos y carpetas) que cumplen el patrón, ordenadas."""
+        rx = _patron_a_regex(patron)
+        return sorted(r for r in (*self._entradas, *self._dirs) if rx.match(r))
+
+    def leer(self, rel: str) -> bytes:
+        return self._entradas[rel.strip("/")].leer()
+
+    def leer_texto(self, rel: str, encoding: str = "utf-8") -> str:
+        return self.leer(rel).decode(encoding, "ignore")
+
+    def __contains__(self, rel: str) -> bool:
+        return self.exists(rel)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.archivos())
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    # --- Serialización ---
+
+    def escribir_zip(self, output_zip_path: Path) -> str:
+        """
+        Serializa el árbol a ZIP. Las entradas que vienen de otro ZIP se copian con sus bytes
+        comprimidos; el resto se comprime. Si el árbol no cambió desde la última vez, no hace nada.
+        """
+        output_zip_path = Path(output_zip_path)
+        with self._lock:
+            if self._serializado == (str(output_zip_path), self._version) and output_zip_path.exists():
+                return str(output_zip_path)
+
+            fuentes: dict[Path, object] = {}
+            try:
+                with span("zip", archivos=len(self._entradas)), \
+                        zipfile.ZipFile(output_zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+                    crudo = admite_escritura_cruda(z)
+                    for rel in self.directorios():
+                        z.writestr(rel + "/", b"")
+                    for rel in self.archivos():
+                        entrada = self._entradas[rel]
+                        ref = entrada.zip_ref
+                        if crudo and ref is not None and admite_copia_cruda(ref.info):
+                            if ref.zip_path not in fuentes:
+                                fuentes[ref.zip_path] = open(ref.zip_path, "rb")
+                            src = fuentes[ref.zip_path]
+                            src.seek(ref.offset)
+                            escribir_entrada_cruda(z, ref.info, rel, src.read(ref.info.compress_size))
+                        else:
+                            z.writestr(rel, entrada.leer())
+            finally:
+                for f in fuentes.values():
+                    f.close()
+
+            self._serializado = (str(output_zip_path), self._version)
+            return str(output_zip_path)
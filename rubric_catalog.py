@@ -0,0 +1,186 @@
+# rubric_catalog.py
+# Catálogo de rúbricas inmutable e indexado, cacheado por archivo y usable fuera de Streamlit.
+
+import hashlib
+import json
+import re
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from constants import BASE_DIR
+from rubric_engine import Regla, compilar_reglas
+
+_ARCHIVOS = {"mule": "Rubrics_Generation_Mule.json", "apigee": "Rubricas_Scaffold_Apigee.json"}
+
+
+def archivo_rubricas(rubrics_kind: str) -> Path:
+    return BASE_DIR / _ARCHIVOS.get(rubrics_kind, _ARCHIVOS["apigee"])
+
+
+def normalizar_rubrica(item: dict) -> dict:
+    return {
+        "id": item.get("id") or "",
+        "label": item.get("label") or item.get("criterion") or "",
+        "category": item.get("category") or "",
+        "severity": (item.get("severity") or "WARN").upper(),
+        "enabled": item.get("enabled", True),
+    }
+
+
+class AhoCorasick:
+    """Autómata multi-patrón: encuentra todas las apariciones de N patrones en una sola pasada."""
+
+    def __init__(self, patrones: list[str]):
+        self.patrones = list(patrones)
+        self._goto: list[dict[str, int]] = [{}]
+        self._fallo: list[int] = [0]
+        self._salida: list[list[int]] = [[]]
+        for i, patron in enumerate(self.patrones):
+            if patron:
+                self._insertar(patron, i)
+        self._enlazar()
+
+    def _insertar(self, patron: str, indice: int):
+        estado = 0
+        for ch in patron:
+            siguiente = self._goto[estado].get(ch)
+            if siguiente is None:
+                siguiente = len(self._goto)
+                self._goto[estado][ch] = siguiente
+                self._goto.append({})
+                self._fallo.append(0)
+                self._salida.append([])
+            estado = siguiente
+        self._salida[estado].append(indice)
+
+    def _enlazar(self):
+        cola = deque(self._goto[0].values())
+        while cola:
+            estado = cola.popleft()
+            for ch, siguiente in self._goto[estado].items():
+                cola.append(siguiente)
+                fallo = self._fallo[estado]
+                while fallo and ch not in self._goto[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._goto[fallo].get(ch, 0)
+                self._fallo[siguiente] = destino if destino != siguiente else 0
+                self._salida[siguiente] = self._salida[siguiente] + self._salida[self._fallo[siguiente]]
+
+    def buscar(self, texto: str) -> set[int]:
+        """Índices de los patrones que aparecen en `texto`."""
+        encontrados, estado = set(), 0
+        for ch in texto:
+            while estado and ch not in self._goto[estado]:
+                estado = self._fallo[estado]
+            estado = self._goto[estado].get(ch, 0)
+            if self._salida[estado]:
+                encontrados.update(self._salida[estado])
+        return encontrados
+
+
+class IndiceRubricas:
+    """
+    Índices sobre una lista de rúbricas normalizadas: por id, por categoría, índice invertido de
+    palabras clave y un autómata con ids y labels para asociar una nota a su rúbrica en una pasada.
+    """
+
+    def __init__(self, rubricas: tuple[Mapping, ...]):
+        self.rubricas = rubricas
+        self.por_id = MappingProxyType({r["id"]: r for r in rubricas if r["id"]})
+        categorias, palabras = defaultdict(list), defaultdict(set)
+        patrones, propietarios = [], []
+        for pos, r in enumerate(rubricas):
+            categorias[r["category"]].append(r["id"])
+            for palabra in re.findall(r"[^\W_]{3,}", f"{r['id']} {r['label']} {r['category']}".lower()):
+                palabras[palabra].add(r["id"])
+            for kw in (r["id"].lower(), r["label"].lower()):
+                if kw:
+                    patrones.append(kw)
+                    propietarios.append(pos)
+        self.por_categoria = MappingProxyType({c: tuple(ids) for c, ids in categorias.items()})
+        self.palabras = MappingProxyType({p: frozenset(ids) for p, ids in palabras.items()})
+        self._propietarios = tuple(propietarios)
+        self._automata = AhoCorasick(patrones)
+
+    def rubrica_para(self, nota: str) -> Optional[Mapping]:
+        """Primera rúbrica (en orden del archivo) cuyo id o label aparece en la nota."""
+        posiciones = {self._propietarios[i] for i in self._automata.buscar(nota.lower())}
+        return self.rubricas[min(posiciones)] if posiciones else None
+
+    def buscar_palabra(self, palabra: str) -> frozenset[str]:
+        return self.palabras.get(palabra.lower(), frozenset())
+
+
+@dataclass(frozen=True)
+class RubricCatalog:
+    """Rúbricas de un tipo (mule/apigee) ya normalizadas, indexadas y compiladas a reglas del motor."""
+    kind: str
+    content_hash: str
+    definiciones: Mapping
+    indice: IndiceRubricas
+    reglas: tuple[Regla, ...]
+    pesos: Mapping[str, float]
+
+    @property
+    def rubricas(self) -> tuple[Mapping, ...]:
+        return self.indice.rubricas
+
+
+def _congelar(valor):
+    if isinstance(valor, dict):
+        return MappingProxyType({k: _congelar(v) for k, v in valor.items()})
+    if isinstance(valor, list):
+        return tuple(_congelar(v) for v in valor)
+    return valor
+
+
+def _compilar_catalogo(kind: str, contenido: bytes) -> RubricCatalog:
+    data = json.loads(contenido.decode("utf-8"))
+    arr = data.get("rubrics", data.get("criteria", data)) if isinstance(data, dict) else data
+    if not isinstance(arr, list):
+        arr = [arr]
+    rubricas = tuple(MappingProxyType(normalizar_rubrica(x)) for x in arr if isinstance(x, dict))
+    reglas, pesos = compilar_reglas(data if isinstance(data, dict) else {"rubrics": data})
+    return RubricCatalog(kind=kind, content_hash=hashlib.sha256(contenido).hexdigest(), definiciones=_congelar(data),
+                         indice=IndiceRubricas(rubricas), reglas=tuple(reglas), pesos=MappingProxyType(pesos))
+
+
+_catalogos: dict[str, tuple[tuple, RubricCatalog]] = {}
+_lock = threading.Lock()
+
+
+def obtener_catalogo(rubrics_kind: str) -> RubricCatalog:
+    """
+    Catálogo cacheado en memoria. Se revalida con (mtime, tamaño) del archivo y, si cambió,
+    con el hash de su contenido. Lanza excepción si el archivo falta o es inválido.
+    """
+    path = archivo_rubricas(rubrics_kind)
+    st = path.stat()
+    firma = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        guardado = _catalogos.get(rubrics_kind)
+        if guardado and guardado[0] == firma:
+            return guardado[1]
+        contenido = path.read_bytes()
+        if guardado and guardado[1].content_hash == hashlib.sha256(contenido).hexdigest():
+            _catalogos[rubrics_kind] = (firma, guardado[1])
+            return guardado[1]
+        catalogo = _compilar_catalogo(rubrics_kind, contenido)
+        _catalogos[rubrics_kind] = (firma, catalogo)
+        return catalogo
+
+
+@lru_cache(maxsize=32)
+def _indice_para_claves(claves: tuple) -> IndiceRubricas:
+    return IndiceRubricas(tuple(MappingProxyType(dict(zip(("id", "label", "category", "severity"), c)))
+                                for c in claves))
+
+
+def indice_para(rubricas: list[Mapping]) -> IndiceRubricas:
+    """Índice para una lista arbitraria de rúbricas normalizadas (cacheado por su contenido)."""
+    return _indice_para_claves(tuple((r["id"], r["label"], r.get("category", ""), r["severity"]) for r in rubricas))
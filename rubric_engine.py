@@ -0,0 +1,729 @@
+# rubric_engine.py
+# Motor de rúbricas: compila las verificaciones declaradas en los JSON de rúbricas a funciones registradas
+# y las evalúa contra un índice único del proyecto generado.
+
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Callable, Optional
+
+from constants import RUBRIC_WORKERS
+from parse_cache import ParseCache
+from project_tree import ProjectTree
+
+# Peso de cada verificación dentro de su criterio, según la severidad declarada en el JSON.
+PESO_SEVERIDAD = {"CRIT": 3.0, "critical": 3.0, "high": 2.0, "WARN": 2.0, "medium": 1.0, "INFO": 1.0, "low": 0.5}
+# Severidades de Apigee -> clases que ya usa la UI (sev-CRIT / sev-WARN / sev-INFO).
+_SEVERIDAD_UI = {"critical": "CRIT", "high": "WARN", "medium": "WARN", "low": "INFO"}
+
+
+# --- Índice del proyecto ---
+
+class IndiceArchivos:
+    """
+    Se recorre el proyecto una sola vez: rutas por extensión y por carpeta, y el texto de cada
+    archivo se lee como mucho una vez aunque varias verificaciones lo consulten. Los XML y specs
+    parseados se comparten a través de `parseados`.
+    """
+
+    def __init__(self, tree: ProjectTree):
+        self.tree = tree
+        self.rutas = tree.archivos()
+        self.directorios = set(tree.directorios())
+        self.por_extension: dict[str, list[str]] = defaultdict(list)
+        self.por_directorio: dict[str, list[str]] = defaultdict(list)
+        for rel in self.rutas:
+            carpeta, _, nombre = rel.rpartition("/")
+            self.por_extension[PurePosixPath(nombre).suffix.lower()].append(rel)
+            self.por_directorio[carpeta].append(rel)
+        self._textos: dict[str, str] = {}
+        self._derivados: dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.parseados = ParseCache(tree)
+
+    def existe(self, rel: str) -> bool:
+        return self.tree.is_file(rel)
+
+    def es_dir(self, rel: str) -> bool:
+        return rel.strip("/") in self.directorios
+
+    def en(self, carpeta: str, ext: str | None = None) -> list[str]:
+        """Archivos directamente dentro de `carpeta` (opcionalmente con una extensión)."""
+        rutas = self.por_directorio.get(carpeta.strip("/"), [])
+        return [r for r in rutas if ext is None or r.lower().endswith(ext)]
+
+    def bajo(self, prefijo: str, ext: str) -> list[str]:
+        """Archivos con la extensión dada en cualquier nivel bajo `prefijo`."""
+        prefijo = prefijo.strip("/") + "/" if prefijo else ""
+        return [r for r in self.por_extension.get(ext, []) if r.startswith(prefijo)]
+
+    def texto(self, rel: str) -> str:
+        # Dos hilos pueden leer el mismo archivo a la vez; el resultado es idéntico, no hace falta lock.
+        if rel not in self._textos:
+            self._textos[rel] = self.tree.leer_texto(rel)
+        return self._textos[rel]
+
+    def derivado(self, nombre: str, calcular: Callable[[], object]):
+        """Dato derivado compartido entre verificaciones (p. ej. el OAS parseado); se calcula una vez."""
+        with self._lock:
+            if nombre not in self._derivados:
+                self._derivados[nombre] = calcular()
+            return self._derivados[nombre]
+
+    def alguno_contiene(self, rutas: list[str], patron: str, flags: int = 0) -> list[str]:
+        rx = re.compile(patron, flags)
+        return [r for r in rutas if rx.search(self.texto(r))]
+
+
+# --- Registro de verificaciones ---
+
+@dataclass
+class Resultado:
+    """`ok` es None cuando la verificación no aplica a este proyecto."""
+    ok: Optional[bool]
+    detalle: str = ""
+
+
+_CHECKS: dict[str, Callable[[IndiceArchivos], Resultado]] = {}
+
+
+def registrar(*claves: str):
+    """Registra una función de verificación bajo una o varias claves (verify keys, ids o check keys)."""
+    def decorador(fn):
+        for clave in claves:
+            _CHECKS[clave] = fn
+        return fn
+    return decorador
+
+
+def checks_registrados() -> set[str]:
+    return set(_CHECKS)
+
+
+def _ok(detalle: str = "") -> Resultado:
+    return Resultado(True, detalle)
+
+
+def _falla(detalle: str) -> Resultado:
+    return Resultado(False, detalle)
+
+
+def _no_aplica(detalle: str = "") -> Resultado:
+    return Resultado(None, detalle)
+
+
+def _resultado(condicion: bool, detalle_falla: str) -> Resultado:
+    return _ok() if condicion else _falla(detalle_falla)
+
+
+# --- Verificaciones Mule ---
+
+_MULE = "src/main/mule"
+_API_DIR = "src/main/resources/api"
+_METODOS = ("get", "post", "put", "patch", "delete", "head", "options")
+
+
+def _spec_mule(ix: IndiceArchivos) -> Optional[str]:
+    ramls = ix.en(_API_DIR, ".raml")
+    if ramls:
+        return f"{_API_DIR}/api.raml" if f"{_API_DIR}/api.raml" in ramls else ramls[0]
+    otros = ix.en(_API_DIR, ".yaml") + ix.en(_API_DIR, ".json")
+    return otros[0] if otros else None
+
+
+def _raml(ix: IndiceArchivos) -> Optional[str]:
+    spec = _spec_mule(ix)
+    return spec if spec and spec.endswith(".raml") else None
+
+
+def _bloques_metodo(texto: str) -> list[list[str]]:
+    """Líneas de cada bloque `get:`/`post:`... de un RAML (por indentación)."""
+    bloques, actual, sangria_actual = [], None, -1
+    for linea in texto.splitlines():
+        if not linea.strip() or linea.lstrip().startswith("#"):
+            continue
+        sangria = len(linea) - len(linea.lstrip())
+        if actual is not None and sangria <= sangria_actual:
+            bloques.append(actual)
+            actual = None
+        m = re.match(r"^(\s+)(" + "|".join(_METODOS) + r")\s*:\s*$", linea)
+        if m and actual is None:
+            actual, sangria_actual = [], len(m.group(1))
+        elif actual is not None:
+            actual.append(linea)
+    if actual is not None:
+        bloques.append(actual)
+    return bloques
+
+
+def _referencias_raml(texto: str) -> list[str]:
+    """Rutas de `!include` y de las librerías declaradas en `uses:`."""
+    refs = re.findall(r"!include\s+([^\s,\]}]+)", texto)
+    uses = re.search(r"(?m)^uses:\s*\n((?:[ \t]+.*\n?)+)", texto)
+    if uses:
+        refs += re.findall(r"(?m)^[ \t]+[\w.-]+\s*:\s*([^\s#]+)", uses.group(1))
+    return refs
+
+
+@registrar("raml.parse")
+def _raml_parse(ix: IndiceArchivos) -> Resultado:
+    spec = _spec_mule(ix)
+    if spec is None:
+        return _falla(f"No hay especificación en `{_API_DIR}/`.")
+    if not spec.endswith(".raml"):
+        return _no_aplica("La especificación es OAS.")
+    raml = ix.parseados.spec(spec)
+    if not isinstance(raml, dict):
+        return _falla(f"`{spec}` no es un RAML/YAML válido.")
+    faltan = ["#%RAML 1.0"] if not re.match(r"\s*#%RAML 1\.0", ix.texto(spec)) else []
+    faltan += [campo for campo in ("title", "version", "baseUri") if not raml.get(campo)]
+    return _resultado(not faltan, f"`{spec}` no declara: {', '.join(faltan)}.")
+
+
+@registrar("raml.resolve", "A2_LIB_TYPES_RESOLUTION")
+def _raml_resolve(ix: IndiceArchivos) -> Resultado:
+    spec = _raml(ix)
+    if spec is None:
+        return _no_aplica()
+    base = PurePosixPath(spec).parent
+    rotas = []
+    for ref in _referencias_raml(ix.texto(spec)):
+        if ref.startswith(("http://", "https://", "exchange_modules/")):
+            continue  # se resuelven en el build (fetch de Exchange)
+        destino = (base / ref).as_posix()
+        partes = []
+        for parte in destino.split("/"):
+            if parte == "..":
+                partes = partes[:-1]
+            elif parte != ".":
+                partes.append(parte)
+        if not ix.existe("/".join(partes)):
+            rotas.append(ref)
+    return _resultado(not rotas, f"Referencias sin resolver: {', '.join(sorted(set(rotas))[:5])}.")
+
+
+@registrar("uses.common-responses")
+def _uses_common_responses(ix: IndiceArchivos) -> Resultado:
+    spec = _raml(ix)
+    if spec is None:
+        return _no_aplica()
+    refs = _referencias_raml(ix.texto(spec))
+    return _resultado(any("common-responses" in r for r in refs), "El RAML no usa la librería `common-responses`.")
+
+
+@registrar("traits.responsesXXX")
+def _traits_responses(ix: IndiceArchivos) -> Resultado:
+    spec = _raml(ix)
+    if spec is None:
+        return _no_aplica()
+    return _resultado(bool(re.search(r"responses\d{3}", ix.texto(spec))),
+                      "No se aplican traits `responsesXXX` a las operaciones.")
+
+
+@registrar("responses.2xx", "B1_METHOD_2XX")
+def _responses_2xx(ix: IndiceArchivos) -> Resultado:
+    spec = _raml(ix)
+    if spec is None:
+        return _no_aplica()
+    bloques = _bloques_metodo(ix.texto(spec))
+    sin_2xx = sum(1 for b in bloques if not any(re.match(r"^\s+2\d\d\s*:", l) or re.search(r"responses2\d\d", l)
+                                                 for l in b))
+    if not bloques:
+        return _falla("El RAML no declara operaciones.")
+    return _resultado(sin_2xx == 0, f"{sin_2xx} de {len(bloques)} operaciones sin respuesta 2xx.")
+
+
+@registrar("examples")
+def _examples(ix: IndiceArchivos) -> Resultado:
+    spec = _raml(ix)
+    if spec is None:
+        return _no_aplica()
+    return _resultado(bool(re.search(r"(?m)^\s+examples?\s*:", ix.texto(spec))), "El RAML no incluye ejemplos.")
+
+
+@registrar("A4_SECURITY_OR_HEADERS")
+def _seguridad_o_headers(ix: IndiceArchivos) -> Resultado:
+    spec = _spec_mule(ix)
+    if spec is None:
+        return _no_aplica()
+    texto = ix.texto(spec)
+    return _resultado(bool(re.search(r"securitySchemes|securedBy|consumerRequestId", texto)),
+                      "Sin securitySchemes/securedBy ni headers comunes (consumerRequestId, token).")
+
+
+@registrar("C2_TRIPLET_COMPLETENESS")
+def _tripleta(ix: IndiceArchivos) -> Resultado:
+    conteo = {capa: len(ix.en(f"{_MULE}/{capa}", ".xml")) for capa in ("client", "handler", "orchestrator")}
+    if not any(conteo.values()):
+        return _falla("No hay flujos client/handler/orchestrator.")
+    return _resultado(len(set(conteo.values())) == 1,
+                      "Tripletas incompletas: " + ", ".join(f"{k}={v}" for k, v in conteo.items()) + ".")
+
+
+@registrar("C3_APIKIT_RESOLUTION")
+def _apikit_resolution(ix: IndiceArchivos) -> Resultado:
+    apis = [c["api"] for _, c in ix.parseados.hallazgos("apikit_configs", ix.bajo(_MULE, ".xml")) if c["api"]]
+    if not apis:
+        return _falla("No se encontró `apikit:config`.")
+    rotas = [a for a in apis if not a.startswith("resource::") and not ix.existe(f"{_API_DIR}/{a}")]
+    return _resultado(not rotas, f"`apikit:config` apunta a especificaciones inexistentes: {', '.join(rotas)}.")
+
+
+@registrar("C4_NAMING_CONVENTION")
+def _naming(ix: IndiceArchivos) -> Resultado:
+    malos = []
+    for capa in ("client", "handler", "orchestrator"):
+        patron = re.compile(rf"^[a-z]+(?:-[a-z0-9]+)+-{capa}\.xml$")
+        malos += [r for r in ix.en(f"{_MULE}/{capa}", ".xml") if not patron.match(r.rsplit("/", 1)[-1])]
+    return _resultado(not malos, f"Nombres fuera de convención: {', '.join(m.rsplit('/', 1)[-1] for m in malos[:5])}.")
+
+
+@registrar("C5_COMMON_STRUCTURE")
+def _estructura_comun(ix: IndiceArchivos) -> Resultado:
+    esperadas = [f"{_MULE}/{d}" for d in ("client", "handler", "orchestrator", "common")]
+    esperadas += ["src/main/resources/dwl", "src/test/munit"]
+    faltan = [d for d in esperadas if not ix.es_dir(d)]
+    return _resultado(not faltan, f"Faltan carpetas: {', '.join(faltan)}.")
+
+
+@registrar("D1_HEADERS_VALIDATION_SUBFLOW")
+def _subflow_headers(ix: IndiceArchivos) -> Resultado:
+    subflows = [f for _, f in ix.parseados.hallazgos("flows", ix.bajo(_MULE, ".xml")) if f["tipo"] == "sub-flow"]
+    return _resultado(any("CUSTOM" in t for f in subflows for t in f["raise_errors"]),
+                      "No hay un subflow que valide headers con `raise-error` CUSTOM.")
+
+
+@registrar("D2_ERROR_HANDLER_GLOBAL")
+def _error_handler(ix: IndiceArchivos) -> Resultado:
+    handlers = ix.parseados.hallazgos("error_handlers", ix.bajo(_MULE, ".xml"))
+    if not handlers:
+        return _falla("No se encontró un `error-handler` global.")
+    tipos = [t for _, h in handlers for t in h["tipos"]]
+    faltan = [p for p in ("APIKIT:", "HTTP:") if not any(t.startswith(p) for t in tipos)]
+    return _resultado(not faltan, f"El error-handler no cubre: {', '.join(faltan)}.")
+
+
+@registrar("D3_LOGGING_CORRELATION")
+def _logging_correlation(ix: IndiceArchivos) -> Resultado:
+    return _resultado(bool(ix.alguno_contiene(ix.bajo(_MULE, ".xml"), r"correlationId")),
+                      "No se propaga `correlationId` en el logging.")
+
+
+@registrar("D4_AUTODISCOVERY_READY")
+def _autodiscovery(ix: IndiceArchivos) -> Resultado:
+    en_xml = ix.parseados.hallazgos("autodiscovery", ix.bajo(_MULE, ".xml"))
+    en_props = ix.alguno_contiene(ix.bajo("src/main/resources", ".yaml"), r"(?i)apiId")
+    return _resultado(bool(en_xml or en_props), "No hay `apiId`/autodiscovery configurado.")
+
+
+@registrar("E2_DW_UTILS_MODULES")
+def _dw_modules(ix: IndiceArchivos) -> Resultado:
+    return _resultado(bool(ix.en("src/main/resources/modules", ".dwl")),
+                      "No hay módulos DataWeave utilitarios en `src/main/resources/modules/`.")
+
+
+@registrar("E3_DW_ERROR_MAPPINGS")
+def _dw_errores(ix: IndiceArchivos) -> Resultado:
+    nombres = {r.rsplit("/", 1)[-1].split(".")[0] for r in ix.bajo("src/main/resources/dwl", ".dwl")}
+    faltan = [c for c in ("400", "401", "403", "404", "408", "500") if c not in nombres]
+    return _resultado(not faltan, f"Faltan DWs de error: {', '.join(faltan)}.")
+
+
+@registrar("F1_PROPERTIES_ENV")
+def _properties_env(ix: IndiceArchivos) -> Resultado:
+    props = [r for r in ix.bajo("src/main/resources", ".yaml") + ix.bajo("src/main/resources", ".properties")
+             if "propert" in r]
+    entornos = {e for e in ("local", "dev", "qa", "prod") if any(f"{e}-" in r.rsplit("/", 1)[-1] for r in props)}
+    return _resultado(len(entornos) >= 3, f"Properties por entorno incompletas (encontradas: {sorted(entornos)}).")
+
+
+@registrar("F2_SECURE_PROPERTIES")
+def _secure_properties(ix: IndiceArchivos) -> Resultado:
+    return _resultado(bool(ix.parseados.hallazgos("secure_properties", ix.bajo(_MULE, ".xml"))),
+                      "No se usa `secure-properties:config` para credenciales.")
+
+
+@registrar("G1_MUNIT_HAPPY_PATH")
+def _munit(ix: IndiceArchivos) -> Resultado:
+    return _resultado(bool(ix.alguno_contiene(ix.bajo("src/test/munit", ".xml"), r"<munit:test\b")),
+                      "No hay pruebas MUnit.")
+
+
+@registrar("G2_MUNIT_ERRORS")
+def _munit_errores(ix: IndiceArchivos) -> Resultado:
+    suites = ix.bajo("src/test/munit", ".xml")
+    if not suites:
+        return _no_aplica()
+    return _resultado(bool(ix.alguno_contiene(suites, r"expectedErrorType|statusCode\W+(?:4|5)\d\d")),
+                      "Las pruebas MUnit no cubren respuestas de error.")
+
+
+@registrar("H1_RUNTIME_COMPAT")
+def _runtime(ix: IndiceArchivos) -> Resultado:
+    if not ix.existe("mule-artifact.json"):
+        return _falla("Falta `mule-artifact.json`.")
+    texto = ix.texto("mule-artifact.json")
+    m = re.search(r"\"minMuleVersion\"\s*:\s*\"4\.(\d+)", texto)
+    return _resultado(bool(m and int(m.group(1)) >= 6 and "17" in texto),
+                      "`mule-artifact.json` no declara Mule 4.6+ con Java 17.")
+
+
+@registrar("H2_MMP_CONFIG")
+def _mmp(ix: IndiceArchivos) -> Resultado:
+    if not ix.existe("pom.xml"):
+        return _falla("Falta `pom.xml`.")
+    return _resultado("mule-maven-plugin" in ix.texto("pom.xml"), "El pom no configura `mule-maven-plugin`.")
+
+
+# --- Verificaciones Apigee ---
+
+def _apiproxy(ix: IndiceArchivos) -> Optional[str]:
+    def buscar():
+        candidatos = sorted(d for d in ix.directorios if d == "apiproxy" or d.endswith("/apiproxy"))
+        return candidatos[0] if candidatos else None
+    return ix.derivado("apiproxy", buscar)
+
+
+def _politicas(ix: IndiceArchivos, apiproxy: str) -> dict[str, str]:
+    """Nombre de política -> tipo (elemento raíz del XML)."""
+    return ix.derivado(f"politicas:{apiproxy}", lambda: ix.parseados.politicas(ix.en(f"{apiproxy}/policies", ".xml")))
+
+
+def _endpoints(ix: IndiceArchivos, apiproxy: str, carpeta: str) -> list[str]:
+    return ix.en(f"{apiproxy}/{carpeta}", ".xml")
+
+
+def _oas_apigee(ix: IndiceArchivos, apiproxy: str) -> Optional[dict]:
+    def cargar():
+        for ext in (".json", ".yaml", ".yml"):
+            for rel in ix.en(f"{apiproxy}/resources/oas", ext):
+                data = ix.parseados.spec(rel)
+                if isinstance(data, dict) and "paths" in data:
+                    return data
+        return None
+    return ix.derivado(f"oas:{apiproxy}", cargar)
+
+
+def _operaciones(oas: dict) -> int:
+    return sum(1 for item in (oas.get("paths") or {}).values() if isinstance(item, dict)
+               for metodo in item if metodo.lower() in _METODOS)
+
+
+def _esquemas_oas(oas: dict) -> set[str]:
+    esquemas = (oas.get("components") or {}).get("securitySchemes") or oas.get("securityDefinitions") or {}
+    tipos = set()
+    for esquema in esquemas.values():
+        if isinstance(esquema, dict):
+            tipos.add(str(esquema.get("type", "")).lower())
+            if str(esquema.get("scheme", "")).lower() == "bearer":
+                tipos.add("bearer")
+    return tipos
+
+
+def _pasos_preflow(ix: IndiceArchivos, apiproxy: str) -> list[str]:
+    endpoints = _endpoints(ix, apiproxy, "proxies") + _endpoints(ix, apiproxy, "targets")
+    return [paso for _, p in ix.parseados.hallazgos("apigee_preflow", endpoints) for paso in p["steps"]]
+
+
+def _preflow_con(tipo: str, *pistas: str):
+    """Verificación: algún paso del PreFlow es una política `tipo` (o un FlowCallout cuyo nombre lo sugiere)."""
+    def verificar(ix: IndiceArchivos) -> Resultado:
+        apiproxy = _apiproxy(ix)
+        if apiproxy is None:
+            return _falla("No hay carpeta `apiproxy`.")
+        politicas = _politicas(ix, apiproxy)
+        for paso in _pasos_preflow(ix, apiproxy):
+            if politicas.get(paso) == tipo or any(p.lower() in paso.lower() for p in pistas):
+                return _ok()
+        return _falla(f"El PreFlow no incluye una política {tipo}.")
+    return verificar
+
+
+registrar("preflow.spikearrest.present")(_preflow_con("SpikeArrest", "SpikeArrest", "SA-"))
+registrar("preflow.quota.present")(_preflow_con("Quota", "Quota", "Q-"))
+registrar("preflow.json_threat_protection.present")(_preflow_con("JSONThreatProtection", "JTP-", "ThreatProtection"))
+
+
+@registrar("has_apiproxy_root")
+def _has_apiproxy(ix: IndiceArchivos) -> Resultado:
+    return _resultado(_apiproxy(ix) is not None, "No se encontró la carpeta `apiproxy`.")
+
+
+@registrar("has_apiproxy_descriptor")
+def _descriptor(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    if apiproxy is None:
+        return _falla("No hay carpeta `apiproxy`.")
+    raices = ix.parseados.raices(ix.en(apiproxy, ".xml"))
+    return _resultado(any(doc.raiz_tag == "APIProxy" for doc in raices.values()),
+                      "Falta el descriptor `<APIProxy>` en la raíz de `apiproxy/`.")
+
+
+@registrar("proxy.basepath.from_servers")
+def _basepath(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    if apiproxy is None:
+        return _falla("No hay carpeta `apiproxy`.")
+    basepaths = ix.parseados.hallazgos("apigee_basepath", _endpoints(ix, apiproxy, "proxies"))
+    return _resultado(any(b.startswith("/") for _, b in basepaths),
+                      "El ProxyEndpoint no define `BasePath`.")
+
+
+@registrar("proxy.virtualhost.configured")
+def _virtualhost(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    if apiproxy is None:
+        return _falla("No hay carpeta `apiproxy`.")
+    return _resultado(any(v for _, v in ix.parseados.hallazgos("apigee_virtualhosts", _endpoints(ix, apiproxy, "proxies"))),
+                      "El ProxyEndpoint no define `VirtualHost`.")
+
+
+@registrar("flow.per_operation")
+def _flow_por_operacion(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    oas = _oas_apigee(ix, apiproxy) if apiproxy else None
+    if oas is None:
+        return _no_aplica("No hay OAS en `resources/oas/`.")
+    flows = len(ix.parseados.hallazgos("apigee_flows", _endpoints(ix, apiproxy, "proxies")))
+    operaciones = _operaciones(oas)
+    return _resultado(flows >= operaciones, f"{flows} flows para {operaciones} operaciones del OAS.")
+
+
+@registrar("flow.condition.matchespath_and_verb")
+def _flow_condiciones(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    if apiproxy is None:
+        return _falla("No hay carpeta `apiproxy`.")
+    flows = ix.parseados.hallazgos("apigee_flows", _endpoints(ix, apiproxy, "proxies"))
+    malos = [f for _, f in flows if not ("MatchesPath" in f["condition"] and "request.verb" in f["condition"])]
+    return _resultado(not malos, f"{len(malos)} flows sin condición MatchesPath + request.verb.")
+
+
+def _seguridad_condicional(tipos_oas: set[str], tipos_politica: tuple[str, ...], pistas: tuple[str, ...], nombre: str):
+    def verificar(ix: IndiceArchivos) -> Resultado:
+        apiproxy = _apiproxy(ix)
+        oas = _oas_apigee(ix, apiproxy) if apiproxy else None
+        if oas is None or not (_esquemas_oas(oas) & tipos_oas):
+            return _no_aplica(f"El OAS no declara {nombre}.")
+        politicas = _politicas(ix, apiproxy)
+        presente = any(t in tipos_politica for t in politicas.values()) or \
+            any(p.lower() in n.lower() for n in politicas for p in pistas)
+        return _resultado(presente, f"El OAS declara {nombre} pero no hay política que lo verifique.")
+    return verificar
+
+
+registrar("security.apikey.verify")(_seguridad_condicional({"apikey"}, ("VerifyAPIKey",), ("VAK-",), "apiKey"))
+registrar("security.oauth2_or_jwt.verify")(_seguridad_condicional(
+    {"oauth2", "openidconnect", "bearer"}, ("OAuthV2", "VerifyJWT"), ("OA-", "JWT-", "VerifyToken"), "OAuth2/bearer"))
+
+
+@registrar("security.global_or_operation_level")
+def _seguridad_alcance(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    oas = _oas_apigee(ix, apiproxy) if apiproxy else None
+    if oas is None or not _esquemas_oas(oas):
+        return _no_aplica()
+    por_operacion = any(isinstance(op, dict) and "security" in op
+                        for item in (oas.get("paths") or {}).values() if isinstance(item, dict)
+                        for op in item.values())
+    return _resultado("security" in oas or por_operacion, "El OAS define esquemas pero no los aplica.")
+
+
+def _raisefaults(ix: IndiceArchivos, apiproxy: str) -> list[str]:
+    raices = ix.parseados.raices(ix.en(f"{apiproxy}/policies", ".xml"))
+    return [rel for rel, doc in raices.items() if doc.raiz_tag == "RaiseFault"]
+
+
+@registrar("fault.401_403_429_500.policies")
+def _faults(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    if apiproxy is None:
+        return _falla("No hay carpeta `apiproxy`.")
+    codigos = {c for _, c in ix.parseados.hallazgos("status_codes", _raisefaults(ix, apiproxy))}
+    faltan = [c for c in ("401", "403", "429", "500") if c not in codigos]
+    return _resultado(not faltan, f"Faltan RaiseFault para: {', '.join(faltan)}.")
+
+
+@registrar("fault.payload.json")
+def _fault_json(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    faults = _raisefaults(ix, apiproxy) if apiproxy else []
+    if not faults:
+        return _falla("No hay políticas RaiseFault.")
+    malos = [r for r in faults
+             if not any(p["contentType"] == "application/json" for p in ix.parseados.xml(r).lookup("payloads"))]
+    return _resultado(not malos, f"{len(malos)} RaiseFault sin payload JSON.")
+
+
+@registrar("assignmessage.correlation_id")
+def _correlation(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    if apiproxy is None:
+        return _falla("No hay carpeta `apiproxy`.")
+    return _resultado(bool(ix.alguno_contiene(ix.en(f"{apiproxy}/policies", ".xml"), r"X-Correlation-Id", re.I)),
+                      "Ningún AssignMessage define `X-Correlation-Id`.")
+
+
+@registrar("target.url_or_server")
+def _target_url(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    if apiproxy is None:
+        return _falla("No hay carpeta `apiproxy`.")
+    conexiones = ix.parseados.hallazgos("apigee_targets", _endpoints(ix, apiproxy, "targets"))
+    return _resultado(any(c["url"] or c["servers"] for _, c in conexiones),
+                      "El TargetEndpoint no define URL ni TargetServer.")
+
+
+@registrar("target.timeouts")
+def _target_timeouts(ix: IndiceArchivos) -> Resultado:
+    apiproxy = _apiproxy(ix)
+    targets = _endpoints(ix, apiproxy, "targets") if apiproxy else []
+    if not targets:
+        return _falla("No hay TargetEndpoint.")
+    propiedades = {p for _, c in ix.parseados.hallazgos("apigee_targets", targets) for p in c["properties"]}
+    faltan = [p for p in ("connect.timeout.millis", "io.timeout.millis") if p not in propiedades]
+    return _resultado(not faltan, f"El TargetEndpoint no define: {', '.join(faltan)}.")
+
+
+# --- Compilación y evaluación ---
+
+@dataclass(frozen=True)
+class Regla:
+    id: str
+    criterio: str
+    descripcion: str
+    severidad: str  # CRIT / WARN / INFO (clases de la UI)
+    peso: float
+    claves: tuple[str, ...]
+    # Acción correctiva declarada (`action_on_fail` en Apigee, `check.action` si la rúbrica Mule tiene
+    # `autofix: true`); vacía si la regla no admite corrección automática.
+    accion: str = ""
+
+
+@dataclass
+class ResultadoRegla:
+    regla: Regla
+    estado: str  # ok / falla / no_aplica / sin_verificador
+    detalle: str = ""
+
+
+@dataclass
+class PuntajeCriterio:
+    id: str
+    peso: float
+    obtenido: float = 0.0
+    posible: float = 0.0
+
+    @property
+    def puntaje(self) -> Optional[float]:
+        return round(self.obtenido / self.posible, 3) if self.posible else None
+
+
+@dataclass
+class ResultadoRubricas:
+    reglas: list[ResultadoRegla] = field(default_factory=list)
+    criterios: dict[str, PuntajeCriterio] = field(default_factory=dict)
+
+    @property
+    def fallidas(self) -> list[ResultadoRegla]:
+        return [r for r in self.reglas if r.estado == "falla"]
+
+    @property
+    def puntaje_total(self) -> Optional[float]:
+        evaluados = [c for c in self.criterios.values() if c.puntaje is not None]
+        peso = sum(c.peso for c in evaluados)
+        return round(sum(c.peso * c.puntaje for c in evaluados) / peso, 3) if peso else None
+
+
+def compilar_reglas(definiciones: dict) -> tuple[list[Regla], dict[str, float]]:
+    """
+    Traduce el JSON de rúbricas a reglas ejecutables. Soporta el formato Mule (`rubrics[]` con
+    `check.verify`) y el de Apigee (`criteria[]` ponderados con `checks[].key`).
+    Devuelve las reglas y el peso de cada criterio.
+    """
+    reglas, pesos = [], {}
+    for r in definiciones.get("rubrics") or []:
+        if not isinstance(r, dict) or not r.get("enabled", True):
+            continue
+        severidad = (r.get("severity") or "WARN").upper()
+        verify = list((r.get("check") or {}).get("verify") or [])
+        claves = tuple(dict.fromkeys(c for c in [*verify, r.get("id", "")] if c in _CHECKS))
+        criterio = r.get("category") or "General"
+        pesos.setdefault(criterio, 1.0)
+        accion = ((r.get("check") or {}).get("action") or "autofix") if r.get("autofix") else ""
+        reglas.append(Regla(id=r.get("id", ""), criterio=criterio,
+                            descripcion=r.get("criterion") or r.get("description") or "",
+                            severidad=severidad, peso=PESO_SEVERIDAD.get(severidad, 1.0), claves=claves,
+                            accion=accion))
+
+    for c in definiciones.get("criteria") or []:
+        if not isinstance(c, dict):
+            continue
+        pesos[c.get("id", "")] = float(c.get("weight", 1.0))
+        for chk in c.get("checks") or []:
+            severidad = str(chk.get("severity", "medium")).lower()
+            clave = chk.get("key", "")
+            reglas.append(Regla(id=clave, criterio=c.get("id", ""), descripcion=c.get("description", ""),
+                                severidad=_SEVERIDAD_UI.get(severidad, "WARN"),
+                                peso=PESO_SEVERIDAD.get(severidad, 1.0),
+                                claves=(clave,) if clave in _CHECKS else (),
+                                accion=chk.get("action_on_fail") or ""))
+    return reglas, pesos
+
+
+def _ejecutar(clave: str, ix: IndiceArchivos) -> Resultado:
+    try:
+        return _CHECKS[clave](ix)
+    except Exception as e:  # una verificación rota no debe tumbar el análisis
+        return _falla(f"Error al verificar '{clave}': {e}")
+
+
+def evaluar(tree: ProjectTree, reglas: list[Regla], pesos: dict[str, float],
+            max_workers: int = RUBRIC_WORKERS) -> ResultadoRubricas:
+    """
+    Evalúa las reglas sobre un índice único del proyecto. Cada clave de verificación se ejecuta
+    una sola vez aunque varias reglas la compartan, y las claves independientes corren en paralelo.
+    """
+    ix = IndiceArchivos(tree)
+    claves = list(dict.fromkeys(c for r in reglas for c in r.claves))
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        resultados = dict(zip(claves, pool.map(lambda c: _ejecutar(c, ix), claves)))
+
+    salida = []
+    for regla in reglas:
+        if not regla.claves:
+            salida.append(ResultadoRegla(regla, "sin_verificador"))
+            continue
+        aplicables = [resultados[c] for c in regla.claves if resultados[c].ok is not None]
+        if not aplicables:
+            salida.append(ResultadoRegla(regla, "no_aplica", resultados[regla.claves[0]].detalle))
+            continue
+        fallas = [r.detalle for r in aplicables if not r.ok]
+        salida.append(ResultadoRegla(regla, "falla" if fallas else "ok", " ".join(fallas)))
+    return _puntuar(salida, pesos)
+
+
+def reevaluar(tree: ProjectTree, previo: ResultadoRubricas, reglas: list[Regla],
+              pesos: dict[str, float]) -> ResultadoRubricas:
+    """
+    Vuelve a evaluar solo `reglas` (p. ej. las que tocó una corrección) sobre `tree` y recalcula
+    los puntajes conservando el resultado previo del resto.
+    """
+    nuevos = {r.regla: r for r in evaluar(tree, reglas, pesos).reglas}
+    return _puntuar([nuevos.get(r.regla, r) for r in previo.reglas], pesos)
+
+
+def _puntuar(reglas: list[ResultadoRegla], pesos: dict[str, float]) -> ResultadoRubricas:
+    salida = ResultadoRubricas(reglas=reglas,
+                               criterios={cid: PuntajeCriterio(cid, peso) for cid, peso in pesos.items()})
+    for r in reglas:
+        if r.estado not in ("ok", "falla"):
+            continue
+        criterio = salida.criterios.setdefault(r.regla.criterio, PuntajeCriterio(r.regla.criterio, 1.0))
+        criterio.posible += r.regla.peso
+        if r.estado == "ok":
+            criterio.obtenido += r.regla.peso
+    return salida
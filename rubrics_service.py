@@ -1,37 +1,34 @@
 # rubrics_service.py
 # Lógica para cargar y aplicar las rúbricas de calidad a un proyecto generado.
 
-import json
-import re
+import html
 from pathlib import Path
-import streamlit as st
+
+from project_tree import ProjectTree
+from rubric_catalog import archivo_rubricas, indice_para, obtener_catalogo
+from rubric_engine import ResultadoRubricas, evaluar
+from tracing import span
 
 
 # (Estas funciones son adaptadas de tu script original)
 
-def _normalize_rubric_item(item: dict) -> dict:
-    return {
-        "id": item.get("id") or "",
-        "label": item.get("label") or "",
-        "category": item.get("category") or "",
-        "severity": (item.get("severity") or "WARN").upper(),
-        "enabled": item.get("enabled", True),
-    }
+def leer_rubricas(rubrics_kind: str) -> list[dict]:
+    """
+    Rúbricas normalizadas sin depender de la UI (copias del catálogo cacheado).
+    Lanza excepción si el archivo falta o es inválido.
+    """
+    return [dict(r) for r in obtener_catalogo(rubrics_kind).rubricas]
 
 
 def cargar_rubricas(rubrics_kind: str) -> list[dict]:
     """Carga las definiciones de rúbricas desde un archivo JSON en la raíz."""
-    filename = "Rubrics_Generation_Mule.json" if rubrics_kind == "mule" else "Rubricas_Scaffold_Apigee.json"
-    path = Path(filename)
-    if not path.exists():
+    import streamlit as st  # solo esta función es de UI: el resto del módulo se usa también sin Streamlit
+    filename = archivo_rubricas(rubrics_kind).name
+    if not archivo_rubricas(rubrics_kind).exists():
         st.sidebar.warning(f"⚠️ No se encontró el archivo de rúbricas '{filename}'.")
         return []
     try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        arr = data.get("rubrics", data)
-        if not isinstance(arr, list): arr = [arr]
-
-        rubrics = [_normalize_rubric_item(x) for x in arr if isinstance(x, dict)]
+        rubrics = leer_rubricas(rubrics_kind)
         st.sidebar.success(f"✅ {len(rubrics)} rúbricas ({rubrics_kind}) cargadas desde '{filename}'.")
         return rubrics
     except Exception as e:
@@ -39,45 +36,45 @@ def cargar_rubricas(rubrics_kind: str) -> list[dict]:
         return []
 
 
-def _rubric_observaciones_basic_mule(root: Path) -> list[str]:
+def _rubric_observaciones_basic_mule(root: ProjectTree) -> list[str]:
     """Realiza validaciones básicas de estructura para proyectos Mule."""
     notes = []
-    base = root / "src/main/mule"
-    if not base.exists():
+    base = "src/main/mule"
+    if not root.is_dir(base):
         notes.append("[Estructura] Falta la carpeta principal `src/main/mule/`.")
         return notes
 
     for d in ["client", "handler", "orchestrator", "common"]:
-        if not (base / d).exists():
+        if not root.is_dir(f"{base}/{d}"):
             notes.append(f"[Estructura] Falta la carpeta `src/main/mule/{d}/`.")
 
-    if not (root / "pom.xml").exists(): notes.append("[Activos] Falta el archivo `pom.xml`.")
-    if not (root / "mule-artifact.json").exists(): notes.append("[Activos] Falta el archivo `mule-artifact.json`.")
+    if not root.exists("pom.xml"): notes.append("[Activos] Falta el archivo `pom.xml`.")
+    if not root.exists("mule-artifact.json"): notes.append("[Activos] Falta el archivo `mule-artifact.json`.")
 
     # Aquí puedes añadir más validaciones del script original si lo deseas...
     return notes
 
 
-def _rubric_observaciones_basic_apigee(root: Path) -> list[str]:
+def _rubric_observaciones_basic_apigee(root: ProjectTree) -> list[str]:
     """Realiza validaciones básicas de estructura para proyectos Apigee."""
     notes = []
-    try:
-        apiproxy_dir = next(root.glob("**/apiproxy"))
-        if not (apiproxy_dir / "proxies/default.xml").exists():
-            notes.append("[Apigee] Falta el archivo `proxies/default.xml`.")
-        if not (apiproxy_dir / "targets/backend.xml").exists():
-            notes.append("[Apigee] Falta el archivo `targets/backend.xml`.")
-        if not list((apiproxy_dir / "policies").glob("*.xml")):
-            notes.append("[Apigee] No se encontraron políticas en la carpeta `policies/`.")
-    except StopIteration:
+    candidatos = root.glob("**/apiproxy")
+    if not candidatos:
         notes.append("[Apigee] No se encontró la carpeta `apiproxy` en el proyecto.")
+        return notes
+
+    apiproxy_dir = candidatos[0]
+    if not root.exists(f"{apiproxy_dir}/proxies/default.xml"):
+        notes.append("[Apigee] Falta el archivo `proxies/default.xml`.")
+    if not root.exists(f"{apiproxy_dir}/targets/backend.xml"):
+        notes.append("[Apigee] Falta el archivo `targets/backend.xml`.")
+    if not root.glob(f"{apiproxy_dir}/policies/*.xml"):
+        notes.append("[Apigee] No se encontraron políticas en la carpeta `policies/`.")
     return notes
 
 
-def analizar_proyecto_con_rubricas(project_path: Path, rubrics_kind: str, rubrics_defs: list[dict]) -> list[str]:
-    """
-    Punto de entrada principal para analizar un proyecto y devolver las observaciones.
-    """
+def _observaciones_basicas(project_path: ProjectTree, rubrics_kind: str, rubrics_defs: list[dict]) -> list[str]:
+    """Validaciones de estructura fijas, adornadas con la severidad de la rúbrica que coincida."""
     if rubrics_kind == "mule":
         base_notes = _rubric_observaciones_basic_mule(project_path)
     else:  # apigee
@@ -87,18 +84,58 @@ def analizar_proyecto_con_rubricas(project_path: Path, rubrics_kind: str, rubric
     if not rubrics_defs:
         return [f"<span class='sev-WARN'><b>[WARN]</b></span> {note}" for note in base_notes]
 
-    # Lógica para adornar las notas con la severidad de las rúbricas (simplificada)
+    # Cada nota se asocia a su rúbrica con una sola pasada del autómata de ids/labels
+    indice = indice_para(rubrics_defs)
     adorned_notes = []
     for note in base_notes:
-        matched_rubric = None
-        note_l = note.lower()
-        for rubric in rubrics_defs:
-            if any(kw in note_l for kw in (rubric['id'].lower(), rubric['label'].lower())):
-                matched_rubric = rubric
-                break
-
+        matched_rubric = indice.rubrica_para(note)
         sev = matched_rubric['severity'] if matched_rubric else "WARN"
         rid = f"({matched_rubric['id']})" if matched_rubric else ""
         adorned_notes.append(f"<span class='sev-{sev}'><b>[{sev}]</b></span> {rid} {note}")
 
-    return adorned_notes
\ No newline at end of file
+    return adorned_notes
+
+
+def evaluar_proyecto(project: ProjectTree, rubrics_kind: str) -> ResultadoRubricas | None:
+    """Ejecuta las verificaciones declaradas en el JSON de rúbricas; None si no se pudo leer."""
+    try:
+        catalogo = obtener_catalogo(rubrics_kind)
+    except (OSError, ValueError) as e:
+        print(f"Advertencia: No se pudieron leer las rúbricas '{rubrics_kind}': {e}")
+        return None
+    return evaluar(project, list(catalogo.reglas), dict(catalogo.pesos))
+
+
+def _observaciones_motor(resultado: ResultadoRubricas | None) -> list[str]:
+    if resultado is None:
+        return []
+    return [f"<span class='sev-{r.regla.severidad}'><b>[{r.regla.severidad}]</b></span> ({r.regla.id}) "
+            f"[{r.regla.criterio}] {html.escape(r.detalle or r.regla.descripcion)}"
+            for r in resultado.fallidas]
+
+
+def analizar_con_puntaje(project_path: ProjectTree | Path, rubrics_kind: str,
+                         rubrics_defs: list[dict]) -> tuple[list[str], ResultadoRubricas | None]:
+    """Como `analizar_proyecto_con_rubricas`, pero devuelve también el puntaje por criterio."""
+    if not isinstance(project_path, ProjectTree):
+        project_path = ProjectTree.desde_directorio(project_path)
+    with span("rubricas", tipo=rubrics_kind) as s:
+        resultado = evaluar_proyecto(project_path, rubrics_kind)
+        observaciones = observaciones_de(project_path, rubrics_kind, rubrics_defs, resultado)
+        s.atributos["observaciones"] = len(observaciones)
+    return observaciones, resultado
+
+
+def observaciones_de(project: ProjectTree, rubrics_kind: str, rubrics_defs: list[dict],
+                     resultado: ResultadoRubricas | None) -> list[str]:
+    """Observaciones de un resultado ya evaluado (p. ej. tras las correcciones automáticas)."""
+    return _observaciones_basicas(project, rubrics_kind, rubrics_defs) + _observaciones_motor(resultado)
+
+
+def analizar_proyecto_con_rubricas(project_path: ProjectTree | Path, rubrics_kind: str,
+                                   rubrics_defs: list[dict]) -> list[str]:
+    """
+    Punto de entrada principal para analizar un proyecto y devolver las observaciones.
+    Acepta el árbol en memoria que produce el generador o, por compatibilidad, un directorio.
+    """
+    return analizar_con_puntaje(project_path, rubrics_kind, rubrics_defs)[0]
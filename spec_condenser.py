@@ -0,0 +1,200 @@
+# spec_condenser.py
+# Vista condensada de la especificación (OAS/RAML) que entra en el prompt, acotada por un presupuesto de tokens.
+
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+import yaml
+
+from constants import SPEC_TOKEN_BUDGET
+from spec_extractor import RamlLoader, detectar_tipo
+
+_YAMLLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_METODOS = ("get", "post", "put", "patch", "delete", "head", "options", "trace")
+_MAX_DESCRIPCION = 200
+
+
+@lru_cache(maxsize=1)
+def _codificador() -> Optional[Callable[[str], list]]:
+    """`tiktoken` es opcional: sin él (o sin su vocabulario) se estima ~4 caracteres por token."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base").encode
+    except Exception:
+        return None
+
+
+def contar_tokens(texto: str) -> int:
+    codificar = _codificador()
+    if codificar is not None:
+        return len(codificar(texto))
+    return (len(texto) + 3) // 4
+
+
+@dataclass(frozen=True)
+class SpecCondensada:
+    texto: str
+    kind: str
+    tokens_originales: int
+    tokens_condensados: int
+    nivel: int  # 0 = original, 1-3 = menos detalle por operación, 4 = rutas recortadas o texto truncado
+
+    @property
+    def ahorro(self) -> float:
+        return 1 - self.tokens_condensados / self.tokens_originales if self.tokens_originales else 0.0
+
+
+def _recortar(valor: Any) -> Any:
+    if isinstance(valor, str) and len(valor) > _MAX_DESCRIPCION:
+        return valor[:_MAX_DESCRIPCION].rstrip() + "…"
+    return valor
+
+
+def _sin_ejemplos(valor: Any, profundidad: int = 3) -> Any:
+    """Copia de un mapa pequeño (securitySchemes, servers...) sin ejemplos y con profundidad limitada."""
+    if profundidad == 0:
+        return "…" if isinstance(valor, (dict, list)) else _recortar(valor)
+    if isinstance(valor, dict):
+        return {k: _sin_ejemplos(v, profundidad - 1) for k, v in valor.items()
+                if k not in ("example", "examples", "x-examples")}
+    if isinstance(valor, list):
+        return [_sin_ejemplos(v, profundidad - 1) for v in valor]
+    return _recortar(valor)
+
+
+# --- OAS ---
+
+def _operacion_oas(op: dict, nivel: int) -> Any:
+    """Nivel 0: id, resumen, seguridad, parámetros y códigos de respuesta; 1: sin parámetros ni respuestas."""
+    if nivel >= 2 or not isinstance(op, dict):
+        return None
+    resumen = {k: _recortar(op[k]) for k in ("operationId", "summary", "security") if k in op}
+    if nivel == 0:
+        parametros = [p.get("name") or p.get("$ref", "").rsplit("/", 1)[-1]
+                      for p in op.get("parameters") or [] if isinstance(p, dict)]
+        if parametros:
+            resumen["parameters"] = parametros
+        if isinstance(op.get("responses"), dict):
+            resumen["responses"] = [str(c) for c in op["responses"]]
+    return resumen
+
+
+def _condensar_oas(data: dict, nivel: int) -> dict:
+    vista = {k: data[k] for k in ("openapi", "swagger", "host", "basePath", "schemes") if k in data}
+    if isinstance(data.get("info"), dict):
+        vista["info"] = {k: _recortar(v) for k, v in data["info"].items() if k in ("title", "version", "description")}
+    for clave in ("servers", "security", "securityDefinitions"):
+        if clave in data:
+            vista[clave] = _sin_ejemplos(data[clave])
+    esquemas = (data.get("components") or {}).get("securitySchemes")
+    if esquemas:
+        vista["components"] = {"securitySchemes": _sin_ejemplos(esquemas)}
+
+    rutas = {}
+    for ruta, item in (data.get("paths") or {}).items():
+        if not isinstance(item, dict):
+            continue
+        metodos = {m: _operacion_oas(op, nivel) for m, op in item.items() if m.lower() in _METODOS}
+        rutas[ruta] = sorted(metodos) if nivel >= 2 else metodos
+    vista["paths"] = rutas
+    return vista
+
+
+# --- RAML ---
+
+def _recursos_raml(nodo: dict, prefijo: str, nivel: int, salida: dict):
+    """Aplana los recursos anidados (`/a:` -> `/b:`) a rutas completas con sus métodos."""
+    for clave, valor in nodo.items():
+        if not (isinstance(clave, str) and clave.startswith("/")):
+            continue
+        ruta = prefijo + clave
+        valor = valor if isinstance(valor, dict) else {}
+        metodos = {}
+        for m, op in valor.items():
+            if m in _METODOS:
+                op = op if isinstance(op, dict) else {}
+                metodos[m] = None if nivel >= 2 else {k: _recortar(op[k]) for k in ("displayName", "is", "securedBy")
+                                                     if k in op} or None
+        if metodos or nivel == 0:
+            detalle = {k: valor[k] for k in ("is", "type", "securedBy") if k in valor and nivel == 0}
+            salida[ruta] = sorted(metodos) if nivel >= 2 else {**detalle, **metodos}
+        _recursos_raml(valor, ruta, nivel, salida)
+
+
+def _condensar_raml(data: dict, nivel: int) -> dict:
+    vista = {k: _sin_ejemplos(data[k]) for k in ("title", "version", "baseUri", "baseUriParameters", "protocols",
+                                                 "mediaType", "securitySchemes", "securedBy", "uses") if k in data}
+    if isinstance(data.get("traits"), dict):
+        vista["traits"] = sorted(data["traits"]) if nivel else _sin_ejemplos(data["traits"], 2)
+    recursos: dict = {}
+    _recursos_raml(data, "", nivel, recursos)
+    vista["resources"] = recursos
+    return vista
+
+
+# --- Presupuesto ---
+
+def _volcar(vista: dict, cabecera: str = "") -> str:
+    return cabecera + yaml.safe_dump(vista, sort_keys=False, allow_unicode=True, default_flow_style=None, width=120)
+
+
+def _limitar_rutas(vista: dict, clave: str, maximo: int) -> dict:
+    rutas = vista.get(clave) or {}
+    if len(rutas) <= maximo:
+        return vista
+    nombres = list(rutas)
+    recortadas = {r: rutas[r] for r in nombres[:maximo]}
+    recortadas[f"... ({len(nombres) - maximo} rutas más)"] = None
+    return {**vista, clave: recortadas}
+
+
+def _cargar(texto: str, kind: str) -> Optional[dict]:
+    try:
+        if kind == "OAS" and texto.lstrip().startswith("{"):
+            data = json.loads(texto)
+        else:
+            data = yaml.load(texto, Loader=RamlLoader if kind == "RAML" else _YAMLLoader)
+    except (ValueError, yaml.YAMLError) as e:
+        print(f"Info: No se pudo parsear la especificación para condensarla: {e}")
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@lru_cache(maxsize=32)
+def condensar_spec(texto: str, presupuesto: int = SPEC_TOKEN_BUDGET) -> SpecCondensada:
+    """
+    Reduce la especificación a lo que el prompt necesita: info, servers/baseUri, esquemas de
+    seguridad, rutas con sus métodos y traits/uses; descarta ejemplos y schemas. Si aun así no
+    entra en `presupuesto`, degrada por niveles (sin parámetros, solo métodos, menos rutas).
+    Una especificación que ya entra en el presupuesto se envía tal cual.
+    """
+    kind = detectar_tipo(texto)
+    originales = contar_tokens(texto)
+    if originales <= presupuesto:
+        return SpecCondensada(texto, kind, originales, originales, 0)
+
+    data = _cargar(texto, kind) if kind in ("OAS", "RAML") else None
+    if data is None:
+        # Texto libre o spec ilegible: se trunca manteniendo el principio (cabecera y metadatos).
+        recorte = texto[:presupuesto * 4]
+        while recorte and contar_tokens(recorte) > presupuesto:
+            recorte = recorte[:int(len(recorte) * 0.9)]
+        return SpecCondensada(recorte, kind, originales, contar_tokens(recorte), 4)
+
+    cabecera = (re.match(r"\s*(#%RAML[^\n]*\n)", texto) or [None, ""])[1] if kind == "RAML" else ""
+    condensar, clave_rutas = (_condensar_raml, "resources") if kind == "RAML" else (_condensar_oas, "paths")
+    for detalle in (0, 1, 2):
+        vista = condensar(data, detalle)
+        condensado = _volcar(vista, cabecera)
+        if contar_tokens(condensado) <= presupuesto:
+            return SpecCondensada(condensado, kind, originales, contar_tokens(condensado), detalle + 1)
+
+    # Último recurso: solo los métodos de las primeras rutas, tantas como entren en el presupuesto.
+    maximo = len(vista.get(clave_rutas) or {})
+    while maximo > 1 and contar_tokens(_volcar(_limitar_rutas(vista, clave_rutas, maximo), cabecera)) > presupuesto:
+        maximo //= 2
+    condensado = _volcar(_limitar_rutas(vista, clave_rutas, maximo), cabecera)
+    return SpecCondensada(condensado, kind, originales, contar_tokens(condensado), 4)
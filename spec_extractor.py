@@ -0,0 +1,259 @@
+# spec_extractor.py
+# Extracción determinista de metadatos (OAS YAML/JSON y cabecera RAML 1.0) para evitar el LLM.
+
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urlparse
+
+import yaml
+
+from models import UnifiedModel
+
+# Campos sin los cuales el contexto local no alcanza para generar el proyecto.
+CAMPOS_REQUERIDOS = ("names.project_name", "paths.base_path")
+
+_YAMLLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class RamlLoader(_YAMLLoader):
+    """Loader YAML que tolera los tags de RAML (`!include`, etc.) devolviendo el valor tal cual."""
+
+
+RamlLoader.add_multi_constructor("!", lambda loader, suffix, node: (
+    f"!{suffix} {loader.construct_scalar(node)}" if isinstance(node, yaml.ScalarNode) else None
+))
+
+
+@dataclass
+class ExtraccionLocal:
+    modelo: UnifiedModel
+    faltantes: list[str] = field(default_factory=list)
+    kind: str = "RAW"
+
+    @property
+    def completa(self) -> bool:
+        return not any(c in self.faltantes for c in CAMPOS_REQUERIDOS)
+
+
+def detectar_tipo(texto: str) -> str:
+    cabecera = texto.lstrip()[:2000]
+    if cabecera.startswith("#%RAML"):
+        return "RAML"
+    if re.search(r'(?m)^\s*\{?\s*"?(openapi|swagger)"?\s*:', cabecera) or re.search(r'(?m)^(openapi|swagger)\s*:', texto):
+        return "OAS"
+    return "RAW"
+
+
+def _bloque(lineas: list[str], clave: str, indent: int = 0) -> list[str]:
+    """Líneas del bloque YAML `clave:` a la indentación dada (incluida la línea de la clave)."""
+    patron = re.compile(rf"^ {{{indent}}}{re.escape(clave)}\s*:")
+    for i, linea in enumerate(lineas):
+        if not patron.match(linea):
+            continue
+        fin = i + 1
+        while fin < len(lineas):
+            siguiente = lineas[fin]
+            sangria = len(siguiente) - len(siguiente.lstrip())
+            # Una secuencia puede ir a la misma sangría que su clave ("servers:\n- url: ...").
+            secuencia = sangria == indent and siguiente.lstrip().startswith("- ")
+            if siguiente.strip() and not siguiente.lstrip().startswith("#") and sangria <= indent and not secuencia:
+                break
+            fin += 1
+        return lineas[i:fin]
+    return []
+
+
+def _cargar_yaml(lineas: list[str], loader=_YAMLLoader) -> dict:
+    if not lineas:
+        return {}
+    try:
+        data = yaml.load("\n".join(lineas), Loader=loader)
+    except yaml.YAMLError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _cargar_oas(texto: str) -> dict:
+    """Carga solo las secciones de OAS que hacen falta; un JSON se parsea completo (es rápido)."""
+    if texto.lstrip().startswith("{"):
+        try:
+            return json.loads(texto)
+        except ValueError:
+            return {}
+    lineas = texto.splitlines()
+    data = {}
+    for clave in ("openapi", "swagger", "info", "servers", "host", "basePath", "schemes",
+                  "securityDefinitions", "security"):
+        data.update(_cargar_yaml(_bloque(lineas, clave)))
+    componentes = _bloque(lineas, "components")
+    esquemas = _cargar_yaml(["components:", *_bloque(componentes[1:], "securitySchemes", 2)])
+    if esquemas:
+        data["components"] = esquemas.get("components") or {}
+    return data
+
+
+def _cargar_raml(texto: str) -> dict:
+    """Parsea solo la cabecera RAML (todo lo anterior al primer recurso `/...:`)."""
+    cabecera = []
+    for linea in texto.splitlines():
+        if re.match(r"^/", linea):
+            break
+        cabecera.append(linea)
+    return _cargar_yaml(cabecera, loader=RamlLoader)
+
+
+def _normalizar_version(version) -> Optional[str]:
+    m = re.match(r"^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?", str(version or "").strip())
+    if not m:
+        return None
+    return ".".join(g or "0" for g in m.groups())
+
+
+def _expandir_url(url: str, variables: dict) -> str:
+    for nombre, valor in variables.items():
+        url = url.replace("{" + nombre + "}", str(valor))
+    return url
+
+
+def _auth_oas(esquemas: dict) -> Optional[str]:
+    tipos = {str((v or {}).get("type", "")).lower(): v for v in esquemas.values() if isinstance(v, dict)}
+    if any(t in tipos for t in ("oauth2", "openidconnect")):
+        return "oauth2"
+    if "http" in tipos and str(tipos["http"].get("scheme", "")).lower() == "bearer":
+        return "oauth2"
+    if "apikey" in tipos:
+        return "apikey"
+    return None
+
+
+def _auth_raml(esquemas) -> Optional[str]:
+    if isinstance(esquemas, list):  # RAML 0.8 usa lista de mapas
+        esquemas = {k: v for d in esquemas if isinstance(d, dict) for k, v in d.items()}
+    if not isinstance(esquemas, dict):
+        return None
+    tipos = [str((v or {}).get("type", "")).lower() if isinstance(v, dict) else str(v).lower()
+             for v in esquemas.values()]
+    if any("oauth" in t for t in tipos):
+        return "oauth2"
+    if any("pass through" in t or "x-" in t or "apikey" in t for t in tipos):
+        return "apikey"
+    return None
+
+
+def extraer_contexto_local(texto: str, layer: str) -> ExtraccionLocal:
+    """
+    Construye un `UnifiedModel` solo con lo que la especificación declara explícitamente.
+    Devuelve también la lista de campos que no se pudieron determinar.
+    """
+    kind = detectar_tipo(texto)
+    titulo = version = url = None
+    auth = None
+
+    if kind == "OAS":
+        data = _cargar_oas(texto)
+        info = data.get("info") or {}
+        titulo, version = info.get("title"), info.get("version")
+        servers = data.get("servers") or []
+        if servers and isinstance(servers[0], dict) and servers[0].get("url"):
+            variables = {k: (v or {}).get("default", "") for k, v in (servers[0].get("variables") or {}).items()}
+            url = _expandir_url(servers[0]["url"], variables)
+        elif data.get("host"):  # Swagger 2.0
+            esquema = (data.get("schemes") or ["https"])[0]
+            url = f"{esquema}://{data['host']}{data.get('basePath') or ''}"
+        esquemas = (data.get("components") or {}).get("securitySchemes") or data.get("securityDefinitions") or {}
+        auth = _auth_oas(esquemas) if esquemas else None
+        if auth is None and esquemas == {} and "security" not in data:
+            auth = "none"
+    elif kind == "RAML":
+        data = _cargar_raml(texto)
+        titulo, version = data.get("title"), data.get("version")
+        if data.get("baseUri"):
+            url = _expandir_url(str(data["baseUri"]), {"version": version or ""})
+        auth = _auth_raml(data.get("securitySchemes")) if data.get("securitySchemes") else "none"
+
+    faltantes = []
+    names, paths, upstream, security = {}, {}, {}, {}
+
+    if titulo:
+        names["project_name"] = str(titulo)
+        names["api_display_name"] = str(titulo)
+    else:
+        faltantes.append("names.project_name")
+        names["project_name"] = "MuleApplication"
+
+    version_norm = _normalizar_version(version)
+    if version_norm:
+        names["version"] = version_norm
+    else:
+        faltantes.append("names.version")
+
+    if url:
+        parsed = urlparse(url)
+        base_path = parsed.path.rstrip("/") or "/"
+        paths["base_path"] = base_path
+        if parsed.scheme and parsed.netloc:
+            paths["base_uri"] = url.rstrip("/")
+            paths["target_base_url"] = url.rstrip("/")
+            upstream = {"protocol": parsed.scheme.upper(), "host": parsed.netloc, "path": base_path}
+        else:
+            faltantes.append("paths.base_uri")
+    else:
+        faltantes += ["paths.base_path", "paths.base_uri"]
+
+    if auth:
+        security["auth"] = auth
+    else:
+        faltantes.append("security.auth")
+
+    modelo = UnifiedModel.model_validate({
+        "layer": layer,
+        "names": names,
+        "paths": paths,
+        "upstream": upstream,
+        "security": security,
+        "notes": "Contexto extraído localmente de la especificación.",
+    })
+    return ExtraccionLocal(modelo=modelo, faltantes=faltantes, kind=kind)
+
+
+def combinar_contextos(local: ExtraccionLocal, llm: UnifiedModel, multicapa: bool = False) -> UnifiedModel:
+    """
+    Completa el contexto del LLM con los campos que la especificación declara (estos prevalecen).
+    Con `multicapa` se conserva el `artifact_id` del LLM, que es propio de cada capa.
+    """
+    data = llm.model_dump()
+    propio = local.modelo.model_dump()
+    for ruta in ("names.project_name", "names.api_display_name", "names.version", "paths.base_path",
+                 "paths.base_uri", "paths.target_base_url", "security.auth"):
+        if ruta in local.faltantes:
+            continue
+        seccion, campo = ruta.split(".")
+        if propio[seccion].get(campo) is not None:
+            data[seccion][campo] = propio[seccion][campo]
+    if "names.project_name" not in local.faltantes:
+        # Los identificadores kebab se vuelven a derivar del título real de la especificación.
+        if not multicapa:
+            data["names"]["artifact_id"] = propio["names"]["artifact_id"]
+        data["names"]["api_name"] = propio["names"]["api_name"]
+    if "paths.base_uri" not in local.faltantes:
+        data["upstream"] = propio["upstream"]
+    return UnifiedModel.model_validate(data)
+
+
+def ids_por_capa(contextos: dict[str, UnifiedModel]) -> dict[str, UnifiedModel]:
+    """
+    En un bundle multicapa cada proyecto necesita su propio `artifact_id`: a los que se repiten entre
+    capas (p. ej. todos derivados del mismo título) se les agrega el sufijo `-<capa>`.
+    """
+    usos = Counter(c.names.artifact_id for c in contextos.values())
+    resultado = {}
+    for capa, contexto in contextos.items():
+        artifact_id = contexto.names.artifact_id
+        if usos[artifact_id] > 1 and not artifact_id.endswith(f"-{capa}"):
+            names = contexto.names.model_copy(update={"artifact_id": f"{artifact_id}-{capa}"})
+            contexto = contexto.model_copy(update={"names": names})
+        resultado[capa] = contexto
+    return resultado
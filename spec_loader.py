@@ -0,0 +1,192 @@
+# spec_loader.py
+# Lectura de ZIPs de diseño y detección de la capa, sin dependencias de la UI.
+
+import posixpath
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import BinaryIO
+
+from constants import DESIGN_MEMBER_MAX_BYTES, DESIGN_SNIFF_BYTES
+
+
+def map_prefix_to_type(filename: str) -> str | None:
+    if not filename: return None
+    fname = filename.lower()
+    if "-rec-" in fname or "reception" in fname: return "REC"
+    if "-dom-" in fname or "domain" in fname: return "DOM"
+    if "-bus-" in fname or "business" in fname: return "BUS"
+    if "proxy" in fname: return "PROXY"
+    return None
+
+
+class MiembroDemasiadoGrandeError(ValueError):
+    """Un miembro del ZIP supera el tamaño máximo que se permite leer."""
+
+
+_RAML_RAIZ = re.compile(rb"\A\s*#%RAML\s+[01]\.\d+\s*(?:\r?\n|\Z)")  # los fragmentos llevan tipo: "#%RAML 1.0 Library"
+_OAS_RAIZ = re.compile(rb"(?m)^\s*\{?\s*\"?(?:openapi|swagger)\"?\s*:|\"(?:openapi|swagger)\"\s*:\s*\"\d")
+_EXTENSIONES_SPEC = (".raml", ".yaml", ".yml", ".json")
+_DIRS_IGNORADOS = ("__MACOSX/", "exchange_modules/")
+
+# Referencias a otros miembros: !include, librerías de `uses:` y `$ref` externos de OAS.
+_INCLUDE = re.compile(r"!include\s+([^\s,\]}#]+)")
+_USES = re.compile(r"(?m)^uses:\s*\n((?:[ \t]+.*\n?)+)")
+_USES_ENTRADA = re.compile(r"(?m)^[ \t]+[\w.-]+\s*:\s*[\"']?([^\s#\"']+)")
+_REF = re.compile(r"[\"']?\$ref[\"']?\s*:\s*[\"']?([^\"'\s#}]+)")
+
+
+@dataclass(frozen=True)
+class Candidato:
+    nombre: str
+    kind: str
+    puntaje: int
+
+
+@dataclass
+class Resolucion:
+    """Miembros alcanzables desde la spec raíz (incluida) y referencias que no están en el ZIP."""
+    raiz: str
+    miembros: list[str] = field(default_factory=list)
+    faltantes: list[str] = field(default_factory=list)
+    externas: list[str] = field(default_factory=list)
+
+
+class ZipIndex:
+    """
+    Índice de un ZIP de diseño: lista los miembros una vez y los lee bajo demanda, con tope de
+    tamaño. Las cabeceras (para detectar la spec raíz) y los contenidos leídos se cachean en una
+    LRU pequeña, así un diseño grande nunca se materializa completo.
+    """
+
+    def __init__(self, origen: str | BinaryIO, max_bytes: int = DESIGN_MEMBER_MAX_BYTES, cache_miembros: int = 8):
+        self._zip = zipfile.ZipFile(origen, "r")
+        self.max_bytes = max_bytes
+        self.miembros: dict[str, zipfile.ZipInfo] = {
+            i.filename: i for i in self._zip.infolist()
+            if not i.is_dir() and not i.filename.startswith("__MACOSX/")
+        }
+        self._cabeceras: dict[str, bytes] = {}
+        self._contenidos: OrderedDict[str, bytes] = OrderedDict()
+        self._cache_miembros = cache_miembros
+        self._lock = threading.Lock()  # ZipFile no admite lecturas concurrentes sobre el mismo archivo
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def cabecera(self, nombre: str, n: int = DESIGN_SNIFF_BYTES) -> bytes:
+        """Primeros `n` bytes descomprimidos (sin leer el resto del miembro)."""
+        if nombre not in self._cabeceras:
+            with self._lock, self._zip.open(self.miembros[nombre]) as f:
+                self._cabeceras[nombre] = f.read(n)
+        return self._cabeceras[nombre]
+
+    def leer(self, nombre: str) -> bytes:
+        """Contenido completo de un miembro; falla si declara o descomprime más de `max_bytes`."""
+        with self._lock:
+            if nombre in self._contenidos:
+                self._contenidos.move_to_end(nombre)
+                return self._contenidos[nombre]
+            info = self.miembros[nombre]
+            if info.file_size > self.max_bytes:
+                raise MiembroDemasiadoGrandeError(f"'{nombre}' ocupa {info.file_size} bytes (máximo {self.max_bytes}).")
+            with self._zip.open(info) as f:
+                datos = f.read(self.max_bytes + 1)  # el tamaño declarado puede mentir
+            if len(datos) > self.max_bytes:
+                raise MiembroDemasiadoGrandeError(f"'{nombre}' supera {self.max_bytes} bytes al descomprimirlo.")
+            self._contenidos[nombre] = datos
+            while len(self._contenidos) > self._cache_miembros:
+                self._contenidos.popitem(last=False)
+            return datos
+
+    # --- Detección de la spec raíz ---
+
+    def _tipo(self, nombre: str) -> str | None:
+        if not nombre.lower().endswith(_EXTENSIONES_SPEC):
+            return None
+        cabecera = self.cabecera(nombre)
+        if _RAML_RAIZ.match(cabecera):
+            return "RAML"
+        if not nombre.lower().endswith(".raml") and _OAS_RAIZ.search(cabecera):
+            return "OAS"
+        return None
+
+    def candidatos(self) -> list[Candidato]:
+        """
+        Specs raíz ordenadas por probabilidad: se decide por el contenido (`#%RAML 1.0` sin tipo de
+        fragmento, `openapi:`/`swagger:`), y a igualdad gana la menos anidada y la de nombre típico.
+        """
+        salida = []
+        for nombre in self.miembros:
+            if nombre.startswith(_DIRS_IGNORADOS):
+                continue
+            kind = self._tipo(nombre)
+            if kind is None:
+                continue
+            base = posixpath.basename(nombre).lower()
+            puntaje = 100 - 10 * nombre.count("/")
+            if re.fullmatch(r"(api|openapi|swagger)\.(raml|ya?ml|json)", base):
+                puntaje += 20
+            if "example" in nombre.lower() or "test" in nombre.lower():
+                puntaje -= 30
+            salida.append(Candidato(nombre, kind, puntaje))
+        return sorted(salida, key=lambda c: (-c.puntaje, c.nombre))
+
+    def principal(self) -> tuple[str, str, bytes]:
+        """(kind, nombre, bytes) de la spec raíz; sin candidatos, el primer miembro como texto libre."""
+        candidatos = self.candidatos()
+        if candidatos:
+            return candidatos[0].kind, candidatos[0].nombre, self.leer(candidatos[0].nombre)
+        nombres = sorted(self.miembros)
+        return ("RAW", nombres[0], self.leer(nombres[0])) if nombres else ("RAW", "", b"")
+
+    # --- Resolución de referencias entre miembros ---
+
+    @staticmethod
+    def referencias(texto: str) -> list[str]:
+        refs = _INCLUDE.findall(texto) + _REF.findall(texto)
+        uses = _USES.search(texto)
+        if uses:
+            refs += _USES_ENTRADA.findall(uses.group(1))
+        return list(dict.fromkeys(refs))
+
+    def resolver(self, raiz: str) -> Resolucion:
+        """
+        Recorre `uses:`/`!include`/`$ref` desde `raiz` leyendo solo los miembros alcanzables.
+        Las referencias a URLs o a `exchange_modules/` se reportan aparte (se resuelven en el build).
+        """
+        resolucion = Resolucion(raiz=raiz)
+        pendientes, vistos = [raiz], {raiz}
+        while pendientes:
+            actual = pendientes.pop()
+            resolucion.miembros.append(actual)
+            if not actual.lower().endswith(_EXTENSIONES_SPEC):
+                continue  # ejemplos en texto, XML, etc.: no tienen referencias propias
+            try:
+                texto = self.leer(actual).decode("utf-8", "ignore")
+            except MiembroDemasiadoGrandeError as e:
+                print(f"Advertencia: {e}")
+                continue
+            for ref in self.referencias(texto):
+                if re.match(r"^[a-z]+://", ref) or "exchange_modules/" in ref:
+                    resolucion.externas.append(ref)
+                    continue
+                destino = posixpath.normpath(posixpath.join(posixpath.dirname(actual), ref))
+                if destino in vistos:
+                    continue
+                vistos.add(destino)
+                if destino in self.miembros:
+                    pendientes.append(destino)
+                else:
+                    resolucion.faltantes.append(destino)
+        resolucion.miembros.sort()
+        return resolucion
+
@@ -0,0 +1,93 @@
+# speculation.py
+# Inferencia especulativa del contexto: apenas se sube el diseño se lanza la llamada al LLM para la
+# capa inferida del nombre del ZIP; si el usuario confirma esa capa la generación reutiliza el
+# resultado (o espera al que está en vuelo) y si elige otra se cancela.
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional
+
+from constants import JOB_POLL_SECONDS
+from job_runner import OK, JobRunner, ReporteJob
+
+if TYPE_CHECKING:
+    from models import UnifiedModel
+
+
+@dataclass
+class Especulacion:
+    job_id: str
+    capa: str  # capa resuelta ("Domain", "Business"...), nunca "Automático"
+
+
+class EstadisticasEspeculacion:
+    """Aciertos (el resultado se usó) y fallos (se descartó, se canceló o no dio contexto) del proceso."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.segundos_ahorrados = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, acierto: bool, ahorro: float = 0.0):
+        with self._lock:
+            if acierto:
+                self.hits += 1
+                self.segundos_ahorrados += ahorro
+            else:
+                self.misses += 1
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+                    "segundos_ahorrados": round(self.segundos_ahorrados, 2)}
+
+
+_estadisticas = EstadisticasEspeculacion()
+
+
+def obtener_estadisticas_especulacion() -> EstadisticasEspeculacion:
+    return _estadisticas
+
+
+def iniciar(runner: JobRunner, propietario: str, ctx_text: str, capa: str) -> Especulacion:
+    """Encola la inferencia del contexto para `capa` como trabajo del propietario (comparte su cupo)."""
+    from pipeline import especular_contexto
+    job_id = runner.enviar(propietario, "especulacion", especular_contexto, ctx_text, capa, etapas=("contexto",))
+    return Especulacion(job_id, capa)
+
+
+def descartar(runner: JobRunner, especulacion: Especulacion):
+    """El usuario eligió otra capa (o reinició): se cancela la inferencia y cuenta como fallo."""
+    runner.cancelar(especulacion.job_id)
+    _estadisticas.registrar(False)
+
+
+def reclamar(runner: JobRunner, especulacion: Especulacion,
+             capa: str) -> Optional[Callable[[ReporteJob], Optional["UnifiedModel"]]]:
+    """
+    Si la especulación es para `capa`, devuelve la función que la generación llama en su etapa
+    "contexto" para obtener el resultado (esperándolo si aún está en vuelo). Si no, la descarta.
+    """
+    if especulacion.capa != capa:
+        descartar(runner, especulacion)
+        return None
+    confirmada = time.time()
+
+    def esperar_resultado(reporte: ReporteJob) -> Optional["UnifiedModel"]:
+        job = runner.esperar(especulacion.job_id, timeout=JOB_POLL_SECONDS)
+        while job is not None and job.activo:
+            reporte.verificar_cancelacion()
+            job = runner.esperar(especulacion.job_id, timeout=JOB_POLL_SECONDS)
+        if job is None or job.estado != OK or job.resultado is None:
+            _estadisticas.registrar(False)
+            return None
+        # Lo que la especulación adelantó: el tiempo que corrió antes de que el usuario confirmara.
+        adelantado = min(job.terminado or confirmada, confirmada) - (job.iniciado or confirmada)
+        _estadisticas.registrar(True, max(0.0, adelantado))
+        return job.resultado
+
+    return esperar_resultado
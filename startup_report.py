@@ -0,0 +1,133 @@
+# startup_report.py
+# Arranque de la app: precarga de recursos compartidos y reporte de tiempos de importación.
+#
+#   python startup_report.py                 # tabla de tiempos; falla si un módulo de arranque excede el presupuesto
+#   python startup_report.py --json          # mismo reporte en JSON (para comparar entre versiones)
+#   python startup_report.py pipeline yaml   # módulos arbitrarios
+
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from constants import ARCHETYPE_ZIPS, BASE_DIR, LLM_MODE, LLM_MODE_LOCAL, STARTUP_IMPORT_BUDGET_MS
+
+# Lo que app.py importa para el primer render; lo pesado (pydantic, jinja2, yaml, openai) queda diferido.
+MODULOS_ARRANQUE = ("blob_store", "constants", "job_runner", "llm_cache", "spec_loader", "speculation",
+                    "startup_report", "tracing")
+MODULOS_DIFERIDOS = ("pipeline", "project_generator", "spec_condenser")
+
+
+@dataclass
+class TiempoImportacion:
+    modulo: str
+    total_ms: float
+    dependencias: list[tuple[str, float]] = field(default_factory=list)  # las más pesadas, importadas por él
+
+
+def _parsear_importtime(salida: str, modulo: str) -> TiempoImportacion:
+    """
+    Interpreta la salida de `python -X importtime` (`import time: propio | acumulado | nombre`, con
+    dos espacios de sangría por nivel).
+    """
+    total, dependencias, hijos = 0.0, [], []
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        if not acumulado.strip().isdigit():
+            continue  # cabecera
+        nivel = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        ms = int(acumulado) / 1000
+        if nivel == 1:
+            hijos.append((nombre.strip(), ms))
+        elif nivel == 0:
+            # Un módulo se reporta después de sus dependencias: las de nivel 1 anteriores son suyas.
+            if nombre.strip() == modulo:
+                total, dependencias = ms, hijos
+            hijos = []
+    dependencias.sort(key=lambda d: -d[1])
+    return TiempoImportacion(modulo, round(total, 1), [(n, round(ms, 1)) for n, ms in dependencias[:5]])
+
+
+def medir_importacion(modulo: str) -> TiempoImportacion:
+    """Tiempo de importar `modulo` en un proceso nuevo (en frío, sin nada en `sys.modules`)."""
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+                             cwd=BASE_DIR, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise ImportError(f"No se pudo importar '{modulo}': {proceso.stderr.strip().splitlines()[-1:]}")
+    return _parsear_importtime(proceso.stderr, modulo)
+
+
+def precargar_recursos() -> dict[str, float]:
+    """
+    Importa los módulos diferidos y deja listos los recursos de proceso: cliente del LLM, arquetipos
+    compilados (entornos Jinja y manifiestos) y catálogos de rúbricas. Devuelve los segundos de cada paso.
+    """
+    tiempos = {}
+
+    def medir(nombre: str, fn):
+        inicio = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            print(f"Advertencia: No se pudo precargar {nombre}: {e}")
+        tiempos[nombre] = round(time.perf_counter() - inicio, 4)
+
+    def cliente_llm():
+        from llm_client import ejecutar_en_loop, obtener_cliente_llm
+        ejecutar_en_loop(obtener_cliente_llm().preparar())
+
+    def arquetipos():
+        from archetype_registry import obtener_registro
+        from project_generator import resolver_arquetipo
+        for nombre in ARCHETYPE_ZIPS:
+            ruta = resolver_arquetipo(nombre)
+            if ruta:
+                obtener_registro().obtener(Path(ruta))
+
+    def rubricas():
+        from rubric_catalog import obtener_catalogo
+        for kind in ("mule", "apigee"):
+            obtener_catalogo(kind)
+
+    medir("modulos", lambda: [importlib.import_module(m) for m in MODULOS_DIFERIDOS])
+    if LLM_MODE != LLM_MODE_LOCAL:
+        medir("cliente_llm", cliente_llm)
+    medir("arquetipos", arquetipos)
+    medir("rubricas", rubricas)
+    return tiempos
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Tiempos de importación en frío de los módulos de la app.")
+    parser.add_argument("modulos", nargs="*", help="Módulos a medir (por defecto, los de arranque y los diferidos)")
+    parser.add_argument("--limite-ms", type=float, default=STARTUP_IMPORT_BUDGET_MS,
+                        help="Presupuesto por módulo de arranque; se excede -> código de salida 1")
+    parser.add_argument("--json", action="store_true", help="Imprime el reporte en JSON")
+    args = parser.parse_args(argv)
+
+    modulos = args.modulos or list(MODULOS_ARRANQUE + MODULOS_DIFERIDOS)
+    reporte = [medir_importacion(m) for m in modulos]
+    excedidos = [t for t in reporte
+                 if t.total_ms > args.limite_ms and (args.modulos or t.modulo in MODULOS_ARRANQUE)]
+
+    if args.json:
+        print(json.dumps({"limite_ms": args.limite_ms, "modulos": [asdict(t) for t in reporte],
+                          "excedidos": [t.modulo for t in excedidos]}, ensure_ascii=False, indent=2))
+    else:
+        for t in reporte:
+            marca = "  (diferido)" if not args.modulos and t.modulo in MODULOS_DIFERIDOS else ""
+            detalle = ", ".join(f"{n} {ms:.0f}" for n, ms in t.dependencias[:3])
+            print(f"{t.modulo:<20} {t.total_ms:>8.1f} ms{marca}   {detalle}")
+        for t in excedidos:
+            print(f"⚠️ {t.modulo} tarda {t.total_ms:.0f} ms en importarse (presupuesto {args.limite_ms:.0f} ms).")
+    return 1 if excedidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
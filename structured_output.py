@@ -0,0 +1,109 @@
+# structured_output.py
+# Esquema JSON para "structured outputs" derivado de los modelos Pydantic, subesquemas para pedir
+# solo algunos campos (reparación) y rutas de los campos que fallaron la validación.
+
+import copy
+from typing import Any
+
+from pydantic import BaseModel, ValidationError
+
+# Restricciones que el prompt ya describe y Pydantic no conoce (los campos son `str` libres).
+ENUMS = {
+    ("layer",): ["domain", "business", "proxy", "reception"],
+    ("security", "auth"): ["none", "apikey", "oauth2"],
+    ("security", "quota", "timeUnit"): ["minute", "hour", "day"],
+}
+
+_SIN_SOPORTE = ("title", "default", "description")
+
+
+def _es_objeto_libre(esquema: dict) -> bool:
+    return esquema.get("type") == "object" and "properties" not in esquema
+
+
+def _estricto(nodo: Any, defs: dict) -> Any:
+    """Resuelve `$ref`, quita lo que el modo estricto no admite y cierra los objetos."""
+    if isinstance(nodo, list):
+        return [_estricto(n, defs) for n in nodo]
+    if not isinstance(nodo, dict):
+        return nodo
+    if "$ref" in nodo:
+        return _estricto(defs[nodo["$ref"].rsplit("/", 1)[-1]], defs)
+    nodo = {k: _estricto(v, defs) for k, v in nodo.items() if k not in _SIN_SOPORTE and k != "$defs"}
+    if nodo.get("type") == "object" and "properties" in nodo:
+        # Un mapa libre (Dict[str, Any]) no se puede expresar en modo estricto: ese campo no se pide
+        # y queda con su valor por defecto del modelo.
+        nodo["properties"] = {k: v for k, v in nodo["properties"].items()
+                              if not _es_objeto_libre(v) and not _es_objeto_libre(v.get("items", {}))}
+        nodo["required"] = list(nodo["properties"])
+        nodo["additionalProperties"] = False
+    return nodo
+
+
+def esquema_estricto(modelo: type[BaseModel]) -> dict:
+    """Esquema de `modelo` en el subconjunto que exige `response_format` con `strict: true`."""
+    crudo = modelo.model_json_schema()
+    esquema = _estricto(crudo, crudo.get("$defs", {}))
+    for ruta, valores in ENUMS.items():
+        nodo = esquema
+        for parte in ruta:
+            nodo = nodo.get("properties", {}).get(parte, {})
+        if nodo:
+            nodo["enum"] = valores
+    return esquema
+
+
+def response_format(nombre: str, esquema: dict) -> dict:
+    return {"type": "json_schema", "json_schema": {"name": nombre, "schema": esquema, "strict": True}}
+
+
+def subesquema(esquema: dict, rutas: list[tuple[str, ...]]) -> dict:
+    """
+    Esquema con solo los campos de `rutas` (y los objetos que los contienen). Una ruta que entra en
+    una lista o en un campo sin subpropiedades se corta ahí: se pide el campo completo.
+    """
+    resultado = {"type": "object", "properties": {}, "required": [], "additionalProperties": False}
+    for ruta in rutas:
+        origen, destino = esquema, resultado
+        for i, parte in enumerate(ruta):
+            propiedad = origen.get("properties", {}).get(parte)
+            if propiedad is None:
+                break
+            ultimo = i == len(ruta) - 1 or "properties" not in propiedad
+            if ultimo:
+                destino["properties"][parte] = copy.deepcopy(propiedad)
+            else:
+                destino["properties"].setdefault(
+                    parte, {"type": "object", "properties": {}, "required": [], "additionalProperties": False})
+            if parte not in destino["required"]:
+                destino["required"].append(parte)
+            if ultimo:
+                break
+            origen, destino = propiedad, destino["properties"][parte]
+    return resultado
+
+
+def campos_invalidos(error: ValidationError) -> list[tuple[str, ...]]:
+    """Rutas (sin índices de listas) de los campos que fallaron, sin repetir."""
+    rutas = []
+    for e in error.errors():
+        ruta = []
+        for parte in e.get("loc", ()):
+            if not isinstance(parte, str):
+                break
+            ruta.append(parte)
+        if ruta and tuple(ruta) not in rutas:
+            rutas.append(tuple(ruta))
+    return rutas
+
+
+def quitar(datos: dict, rutas: list[tuple[str, ...]]) -> dict:
+    """Copia de `datos` sin los campos de `rutas` (para mostrar al modelo solo lo que está bien)."""
+    datos = copy.deepcopy(datos)
+    for ruta in rutas:
+        nodo = datos
+        for parte in ruta[:-1]:
+            nodo = nodo.get(parte) if isinstance(nodo, dict) else None
+        if isinstance(nodo, dict):
+            nodo.pop(ruta[-1], None)
+    return datos
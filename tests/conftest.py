@@ -0,0 +1,17 @@
+# conftest.py
+# Entorno de las pruebas: caches en un directorio temporal, sin trazas en disco y sin LLM real.
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "benchmarks"))  # entradas sintéticas (sinteticos.py)
+
+# constants.py lee el entorno al importarse: esto tiene que ir antes de cualquier import del proyecto.
+os.environ["GENERATOR_CACHE_DIR"] = tempfile.mkdtemp(prefix="generator-tests-")
+os.environ["GENERATOR_TRACE_FILE"] = ""
+os.environ["GENERATOR_LLM_MODE"] = "local"
+os.environ.setdefault("OPENAI_API_KEY", "test")
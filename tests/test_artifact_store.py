@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+from artifact_store import ArtifactStore, clave_artefacto, clave_corregida
+from test_support import contexto_mule
+
+
+def _escribir(datos: bytes):
+    def construir(ruta):
+        ruta.write_bytes(datos)
+    return construir
+
+
+def _envejecer(store: ArtifactStore, clave: str, nombre: str, segundos: float):
+    antes = time.time() - segundos
+    os.utime(store.ruta(clave, nombre), (antes, antes))
+
+
+def test_misma_clave_no_se_vuelve_a_construir(tmp_path):
+    store = ArtifactStore(tmp_path, max_entries=10, max_bytes=10_000)
+    construcciones = []
+
+    def construir(ruta):
+        construcciones.append(ruta)
+        ruta.write_bytes(b"zip")
+    primera = store.obtener_o_construir("k1", "api.zip", construir)
+    segunda = store.obtener_o_construir("k1", "api.zip", construir)
+    assert primera == segunda and len(construcciones) == 1
+    assert store.estadisticas() == {"hits": 1, "misses": 1, "coalesced": 0, "evictions": 0}
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
+
+
+def test_peticiones_simultaneas_comparten_la_construccion(tmp_path):
+    store = ArtifactStore(tmp_path, max_entries=10, max_bytes=10_000)
+    construcciones = []
+
+    def construir(ruta):
+        construcciones.append(ruta)
+        time.sleep(0.1)
+        ruta.write_bytes(b"zip")
+    hilos = [threading.Thread(target=store.obtener_o_construir, args=("k1", "api.zip", construir)) for _ in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert len(construcciones) == 1
+    assert store.estadisticas()["coalesced"] == 3
+
+
+def test_desaloja_por_cantidad_el_menos_usado(tmp_path):
+    store = ArtifactStore(tmp_path, max_entries=2, max_bytes=10_000)
+    store.obtener_o_construir("viejo", "a.zip", _escribir(b"a"))
+    store.obtener_o_construir("usado", "b.zip", _escribir(b"b"))
+    _envejecer(store, "viejo", "a.zip", 30)
+    _envejecer(store, "usado", "b.zip", 20)
+    assert store.obtener("usado", "b.zip") is not None  # el uso renueva su posición en el LRU
+    store.obtener_o_construir("nuevo", "c.zip", _escribir(b"c"))
+    assert store.obtener("viejo", "a.zip") is None
+    assert store.obtener("usado", "b.zip") is not None and store.obtener("nuevo", "c.zip") is not None
+    assert store.estadisticas()["evictions"] == 1
+
+
+def test_desaloja_por_tamano_sin_borrar_el_recien_publicado(tmp_path):
+    store = ArtifactStore(tmp_path, max_entries=10, max_bytes=150)
+    store.obtener_o_construir("k1", "a.zip", _escribir(b"a" * 100))
+    _envejecer(store, "k1", "a.zip", 10)
+    store.obtener_o_construir("k2", "b.zip", _escribir(b"b" * 200))  # excede solo
+    assert store.obtener("k1", "a.zip") is None
+    assert store.obtener("k2", "b.zip") is not None
+
+
+def test_claves_distinguen_contexto_y_correcciones():
+    base = clave_artefacto("v1", contexto_mule("api"), b"spec", "OAS")
+    assert base == clave_artefacto("v1", contexto_mule("api"), b"spec", "OAS")
+    assert base != clave_artefacto("v1", contexto_mule("otra"), b"spec", "OAS")
+    assert base != clave_artefacto("v2", contexto_mule("api"), b"spec", "OAS")
+    assert clave_corregida(base, ["B", "A"]) == clave_corregida(base, ["A", "B"]) != base
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from autofix import corregir
+from pipeline import analizar
+from project_tree import ProjectTree
+from rubric_catalog import obtener_catalogo
+from rubric_engine import evaluar
+from test_support import contexto_mule
+
+_DESCRIPTOR_VIEJO = '{"minMuleVersion": "4.4.0"}'
+
+
+def _proyecto_mule(descriptor: str | None = _DESCRIPTOR_VIEJO, carpetas: bool = True) -> ProjectTree:
+    tree = ProjectTree()
+    tree.agregar("pom.xml", "<project><build><plugin>mule-maven-plugin</plugin></build></project>")
+    if descriptor is not None:
+        tree.agregar("mule-artifact.json", descriptor)
+    if carpetas:
+        for carpeta in ("client", "handler", "orchestrator", "common"):
+            tree.agregar_directorio(f"src/main/mule/{carpeta}")
+        tree.agregar_directorio("src/main/resources/dwl")
+        tree.agregar_directorio("src/test/munit")
+    tree.agregar("src/main/mule/common/global-config.xml", "<mule/>")
+    return tree
+
+
+def _corregir(tree: ProjectTree):
+    contexto = contexto_mule()
+    return corregir(tree, contexto, "mule", *analizar(tree, "mule"))
+
+
+def _estado(resultado, regla_id: str) -> str:
+    return next(r.estado for r in resultado.reglas if r.regla.id == regla_id)
+
+
+def test_descriptor_faltante_se_crea():
+    resultado = _corregir(_proyecto_mule(descriptor=None))
+    assert "mule-artifact.json" in resultado.archivos
+    assert json.loads(resultado.proyecto.leer_texto("mule-artifact.json"))["minMuleVersion"] == "4.6.0"
+    assert "H1_RUNTIME_COMPAT" in resultado.corregidas
+
+
+def test_descriptor_existente_no_se_reescribe():
+    proyecto = _proyecto_mule()
+    resultado = _corregir(proyecto)
+    assert resultado.proyecto is proyecto  # H1 falla, pero su fixer solo crea lo que falta
+    assert resultado.proyecto.leer_texto("mule-artifact.json") == _DESCRIPTOR_VIEJO
+    assert _estado(resultado.puntaje, "H1_RUNTIME_COMPAT") != "ok"
+
+
+def test_estructura_no_toca_el_descriptor():
+    resultado = _corregir(_proyecto_mule(carpetas=False))
+    assert "C5_COMMON_STRUCTURE" in resultado.corregidas
+    assert "mule-artifact.json" not in resultado.archivos
+    assert resultado.proyecto.leer_texto("mule-artifact.json") == _DESCRIPTOR_VIEJO
+    assert resultado.proyecto.original is not None
+
+
+@pytest.mark.parametrize("descriptor, carpetas", [(None, False), (None, True), (_DESCRIPTOR_VIEJO, False)])
+def test_reevaluacion_parcial_coincide_con_la_completa(descriptor, carpetas):
+    resultado = _corregir(_proyecto_mule(descriptor, carpetas))
+    catalogo = obtener_catalogo("mule")
+    completo = evaluar(resultado.proyecto, list(catalogo.reglas), dict(catalogo.pesos))
+    assert [r.estado for r in resultado.puntaje.reglas] == [r.estado for r in completo.reglas]
+    assert resultado.puntaje.puntaje_total == completo.puntaje_total
+
+
+def test_timeouts_respetan_crlf():
+    tree = ProjectTree()
+    apiproxy = "src/main/apigee/apiproxies/prueba/apiproxy"
+    tree.agregar(f"{apiproxy}/targets/backend.xml",
+                 '<TargetEndpoint name="backend">\r\n  <HTTPTargetConnection>\r\n'
+                 '    <URL>https://backend</URL>\r\n  </HTTPTargetConnection>\r\n</TargetEndpoint>\r\n')
+    tree.agregar(f"{apiproxy}/proxies/default.xml", "<ProxyEndpoint name=\"default\"/>")
+    resultado = corregir(tree, contexto_mule(layer="reception"), "apigee", *analizar(tree, "apigee"))
+    texto = resultado.proyecto.leer_texto(f"{apiproxy}/targets/backend.xml")
+    assert 'name="connect.timeout.millis"' in texto and 'name="io.timeout.millis"' in texto
+    assert "\n" not in texto.replace("\r\n", "")
@@ -0,0 +1,46 @@
+from bench_pipeline import comparar_escala
+
+
+def _fila(caso, tamano, wall_s):
+    return {"caso": caso, "tamano": tamano, "archivos": tamano, "wall_s": wall_s}
+
+
+LINEAL = [_fila("rubricas", 200, 0.05), _fila("rubricas", 1000, 0.25), _fila("rubricas", 3000, 0.75)]
+
+
+def test_escala_lineal_no_es_regresion():
+    assert comparar_escala(LINEAL, {"resultados": LINEAL}, tol_escala=0.5, max_escala=3.0) == []
+
+
+def test_escala_cuadratica_es_regresion_aun_sin_baseline():
+    cuadratica = [_fila("rubricas", 200, 0.05), _fila("rubricas", 1000, 1.25), _fila("rubricas", 3000, 11.25)]
+    regresiones = comparar_escala(cuadratica, {}, tol_escala=0.5, max_escala=3.0)
+    assert [r.split(":")[0] for r in regresiones] == ["rubricas/1000", "rubricas/3000"]
+
+
+def test_escala_peor_que_la_baseline_es_regresion():
+    peor = [_fila("rubricas", 200, 0.05), _fila("rubricas", 1000, 0.25), _fila("rubricas", 3000, 1.5)]
+    regresiones = comparar_escala(peor, {"resultados": LINEAL}, tol_escala=0.5, max_escala=3.0)
+    assert regresiones and regresiones[0].startswith("rubricas/3000")
+
+
+def test_tiempos_bajo_el_minimo_no_cuentan():
+    ruido = [_fila("rubricas", 20, 0.001), _fila("rubricas", 200, 0.05), _fila("rubricas", 1000, 0.25)]
+    assert comparar_escala(ruido, {}, tol_escala=0.5, max_escala=3.0, minimo_s=0.02) == []
+
+
+def test_render_directorio_acepta_arquetipo_zip(tmp_path):
+    import sinteticos
+    from project_generator import render_template_directory
+    from test_support import contexto_mule
+    arquetipo = sinteticos.crear_arquetipo(tmp_path / "arquetipo", 60, semilla=7)
+    zip_path = sinteticos.comprimir(arquetipo, tmp_path / "arquetipo.zip")
+    contexto = contexto_mule("render-zip")
+
+    render_template_directory(arquetipo, tmp_path / "desde-dir", contexto)
+    render_template_directory(zip_path, tmp_path / "desde-zip", contexto)
+
+    def contenido(raiz):
+        return {p.relative_to(raiz).as_posix(): p.read_bytes() for p in raiz.rglob("*") if p.is_file()}
+    desde_dir = contenido(tmp_path / "desde-dir")
+    assert desde_dir and desde_dir == contenido(tmp_path / "desde-zip")
@@ -0,0 +1,60 @@
+import hashlib
+import io
+import os
+import time
+
+from blob_store import BlobStore
+
+
+def _envejecer(store: BlobStore, digest: str, segundos: float):
+    antes = time.time() - segundos
+    os.utime(store.ruta(digest), (antes, antes))
+
+
+def test_mismo_contenido_se_comparte(tmp_path):
+    store = BlobStore(tmp_path, max_bytes=10_000, ttl_seconds=60)
+    a = store.guardar(b"diseno")
+    b = store.guardar_archivo(io.BytesIO(b"diseno"), tam_trozo=2)
+    assert a == b == hashlib.sha256(b"diseno").hexdigest()
+    assert store.leer(a) == b"diseno"
+    assert store.estadisticas()["escritos"] == 1 and store.estadisticas()["compartidos"] == 1
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
+
+
+def test_exceso_de_tamano_borra_primero_el_menos_usado(tmp_path):
+    store = BlobStore(tmp_path, max_bytes=250, ttl_seconds=3600)
+    viejo = store.guardar(b"a" * 100)
+    medio = store.guardar(b"b" * 100)
+    _envejecer(store, viejo, 20)
+    _envejecer(store, medio, 10)
+    nuevo = store.guardar(b"c" * 100)
+    assert not store.existe(viejo)
+    assert store.existe(medio) and store.existe(nuevo)
+
+
+def test_retenidos_no_se_borran_hasta_que_vence_el_propietario(tmp_path):
+    store = BlobStore(tmp_path, max_bytes=10_000, ttl_seconds=5)
+    retenido = store.guardar(b"retenido")
+    suelto = store.guardar(b"suelto")
+    store.retener("sesion-1", retenido)
+    _envejecer(store, retenido, 60)
+    _envejecer(store, suelto, 60)
+    assert store.recolectar() == 1
+    assert store.existe(retenido) and not store.existe(suelto)
+
+    hashes, _ = store._retenidos["sesion-1"]
+    store._retenidos["sesion-1"] = (hashes, time.time() - 60)  # la pestaña no renovó
+    assert store.recolectar() == 1
+    assert not store.existe(retenido)
+    assert store.estadisticas()["propietarios"] == 0
+
+
+def test_lectura_por_trozos_y_mapeada(tmp_path):
+    store = BlobStore(tmp_path, max_bytes=10_000, ttl_seconds=60)
+    digest = store.guardar(b"0123456789")
+    assert list(store.trozos(digest, tam_trozo=4)) == [b"0123", b"4567", b"89"]
+    with store.mapear(digest) as vista:
+        assert vista[:] == b"0123456789"
+    vacio = store.guardar(b"")
+    with store.mapear(vacio) as vista:
+        assert vista == b""
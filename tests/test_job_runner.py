@@ -0,0 +1,88 @@
+import threading
+import time
+
+from job_runner import CANCELADO, ERROR, INTERRUMPIDO, OK, JobRunner
+
+
+def _bloqueante(evento: threading.Event, empezo: threading.Event | None = None):
+    def fn(reporte):
+        reporte.etapa("bloqueo")
+        if empezo is not None:
+            empezo.set()
+        evento.wait(5)
+        return "listo"
+    return fn
+
+
+def test_turnos_se_reparten_entre_propietarios():
+    runner = JobRunner(max_workers=1, db_path=None)
+    liberar, orden = threading.Event(), []
+    primero = runner.enviar("x", "bloqueo", _bloqueante(liberar))
+    ids = [runner.enviar(p, "prueba", lambda reporte, nombre: orden.append(nombre), nombre)
+           for p, nombre in (("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"))]
+    liberar.set()
+    for job_id in [primero, *ids]:
+        assert runner.esperar(job_id, timeout=5).estado == OK
+    assert orden == ["a1", "b1", "a2", "a3"]
+
+
+def test_un_propietario_no_supera_su_cupo():
+    runner = JobRunner(max_workers=3, max_por_propietario=1, db_path=None)
+    lock, en_curso, maximo = threading.Lock(), [0], [0]
+
+    def fn(reporte):
+        with lock:
+            en_curso[0] += 1
+            maximo[0] = max(maximo[0], en_curso[0])
+        time.sleep(0.02)
+        with lock:
+            en_curso[0] -= 1
+    ids = [runner.enviar("a", "prueba", fn) for _ in range(4)]
+    for job_id in ids:
+        assert runner.esperar(job_id, timeout=5).estado == OK
+    assert maximo[0] == 1
+
+
+def test_cancelar_pendiente_y_en_curso():
+    runner = JobRunner(max_workers=1, db_path=None)
+    en_curso, seguir, ejecutados = threading.Event(), threading.Event(), []
+
+    def largo(reporte):
+        reporte.etapa("uno")
+        en_curso.set()
+        seguir.wait(5)
+        reporte.etapa("dos")  # punto de control: aquí se corta
+        ejecutados.append("dos")
+
+    activo = runner.enviar("a", "largo", largo, etapas=("uno", "dos"))
+    pendiente = runner.enviar("a", "corto", lambda reporte: ejecutados.append("corto"))
+    assert en_curso.wait(5)
+    assert runner.cancelar(pendiente) and runner.obtener(pendiente).estado == CANCELADO
+    assert runner.cancelar(activo)
+    seguir.set()
+    job = runner.esperar(activo, timeout=5)
+    assert job.estado == CANCELADO and "uno" in job.tiempos
+    assert ejecutados == []
+    assert not runner.cancelar(activo)
+
+
+def test_error_queda_en_el_trabajo():
+    runner = JobRunner(max_workers=1, db_path=None)
+    job = runner.esperar(runner.enviar("a", "falla", lambda reporte: 1 / 0), timeout=5)
+    assert job.estado == ERROR and job.error.startswith("ZeroDivisionError")
+
+
+def test_estado_persistido_sobrevive_al_reinicio(tmp_path):
+    db = tmp_path / "jobs.sqlite"
+    runner = JobRunner(max_workers=1, db_path=str(db))
+    liberar, empezo = threading.Event(), threading.Event()
+    terminado = runner.enviar("a", "ok", lambda reporte: reporte.etapa("unica"), etapas=("unica",))
+    assert runner.esperar(terminado, timeout=5).estado == OK
+    colgado = runner.enviar("a", "bloqueo", _bloqueante(liberar, empezo))
+    assert empezo.wait(5)
+
+    reiniciado = JobRunner(max_workers=1, db_path=str(db))  # como si el proceso anterior hubiera muerto
+    assert reiniciado.obtener(terminado).estado == OK
+    assert reiniciado.obtener(terminado).progreso == 1.0
+    assert reiniciado.obtener(colgado).estado == INTERRUMPIDO
+    liberar.set()
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_client import AsyncLLMClient
+
+
+class _ServidorFalso:
+    """Servidor local con la forma mínima de /v1/chat/completions; cuenta peticiones y concurrencia."""
+
+    def __init__(self, demora: float = 0.0, fallos_429: int = 0):
+        self.demora = demora
+        self.fallos_429 = fallos_429
+        self.peticiones = 0
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self._lock = threading.Lock()
+        falso = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                cuerpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with falso._lock:
+                    falso.peticiones += 1
+                    falso.en_curso += 1
+                    falso.max_en_curso = max(falso.max_en_curso, falso.en_curso)
+                    rechazar = falso.fallos_429 > 0
+                    falso.fallos_429 -= rechazar
+                try:
+                    time.sleep(falso.demora)
+                    if rechazar:
+                        self._responder(429, {"error": {"message": "rate limit"}}, {"Retry-After": "0.01"})
+                    else:
+                        self._responder(200, {
+                            "id": "chatcmpl-prueba", "object": "chat.completion", "created": 0,
+                            "model": cuerpo["model"],
+                            "choices": [{"index": 0, "finish_reason": "stop",
+                                         "message": {"role": "assistant",
+                                                     "content": cuerpo["messages"][-1]["content"]}}],
+                            "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+                        })
+                finally:
+                    with falso._lock:
+                        falso.en_curso -= 1
+
+            def _responder(self, estado, datos, cabeceras=None):
+                cuerpo = json.dumps(datos).encode("utf-8")
+                self.send_response(estado)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                for clave, valor in (cabeceras or {}).items():
+                    self.send_header(clave, valor)
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _mensajes(texto: str) -> list[dict]:
+    return [{"role": "user", "content": texto}]
+
+
+def _correr(cliente: AsyncLLMClient, coro_factory):
+    async def _principal():
+        try:
+            return await coro_factory()
+        finally:
+            await cliente.cerrar()
+    return asyncio.run(_principal())
+
+
+def test_semaforo_limita_la_concurrencia():
+    with _ServidorFalso(demora=0.1) as servidor:
+        cliente = AsyncLLMClient(api_key="prueba", base_url=servidor.base_url, max_concurrency=2,
+                                 requests_per_minute=6000)
+        resultados = _correr(cliente, lambda: asyncio.gather(
+            *(cliente.chat(_mensajes(f"m{i}"), "modelo", 0.0) for i in range(6))))
+    assert [r.content for r in resultados] == [f"m{i}" for i in range(6)]
+    assert servidor.peticiones == cliente.llamadas == 6
+    assert servidor.max_en_curso == 2
+
+
+def test_token_bucket_espacia_las_peticiones():
+    with _ServidorFalso() as servidor:
+        cliente = AsyncLLMClient(api_key="prueba", base_url=servidor.base_url, requests_per_minute=600)
+
+        async def _sin_rafaga():
+            cliente._asegurar_cliente()
+            cliente._bucket.tokens = 0  # sin ráfaga inicial: 10 peticiones por segundo
+            inicio = time.monotonic()
+            await asyncio.gather(*(cliente.chat(_mensajes(f"m{i}"), "modelo", 0.0) for i in range(3)))
+            return time.monotonic() - inicio
+        transcurrido = _correr(cliente, _sin_rafaga)
+    assert servidor.peticiones == 3
+    assert transcurrido >= 0.25
+
+
+def test_peticiones_identicas_en_vuelo_se_deduplican():
+    with _ServidorFalso(demora=0.1) as servidor:
+        cliente = AsyncLLMClient(api_key="prueba", base_url=servidor.base_url)
+        a, b = _correr(cliente, lambda: asyncio.gather(cliente.chat(_mensajes("igual"), "modelo", 0.0),
+                                                       cliente.chat(_mensajes("igual"), "modelo", 0.0)))
+    assert a.content == b.content == "igual"
+    assert servidor.peticiones == 1
+    assert cliente.deduplicadas == 1
+
+
+def test_429_se_reintenta_respetando_retry_after():
+    with _ServidorFalso(fallos_429=1) as servidor:
+        cliente = AsyncLLMClient(api_key="prueba", base_url=servidor.base_url, max_retries=2)
+        resultado = _correr(cliente, lambda: cliente.chat(_mensajes("hola"), "modelo", 0.0))
+    assert resultado.content == "hola"
+    assert resultado.retries == 1 and resultado.prompt_tokens == 3
+    assert servidor.peticiones == 2
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+import llm_service
+from constants import LLM_MODE_ALWAYS
+from job_runner import JobCanceladoError
+
+SPEC = "openapi: 3.0.1\ninfo:\n  title: Creditos API\n  version: 1.0.0\npaths: {}\n"
+
+COMUN = {
+    "names": {"project_name": "Creditos API", "version": "1.0.0", "group_id": "com.banco.creditos",
+              "api_display_name": "Creditos API", "api_name": "creditos-api"},
+    "paths": {"base_path": "/creditos/v1", "base_uri": None, "target_base_url": None},
+    "upstream": {"protocol": None, "host": None, "path": None},
+    "security": {"auth": "oauth2", "cors": True,
+                 "quota": {"enabled": False, "interval": 1, "timeUnit": "minute", "limit": 60},
+                 "spike_arrest": {"enabled": False, "rate": "10ps"}},
+}
+
+
+def _llm_falso(monkeypatch, respuestas):
+    llamadas = []
+
+    def _gpt(messages, **kwargs):
+        llamadas.append((messages, kwargs))
+        return json.dumps(respuestas[len(llamadas) - 1])
+    monkeypatch.setattr(llm_service, "_gpt", _gpt)
+    return llamadas
+
+
+def test_multicapa_usa_esquema_estricto(monkeypatch):
+    llamadas = _llm_falso(monkeypatch, [{"comun": COMUN, "capas": {
+        "domain": {"names": {"artifact_id": "creditos-dominio"}, "notes": "d"},
+        "business": {"names": {"artifact_id": "creditos-negocio"}, "notes": "b"}}}])
+    contextos = llm_service.inferir_contextos_multicapa(SPEC, ["Domain", "Business"], usar_cache=False,
+                                                        modo=LLM_MODE_ALWAYS)
+    assert len(llamadas) == 1
+    formato = llamadas[0][1]["response_format"]["json_schema"]
+    assert formato["strict"] is True
+    assert formato["schema"]["properties"]["capas"]["required"] == ["domain", "business"]
+    assert "artifact_id" not in formato["schema"]["properties"]["comun"]["properties"]["names"]["properties"]
+    assert {k: c.names.artifact_id for k, c in contextos.items()} == {
+        "domain": "creditos-dominio", "business": "creditos-negocio"}
+    assert contextos["business"].security.auth == "oauth2" and contextos["business"].layer == "business"
+
+
+def test_multicapa_repara_solo_el_campo_invalido_de_la_capa(monkeypatch):
+    llamadas = _llm_falso(monkeypatch, [
+        {"comun": COMUN, "capas": {
+            "domain": {"names": {"artifact_id": "creditos-dominio"}, "notes": "d"},
+            "proxy": {"names": {"artifact_id": ["no", "es", "texto"]}, "notes": "p"}}},
+        {"names": {"artifact_id": "creditos-proxy"}},
+    ])
+    contextos = llm_service.inferir_contextos_multicapa(SPEC, ["Domain", "Proxy"], usar_cache=False,
+                                                        modo=LLM_MODE_ALWAYS)
+    assert len(llamadas) == 2
+    reparacion = llamadas[1][1]["response_format"]["json_schema"]["schema"]
+    assert reparacion["required"] == ["names"]
+    assert reparacion["properties"]["names"]["required"] == ["artifact_id"]
+    assert contextos["proxy"].names.artifact_id == "creditos-proxy"
+    assert contextos["domain"].names.artifact_id == "creditos-dominio"
+
+
+def test_multicapa_sin_la_capa_en_la_respuesta_usa_lo_comun(monkeypatch):
+    llamadas = _llm_falso(monkeypatch, [{"comun": COMUN, "capas": {}}, {"notes": "d"}, {"notes": "b"}])
+    contextos = llm_service.inferir_contextos_multicapa(SPEC, ["Domain", "Business"], usar_cache=False,
+                                                        modo=LLM_MODE_ALWAYS)
+    assert [list(kw["response_format"]["json_schema"]["schema"]["properties"]) for _, kw in llamadas[1:]] == [
+        ["notes"], ["notes"]]
+    assert {k: c.names.artifact_id for k, c in contextos.items()} == {
+        "domain": "creditos-api-domain", "business": "creditos-api-business"}
+
+
+def _contexto_completo(**cambios):
+    data = {"layer": "domain", **json.loads(json.dumps(COMUN)), "notes": ""}
+    data["names"]["artifact_id"] = "creditos-api"
+    for ruta, valor in cambios.items():
+        nodo = data
+        *padres, campo = ruta.split(".")
+        for parte in padres:
+            nodo = nodo[parte]
+        nodo[campo] = valor
+    return data
+
+
+def test_contexto_invalido_repara_solo_ese_campo(monkeypatch):
+    llamadas = _llm_falso(monkeypatch, [_contexto_completo(**{"security.quota.limit": "muchos"}),
+                                        {"security": {"quota": {"limit": 100}}}])
+    contexto = llm_service.inferir_contexto_unificado(SPEC, "Domain", usar_cache=False, modo=LLM_MODE_ALWAYS)
+    assert len(llamadas) == 2
+    reparacion = llamadas[1][1]["response_format"]["json_schema"]["schema"]
+    assert list(reparacion["properties"]) == ["security"]
+    assert list(reparacion["properties"]["security"]["properties"]["quota"]["properties"]) == ["limit"]
+    assert '"limit"' not in llamadas[1][0][1]["content"].split("Campos ya válidos")[1].split("===")[0]
+    assert contexto.security.quota.limit == 100 and contexto.security.auth == "oauth2"
+
+
+def test_reparacion_agotada_devuelve_none(monkeypatch):
+    monkeypatch.setattr(llm_service, "LLM_REPAIR_ATTEMPTS", 1)
+    _llm_falso(monkeypatch, [_contexto_completo(**{"security.quota.limit": "muchos"}),
+                             {"security": {"quota": {"limit": "tampoco"}}}])
+    assert llm_service.inferir_contexto_unificado(SPEC, "Domain", usar_cache=False, modo=LLM_MODE_ALWAYS) is None
+
+
+def test_cancelacion_en_streaming_se_propaga(monkeypatch, capsys):
+    def _stream(messages, on_section, parser=None, **kwargs):
+        on_section("names", {})
+        return {}
+    monkeypatch.setattr(llm_service, "_gpt_stream_secciones", _stream)
+
+    def _cancelar(nombre, valor):
+        raise JobCanceladoError("cancelado")
+    with pytest.raises(JobCanceladoError):
+        llm_service.inferir_contexto_unificado(SPEC, "Domain", usar_cache=False, modo=LLM_MODE_ALWAYS,
+                                               on_section=_cancelar)
+    assert "Error al parsear" not in capsys.readouterr().out
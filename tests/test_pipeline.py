@@ -0,0 +1,48 @@
+import sinteticos
+from pipeline import ETAPAS_MULTICAPA, generar_multicapa, generar_proyecto
+
+
+class _Reporte:
+    def __init__(self):
+        self.etapas = []
+
+    def etapa(self, nombre):
+        self.etapas.append(nombre)
+
+    def evento(self, nombre, valor=None):
+        pass
+
+    def verificar_cancelacion(self):
+        pass
+
+
+def test_multicapa_informa_rubricas_y_autofix_por_capa():
+    spec = sinteticos.spec_oas(3)
+    reporte = _Reporte()
+    resultado = generar_multicapa(reporte, spec, ["Domain", "Business", "Reception"], spec.encode("utf-8"), "OAS")
+    assert tuple(reporte.etapas) == ETAPAS_MULTICAPA == ("contexto", "construccion", "rubricas", "autofix")
+    assert list(resultado.capas) == ["domain", "business", "reception"]
+    assert {k: r.rubrics_kind for k, r in resultado.capas.items()} == {
+        "domain": "mule", "business": "mule", "reception": "apigee"}
+    assert len({r.contexto.names.artifact_id for r in resultado.capas.values()}) == 3
+    for r in resultado.capas.values():
+        assert r.puntaje is not None and r.observaciones is not None
+    nombres = {s.nombre for s in resultado.traza.spans}
+    assert {"construccion", "rubricas"} <= nombres
+
+
+def test_regenerar_despues_del_autofix_parte_del_arbol_sin_corregir():
+    spec = sinteticos.spec_oas(3)
+    primero = generar_proyecto(_Reporte(), spec, "Reception", spec.encode("utf-8"), "OAS")
+    assert primero.corregidas and primero.proyecto.original is not None
+    creados = set(primero.proyecto.archivos()) - set(primero.proyecto.original.archivos())
+    assert creados
+
+    cambiada = spec.replace("/bench/v1", "/bench/v2")
+    segundo = generar_proyecto(_Reporte(), cambiada, "Reception", cambiada.encode("utf-8"), "OAS",
+                               previo=(primero.contexto, primero.proyecto))
+    assert segundo.diff is not None and not segundo.diff.completa
+    assert segundo.corregidas == primero.corregidas  # el autofix vuelve a correr sobre lo regenerado
+    assert segundo.proyecto.original is not primero.proyecto
+    assert not creados & set(segundo.proyecto.original.archivos())
+    assert creados <= set(segundo.proyecto.archivos())
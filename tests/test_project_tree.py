@@ -0,0 +1,178 @@
+import sys
+import zipfile
+import zlib
+
+import pytest
+
+import project_tree
+import sinteticos
+import zip_utils
+from archetype_registry import obtener_registro
+from project_tree import ProjectTree, _patron_a_regex
+
+
+@pytest.mark.parametrize("patron, ruta, esperado", [
+    ("src/main/mule/*.xml", "src/main/mule/api.xml", True),
+    ("src/main/mule/*.xml", "src/main/mule/impl/flujo.xml", False),
+    ("src/**/*.xml", "src/main/mule/impl/flujo.xml", True),
+    ("src/**/*.xml", "src/api.xml", True),
+    ("**/pom.xml", "pom.xml", True),
+    ("**/pom.xml", "modulo/pom.xml", True),
+    ("src/**", "src/main/resources", True),
+    ("config-?.yaml", "config-1.yaml", True),
+    ("config-?.yaml", "config-10.yaml", False),
+    ("a.b", "axb", False),
+])
+def test_patron_a_regex(patron, ruta, esperado):
+    assert bool(_patron_a_regex(patron).match(ruta)) is esperado
+
+
+def _zip_origen(tmp_path):
+    zip_path = tmp_path / "origen.zip"
+    with zipfile.ZipFile(zip_path, "w") as z:
+        z.writestr("carpeta/", b"")
+        z.writestr("carpeta/comprimido.txt", "linea\n" * 500, compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("carpeta/plano.bin", bytes(range(256)) * 4, compress_type=zipfile.ZIP_STORED)
+    return zip_path
+
+
+def _round_trip(tmp_path, nombre, crudo):
+    origen = _zip_origen(tmp_path)
+    tree = ProjectTree.desde_zip(origen)
+    tree.agregar("nuevo/archivo.txt", "contenido nuevo")
+    destino = tree.escribir_zip(tmp_path / nombre)
+    with zipfile.ZipFile(origen) as a, zipfile.ZipFile(destino) as b:
+        assert b.testzip() is None
+        for nombre_entrada in ("carpeta/comprimido.txt", "carpeta/plano.bin"):
+            assert b.read(nombre_entrada) == a.read(nombre_entrada)
+            if crudo:
+                assert b.getinfo(nombre_entrada).compress_type == a.getinfo(nombre_entrada).compress_type
+        assert b.read("nuevo/archivo.txt") == b"contenido nuevo"
+
+
+@pytest.fixture
+def sonda_limpia():
+    zip_utils._copia_cruda_verificada.cache_clear()
+    yield
+    zip_utils._copia_cruda_verificada.cache_clear()
+
+
+def test_escribir_zip_copia_cruda_round_trip(tmp_path):
+    with zipfile.ZipFile(tmp_path / "sonda.zip", "w") as z:
+        assert zip_utils.admite_escritura_cruda(z)
+    _round_trip(tmp_path, "crudo.zip", crudo=True)
+
+
+@pytest.mark.parametrize("compresion", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2,
+                                        zipfile.ZIP_LZMA])
+def test_copia_cruda_fijada_a_este_python(tmp_path, compresion, sonda_limpia):
+    # Fija la copia cruda (internos privados de zipfile) a cada versión de Python en la que corre la
+    # suite: si un parche cambia esos internos, esto falla en vez de degradar en silencio.
+    assert zip_utils._copia_cruda_verificada(), f"copia cruda rota en Python {sys.version.split()[0]}"
+    origen = tmp_path / "origen.zip"
+    datos = "contenido repetido\n".encode() * 300
+    with zipfile.ZipFile(origen, "w", compresion) as z:
+        z.writestr("a/dato.txt", datos)
+    tree = ProjectTree.desde_zip(origen)
+    tree.agregar("b/nuevo.txt", "nuevo")
+    with zipfile.ZipFile(tree.escribir_zip(tmp_path / "copia.zip")) as z:
+        assert z.testzip() is None
+        info = z.getinfo("a/dato.txt")
+        assert info.compress_type == compresion
+        assert info.CRC == zlib.crc32(datos) and z.read(info) == datos
+        assert z.read("b/nuevo.txt") == b"nuevo"
+
+
+def test_sonda_rota_desactiva_la_copia_cruda(tmp_path, monkeypatch, sonda_limpia):
+    original = zip_utils.escribir_entrada_cruda
+
+    def _corrompe(dst, info, arcname, datos):
+        original(dst, info, arcname, datos[:-1] + bytes([datos[-1] ^ 0xFF]))
+    monkeypatch.setattr(zip_utils, "escribir_entrada_cruda", _corrompe)
+    monkeypatch.setattr(project_tree, "escribir_entrada_cruda",
+                        lambda *a, **k: pytest.fail("no debía usarse la copia cruda"))
+    _round_trip(tmp_path, "recomprimido.zip", crudo=False)
+
+
+def test_escribir_zip_sin_internos_recomprime(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_utils, "_INTERNOS_ZIPFILE", (*zip_utils._INTERNOS_ZIPFILE, "_atributo_inexistente"))
+    monkeypatch.setattr(project_tree, "escribir_entrada_cruda",
+                        lambda *a, **k: pytest.fail("no debía usarse la copia cruda"))
+    _round_trip(tmp_path, "recomprimido.zip", crudo=False)
+
+
+def test_arquetipo_zip_no_reabre_por_plantilla(tmp_path, monkeypatch):
+    arquetipo = sinteticos.crear_arquetipo(tmp_path / "arquetipo", 120, semilla=7)
+    zip_path = sinteticos.comprimir(arquetipo, tmp_path / "arquetipo.zip")
+    aperturas = []
+    original = zipfile.ZipFile._RealGetContents
+    monkeypatch.setattr(zipfile.ZipFile, "_RealGetContents",
+                        lambda self: (aperturas.append(1), original(self))[1])
+    entry = obtener_registro().obtener(zip_path)
+    assert len(entry.templates) > 10
+    assert len(aperturas) <= 1
+
+
+def test_copia_conserva_el_original():
+    original = ProjectTree()
+    original.agregar("a.txt", "a")
+    corregido = original.copia()
+    corregido.original = original
+    corregido.agregar("b.txt", "b")
+    copia = corregido.copia()
+    assert copia.original is original
+    assert copia.archivos() == ["a.txt", "b.txt"]
+
+
+def test_arbol_registra_carpetas_padre_y_glob():
+    tree = ProjectTree()
+    tree.agregar("src/main/mule/api.xml", "<mule/>")
+    tree.agregar("src/main/mule/impl/flujo.xml", "<mule/>")
+    tree.agregar_directorio("src/test/munit")
+    assert tree.is_dir("src/main/mule/impl") and tree.is_dir("src/test") and not tree.is_file("src/main")
+    assert tree.glob("src/**/*.xml") == ["src/main/mule/api.xml", "src/main/mule/impl/flujo.xml"]
+    assert tree.glob("src/*") == ["src/main", "src/test"]
+    assert "src/test/munit" in tree and len(tree) == 2
+
+
+def test_diferido_se_lee_solo_al_pedirlo(tmp_path):
+    (tmp_path / "carpeta").mkdir()
+    (tmp_path / "carpeta/dato.txt").write_text("uno", encoding="utf-8")
+    tree = ProjectTree.desde_directorio(tmp_path)
+    (tmp_path / "carpeta/dato.txt").write_text("dos", encoding="utf-8")
+    assert tree.is_dir("carpeta")
+    assert tree.leer_texto("carpeta/dato.txt") == "dos"
+
+
+def test_incluir_comparte_entradas_bajo_el_prefijo():
+    otro = ProjectTree()
+    otro.agregar("pom.xml", "<project/>")
+    otro.agregar_directorio("src/main")
+    bundle = ProjectTree()
+    bundle.incluir("domain/api", otro)
+    assert bundle.archivos() == ["domain/api/pom.xml"]
+    assert bundle.is_dir("domain/api/src/main") and bundle.is_dir("domain")
+    assert bundle._entradas["domain/api/pom.xml"] is otro._entradas["pom.xml"]
+
+
+def test_clave_se_invalida_al_modificar():
+    tree = ProjectTree()
+    tree.agregar("a.txt", "a")
+    tree.fijar_clave("clave")
+    assert tree.clave == "clave"
+    tree.agregar("b.txt", "b")
+    assert tree.clave is None
+
+
+def test_escribir_zip_no_reescribe_si_no_cambio(tmp_path):
+    tree = ProjectTree()
+    tree.agregar("a.txt", "a")
+    destino = tmp_path / "salida.zip"
+    tree.escribir_zip(destino)
+    mtime = destino.stat().st_mtime_ns
+    tree.escribir_zip(destino)
+    assert destino.stat().st_mtime_ns == mtime
+    tree.agregar("b.txt", "b")
+    tree.escribir_zip(destino)
+    with zipfile.ZipFile(destino) as z:
+        assert sorted(z.namelist()) == ["a.txt", "b.txt"]
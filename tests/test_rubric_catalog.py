@@ -0,0 +1,54 @@
+import json
+import random
+
+import pytest
+
+import rubric_catalog
+from rubric_catalog import AhoCorasick, IndiceRubricas, normalizar_rubrica
+
+
+def test_aho_corasick_patrones_solapados():
+    automata = AhoCorasick(["he", "she", "his", "hers", ""])
+    assert automata.buscar("ushers") == {0, 1, 3}
+    assert automata.buscar("this") == {2}
+    assert automata.buscar("xyz") == set()
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_aho_corasick_coincide_con_busqueda_directa(semilla):
+    rnd = random.Random(semilla)
+    patrones = ["".join(rnd.choice("abc") for _ in range(rnd.randint(1, 4))) for _ in range(30)]
+    automata = AhoCorasick(patrones)
+    for _ in range(50):
+        texto = "".join(rnd.choice("abcd") for _ in range(rnd.randint(0, 40)))
+        assert automata.buscar(texto) == {i for i, p in enumerate(patrones) if p in texto}
+
+
+def test_rubrica_para_devuelve_la_primera_del_archivo():
+    indice = IndiceRubricas(tuple(normalizar_rubrica(r) for r in [
+        {"id": "C5_COMMON_STRUCTURE", "label": "Estructura común", "category": "Estructura"},
+        {"id": "H1_RUNTIME_COMPAT", "label": "Runtime", "category": "Runtime"},
+    ]))
+    assert indice.rubrica_para("Falla H1_RUNTIME_COMPAT y la estructura común")["id"] == "C5_COMMON_STRUCTURE"
+    assert indice.rubrica_para("Revisar el RUNTIME")["id"] == "H1_RUNTIME_COMPAT"
+    assert indice.rubrica_para("sin coincidencias") is None
+    assert indice.buscar_palabra("Estructura") == {"C5_COMMON_STRUCTURE"}
+
+
+def test_catalogo_se_recarga_solo_si_cambia_el_contenido(tmp_path, monkeypatch):
+    archivo = tmp_path / "rubricas.json"
+    monkeypatch.setattr(rubric_catalog, "archivo_rubricas", lambda kind: archivo)
+    monkeypatch.setattr(rubric_catalog, "_catalogos", {})
+    archivo.write_text(json.dumps({"rubrics": [{"id": "R1", "label": "Uno"}]}), encoding="utf-8")
+    primero = rubric_catalog.obtener_catalogo("prueba")
+    assert rubric_catalog.obtener_catalogo("prueba") is primero
+
+    archivo.write_text(json.dumps({"rubrics": [{"id": "R1", "label": "Uno"}]}) + " ", encoding="utf-8")
+    archivo.write_text(json.dumps({"rubrics": [{"id": "R1", "label": "Uno"}]}), encoding="utf-8")
+    assert rubric_catalog.obtener_catalogo("prueba") is primero  # mismo contenido: mismo catálogo
+
+    archivo.write_text(json.dumps({"rubrics": [{"id": "R2", "label": "Dos"}]}), encoding="utf-8")
+    segundo = rubric_catalog.obtener_catalogo("prueba")
+    assert segundo is not primero and [r["id"] for r in segundo.rubricas] == ["R2"]
+    with pytest.raises(TypeError):
+        segundo.rubricas[0]["id"] = "otro"  # inmutable: se comparte entre sesiones
@@ -0,0 +1,115 @@
+import time
+import zipfile
+
+import pytest
+
+import sinteticos
+from project_generator import construir_proyecto
+from project_tree import ProjectTree
+from rubric_catalog import obtener_catalogo
+import rubric_engine
+from rubric_engine import Regla, evaluar, reevaluar
+from rubrics_service import evaluar_proyecto
+from test_support import contexto_mule
+
+
+def _proyecto(tmp_path, archivos: int) -> ProjectTree:
+    arquetipo = sinteticos.crear_arquetipo(tmp_path / f"arquetipo-{archivos}", archivos, semilla=archivos)
+    zip_path = sinteticos.comprimir(arquetipo, tmp_path / f"arquetipo-{archivos}.zip")
+    spec = sinteticos.spec_oas(max(5, archivos // 10)).encode("utf-8")
+    return construir_proyecto(str(zip_path), contexto_mule(f"escala-{archivos}"), spec, "OAS")
+
+
+def _resultado(tree: ProjectTree, regla_id: str) -> str:
+    catalogo = obtener_catalogo("mule")
+    reglas = [r for r in catalogo.reglas if r.id == regla_id]
+    return evaluar(tree, reglas, dict(catalogo.pesos)).reglas[0].estado
+
+
+def test_leer_entradas_no_reabre_el_zip(tmp_path, monkeypatch):
+    proyecto = _proyecto(tmp_path, 200)
+    aperturas = []
+    original = zipfile.ZipFile._RealGetContents
+    monkeypatch.setattr(zipfile.ZipFile, "_RealGetContents",
+                        lambda self: (aperturas.append(1), original(self))[1])
+    evaluar_proyecto(proyecto, "mule")
+    assert aperturas == []
+
+
+def test_analisis_escala_linealmente(tmp_path):
+    tiempos = {}
+    for archivos in (300, 1200):
+        proyecto = _proyecto(tmp_path, archivos)
+        evaluar_proyecto(proyecto, "mule")  # calienta catálogo e imports
+        inicio = time.perf_counter()
+        evaluar_proyecto(proyecto, "mule")
+        tiempos[archivos] = time.perf_counter() - inicio
+    # 4x archivos: lineal ~4x; con el ZIP reabierto por lectura era ~16x o más.
+    assert tiempos[1200] < 8 * max(tiempos[300], 0.01)
+
+
+def test_estructura_comun_detecta_carpeta_faltante():
+    tree = ProjectTree()
+    for carpeta in ("client", "handler", "orchestrator", "common"):
+        tree.agregar_directorio(f"src/main/mule/{carpeta}")
+    tree.agregar_directorio("src/main/resources/dwl")
+    tree.agregar_directorio("src/test/munit")
+    assert _resultado(tree, "C5_COMMON_STRUCTURE") == "ok"
+
+    incompleto = ProjectTree()
+    incompleto.agregar_directorio("src/main/mule/client")
+    assert _resultado(incompleto, "C5_COMMON_STRUCTURE") == "falla"
+
+
+@pytest.mark.parametrize("contenido, esperado", [
+    ('{"minMuleVersion": "4.6.0", "javaSpecificationVersions": ["17"]}', "ok"),
+    ('{"minMuleVersion": "4.4.0"}', "falla"),
+])
+def test_runtime_compat(contenido, esperado):
+    tree = ProjectTree()
+    tree.agregar("mule-artifact.json", contenido)
+    assert _resultado(tree, "H1_RUNTIME_COMPAT") == esperado
+
+
+def test_reglas_que_no_aplican_no_suman_al_puntaje():
+    tree = ProjectTree()
+    tree.agregar("src/main/resources/api/openapi.yaml", "openapi: 3.0.1\npaths: {}\n")
+    catalogo = obtener_catalogo("mule")
+    resultado = evaluar(tree, list(catalogo.reglas), dict(catalogo.pesos))
+    estados = {r.regla.id: r.estado for r in resultado.reglas}
+    assert estados["B1_METHOD_2XX"] == "no_aplica"  # solo se verifica sobre RAML
+    metadata = resultado.criterios["Metadata"]
+    evaluadas = [r for r in resultado.reglas if r.regla.criterio == "Metadata" and r.estado in ("ok", "falla")]
+    assert metadata.posible == sum(r.regla.peso for r in evaluadas)
+
+
+def test_clave_compartida_se_ejecuta_una_vez(monkeypatch):
+    llamadas = []
+    original = rubric_engine._CHECKS["C5_COMMON_STRUCTURE"]
+    monkeypatch.setitem(rubric_engine._CHECKS, "C5_COMMON_STRUCTURE",
+                        lambda ix: (llamadas.append(1), original(ix))[1])
+    reglas = [Regla(id=f"R{i}", criterio="General", descripcion="", severidad="WARN", peso=1.0,
+                    claves=("C5_COMMON_STRUCTURE",)) for i in range(3)]
+    resultado = evaluar(ProjectTree(), reglas, {"General": 1.0})
+    assert llamadas == [1]
+    assert [r.estado for r in resultado.reglas] == ["falla"] * 3
+
+
+def test_reevaluar_conserva_el_resto_de_reglas():
+    tree = ProjectTree()
+    tree.agregar("mule-artifact.json", '{"minMuleVersion": "4.4.0"}')
+    catalogo = obtener_catalogo("mule")
+    previo = evaluar(tree, list(catalogo.reglas), dict(catalogo.pesos))
+
+    corregido = tree.copia()
+    corregido.agregar("mule-artifact.json", '{"minMuleVersion": "4.6.0", "javaSpecificationVersions": ["17"]}')
+    h1 = [r for r in catalogo.reglas if r.id == "H1_RUNTIME_COMPAT"]
+    nuevo = reevaluar(corregido, previo, h1, dict(catalogo.pesos))
+
+    estados_previos = {r.regla.id: r.estado for r in previo.reglas}
+    estados = {r.regla.id: r.estado for r in nuevo.reglas}
+    assert estados_previos["H1_RUNTIME_COMPAT"] == "falla"
+    assert estados["H1_RUNTIME_COMPAT"] == "ok"
+    assert {k: v for k, v in estados.items() if k != "H1_RUNTIME_COMPAT"} == \
+        {k: v for k, v in estados_previos.items() if k != "H1_RUNTIME_COMPAT"}
+    assert nuevo.puntaje_total > previo.puntaje_total
@@ -0,0 +1,29 @@
+import sinteticos
+from llm_service import inferir_contextos_multicapa
+from spec_extractor import combinar_contextos, extraer_contexto_local, ids_por_capa
+from test_support import contexto_mule
+
+
+def test_multicapa_local_da_un_artifact_id_por_capa():
+    contextos = inferir_contextos_multicapa(sinteticos.spec_oas(2), ["Domain", "Business", "Proxy"], modo="local")
+    assert {k: c.names.artifact_id for k, c in contextos.items()} == {
+        "domain": "benchmark-api-domain", "business": "benchmark-api-business", "proxy": "benchmark-api-proxy"}
+    assert {c.names.api_name for c in contextos.values()} == {"benchmark-api"}
+    assert [c.layer for c in contextos.values()] == ["domain", "business", "proxy"]
+
+
+def test_combinar_multicapa_conserva_el_artifact_id_del_llm():
+    local = extraer_contexto_local(sinteticos.spec_oas(2), "business")
+    llm = contexto_mule("creditos-business-api", layer="business")
+    assert combinar_contextos(local, llm).names.artifact_id == "benchmark-api"
+    combinado = combinar_contextos(local, llm, multicapa=True)
+    assert combinado.names.artifact_id == "creditos-business-api"
+    assert combinado.names.project_name == "Benchmark API"
+
+
+def test_ids_por_capa_solo_renombra_los_repetidos():
+    contextos = {"domain": contexto_mule("api", layer="domain"), "business": contexto_mule("api", layer="business"),
+                 "proxy": contexto_mule("api-proxy", layer="proxy")}
+    ids = {k: c.names.artifact_id for k, c in ids_por_capa(contextos).items()}
+    assert ids == {"domain": "api-domain", "business": "api-business", "proxy": "api-proxy"}
+    assert contextos["domain"].names.artifact_id == "api"  # no modifica los originales
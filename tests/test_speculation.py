@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+import sinteticos
+import speculation
+from job_runner import CANCELADO, JobRunner
+from speculation import EstadisticasEspeculacion, Especulacion
+
+
+class _Reporte:
+    def verificar_cancelacion(self):
+        pass
+
+
+@pytest.fixture
+def estadisticas(monkeypatch):
+    nuevas = EstadisticasEspeculacion()
+    monkeypatch.setattr(speculation, "_estadisticas", nuevas)
+    return nuevas
+
+
+def test_acierto_reutiliza_el_contexto_especulado(estadisticas):
+    runner = JobRunner(max_workers=1, db_path=None)
+    especulacion = speculation.iniciar(runner, "sesion", sinteticos.spec_oas(2), "Business")
+    runner.esperar(especulacion.job_id, timeout=10)
+    obtener = speculation.reclamar(runner, especulacion, "Business")
+    contexto = obtener(_Reporte())
+    assert contexto.layer == "business" and contexto.names.project_name == "Benchmark API"
+    assert estadisticas.estadisticas()["hits"] == 1 and estadisticas.estadisticas()["misses"] == 0
+
+
+def test_otra_capa_cancela_y_cuenta_como_fallo(estadisticas):
+    runner = JobRunner(max_workers=1, db_path=None)
+    liberar = threading.Event()
+    bloqueo = runner.enviar("sesion", "bloqueo", lambda reporte: liberar.wait(5))
+    especulacion = speculation.iniciar(runner, "sesion", sinteticos.spec_oas(2), "Domain")
+    assert speculation.reclamar(runner, especulacion, "Reception") is None
+    assert runner.obtener(especulacion.job_id).estado == CANCELADO
+    liberar.set()
+    runner.esperar(bloqueo, timeout=5)
+    assert estadisticas.estadisticas() == {"hits": 0, "misses": 1, "hit_ratio": 0.0, "segundos_ahorrados": 0.0}
+
+
+def test_especulacion_sin_contexto_es_fallo(estadisticas):
+    runner = JobRunner(max_workers=1, db_path=None)
+    job_id = runner.enviar("sesion", "especulacion", lambda reporte: None)
+    obtener = speculation.reclamar(runner, Especulacion(job_id, "Domain"), "Domain")
+    assert obtener(_Reporte()) is None
+    assert estadisticas.estadisticas()["misses"] == 1
+
+
+def test_ahorro_es_lo_que_corrio_antes_de_confirmar(estadisticas):
+    estadisticas.registrar(True, 1.5)
+    estadisticas.registrar(True, 0.5)
+    estadisticas.registrar(False)
+    assert estadisticas.estadisticas() == {"hits": 2, "misses": 1, "hit_ratio": 0.667, "segundos_ahorrados": 2.0}
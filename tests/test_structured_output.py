@@ -0,0 +1,48 @@
+import pytest
+from pydantic import ValidationError
+
+from models import UnifiedModel
+from structured_output import campos_invalidos, esquema_estricto, quitar, subesquema
+
+
+def _objetos(nodo):
+    if isinstance(nodo, dict):
+        if nodo.get("type") == "object" and "properties" in nodo:
+            yield nodo
+        for valor in nodo.values():
+            yield from _objetos(valor)
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            yield from _objetos(valor)
+
+
+def test_esquema_estricto_cierra_todos_los_objetos():
+    esquema = esquema_estricto(UnifiedModel)
+    assert "$defs" not in esquema and "$ref" not in str(esquema)
+    for objeto in _objetos(esquema):
+        assert objeto["additionalProperties"] is False
+        assert objeto["required"] == list(objeto["properties"])
+    assert "transformations" not in esquema["properties"]  # mapa libre: no se pide
+    assert esquema["properties"]["security"]["properties"]["auth"]["enum"] == ["none", "apikey", "oauth2"]
+
+
+def test_subesquema_pide_solo_las_rutas():
+    esquema = esquema_estricto(UnifiedModel)
+    parcial = subesquema(esquema, [("names", "artifact_id"), ("security", "quota", "limit"), ("notes",)])
+    assert parcial["required"] == ["names", "security", "notes"]
+    assert list(parcial["properties"]["names"]["properties"]) == ["artifact_id"]
+    assert list(parcial["properties"]["security"]["properties"]["quota"]["properties"]) == ["limit"]
+    for objeto in _objetos(parcial):
+        assert objeto["additionalProperties"] is False
+
+
+def test_campos_invalidos_y_quitar():
+    datos = {"layer": "domain", "names": {"artifact_id": ["x"], "project_name": "P"},
+             "paths": {"base_path": "/v1"}, "security": {"quota": {"limit": "muchos"}}}
+    with pytest.raises(ValidationError) as error:
+        UnifiedModel.model_validate(datos)
+    rutas = campos_invalidos(error.value)
+    assert rutas == [("names", "artifact_id"), ("security", "quota", "limit")]
+    restante = quitar(datos, rutas)
+    assert restante["names"] == {"project_name": "P"} and restante["security"] == {"quota": {}}
+    assert datos["names"]["artifact_id"] == ["x"]  # no modifica el original
@@ -0,0 +1,13 @@
+# test_support.py
+# Datos compartidos por las pruebas.
+
+from models import UnifiedModel
+
+
+def contexto_mule(artifact_id: str = "prueba-api", layer: str = "domain", **extra) -> UnifiedModel:
+    return UnifiedModel.model_validate({
+        "layer": layer,
+        "names": {"project_name": artifact_id, "artifact_id": artifact_id, "api_name": artifact_id},
+        "paths": {"base_path": "/prueba/v1"},
+        **extra,
+    })
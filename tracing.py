@@ -0,0 +1,229 @@
+# tracing.py
+# Trazas livianas por etapa: spans con atributos (tokens, reintentos...), exportación a JSONL y
+# percentiles p50/p95 por etapa acumulados entre ejecuciones.
+#
+#   python tracing.py                 # p50/p95 por etapa a partir del JSONL de trazas
+#   python tracing.py otras.jsonl     # de otro archivo
+
+import contextvars
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from constants import TRACE_MAX_BYTES, TRACE_PATH, TRACE_WINDOW
+
+
+@dataclass
+class Span:
+    nombre: str
+    inicio: float  # time.time() al empezar
+    duracion: float = 0.0
+    profundidad: int = 0
+    atributos: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+class Traza:
+    """
+    Agrupa los spans de una ejecución (una generación, un ZIP del lote). Se activa con `with` en el
+    hilo que la ejecuta; los spans que se abren en ese hilo mientras está activa quedan en ella.
+    """
+
+    def __init__(self, nombre: str, **atributos):
+        self.id = uuid.uuid4().hex
+        self.nombre = nombre
+        self.atributos = dict(atributos)
+        self.spans: list[Span] = []
+        self.inicio = time.time()
+        self.duracion = 0.0
+        self._lock = threading.Lock()
+        self._token: Optional[contextvars.Token] = None
+
+    def __enter__(self) -> "Traza":
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        self._token = _traza_actual.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.duracion = round(time.perf_counter() - self._t0, 6)
+        _traza_actual.reset(self._token)
+        exportar(self)
+
+    def agregar(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def desglose(self) -> dict[str, float]:
+        """Segundos por etapa: suma de los spans con ese nombre (un span anidado cuenta también en su padre)."""
+        totales: dict[str, float] = {}
+        for s in self.spans:
+            totales[s.nombre] = round(totales.get(s.nombre, 0.0) + s.duracion, 6)
+        return totales
+
+    def a_dict(self) -> dict:
+        return {"traza": self.id, "nombre": self.nombre, "inicio": self.inicio, "duracion": self.duracion,
+                "atributos": self.atributos, "spans": [asdict(s) for s in self.spans]}
+
+
+_traza_actual: contextvars.ContextVar[Optional[Traza]] = contextvars.ContextVar("traza_actual", default=None)
+_profundidad: contextvars.ContextVar[int] = contextvars.ContextVar("profundidad_span", default=0)
+
+
+def traza_actual() -> Optional[Traza]:
+    return _traza_actual.get()
+
+
+class EstadisticasEtapas:
+    """Últimas `ventana` duraciones por etapa, para p50/p95 (en memoria, compartidas por el proceso)."""
+
+    def __init__(self, ventana: int = TRACE_WINDOW):
+        self.ventana = ventana
+        self._duraciones: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa: str, segundos: float):
+        with self._lock:
+            self._duraciones.setdefault(etapa, deque(maxlen=self.ventana)).append(segundos)
+
+    def percentiles(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            copia = {etapa: sorted(d) for etapa, d in self._duraciones.items()}
+        return {etapa: {"n": len(v), "p50": _percentil(v, 0.50), "p95": _percentil(v, 0.95)}
+                for etapa, v in copia.items() if v}
+
+
+def _percentil(ordenados: list[float], q: float) -> float:
+    """Percentil por el método del rango más cercano (sobre una lista ya ordenada)."""
+    indice = min(len(ordenados) - 1, max(0, math.ceil(q * len(ordenados)) - 1))
+    return round(ordenados[indice], 6)
+
+
+_estadisticas: Optional[EstadisticasEtapas] = None
+_estadisticas_lock = threading.Lock()
+
+
+def obtener_estadisticas() -> EstadisticasEtapas:
+    """Estadísticas del proceso; la primera vez parten de las trazas ya exportadas (ejecuciones anteriores)."""
+    global _estadisticas
+    with _estadisticas_lock:
+        if _estadisticas is None:
+            _estadisticas = cargar_estadisticas() if TRACE_PATH is not None else EstadisticasEtapas()
+        return _estadisticas
+
+
+@contextmanager
+def span(nombre: str, **atributos) -> Iterator[Span]:
+    """
+    Mide el bloque. El span se agrega a la traza activa (si hay) y su duración a las estadísticas
+    del proceso; los atributos se pueden completar dentro del bloque (`s.atributos[...] = ...`).
+    """
+    profundidad = _profundidad.get()
+    s = Span(nombre=nombre, inicio=time.time(), profundidad=profundidad, atributos=dict(atributos))
+    token = _profundidad.set(profundidad + 1)
+    t0 = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.duracion = round(time.perf_counter() - t0, 6)
+        _profundidad.reset(token)
+        _cerrar(s)
+
+
+def registrar(nombre: str, segundos: float, **atributos):
+    """Span con una duración ya medida (p. ej. tiempo acumulado de parseo durante un stream)."""
+    _cerrar(Span(nombre=nombre, inicio=time.time() - segundos, duracion=round(segundos, 6),
+                 profundidad=_profundidad.get(), atributos=dict(atributos)))
+
+
+def _cerrar(s: Span):
+    obtener_estadisticas().registrar(s.nombre, s.duracion)
+    traza = _traza_actual.get()
+    if traza is not None:
+        traza.agregar(s)
+
+
+# --- Exportación ---
+
+_export_lock = threading.Lock()
+
+
+def exportar(traza: Traza, ruta: Optional[Path] = TRACE_PATH):
+    """Agrega la traza como una línea JSON. Al superar `TRACE_MAX_BYTES` el archivo rota a `.1`."""
+    if ruta is None:
+        return
+    ruta = Path(ruta)
+    linea = json.dumps(traza.a_dict(), ensure_ascii=False, default=str) + "\n"
+    try:
+        with _export_lock:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            if ruta.exists() and ruta.stat().st_size > TRACE_MAX_BYTES:
+                ruta.replace(ruta.with_suffix(ruta.suffix + ".1"))
+            with open(ruta, "a", encoding="utf-8") as f:
+                f.write(linea)
+    except OSError as e:
+        print(f"Advertencia: No se pudo exportar la traza {traza.id}: {e}")
+
+
+def cargar_estadisticas(ruta: Path = TRACE_PATH, ventana: int = TRACE_WINDOW) -> EstadisticasEtapas:
+    """Percentiles por etapa a partir de un JSONL de trazas (de este u otros procesos)."""
+    estadisticas = EstadisticasEtapas(ventana)
+    for ruta_archivo in (Path(str(ruta) + ".1"), Path(ruta)):
+        if not ruta_archivo.exists():
+            continue
+        with open(ruta_archivo, encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    traza = json.loads(linea)
+                except ValueError:
+                    continue
+                for s in traza.get("spans", []) if isinstance(traza, dict) else []:
+                    estadisticas.registrar(s["nombre"], s["duracion"])
+    return estadisticas
+
+
+def _reiniciar_locks():
+    """
+    En un hijo creado con fork (p. ej. el pool de procesos del lote) los locks pueden haberse copiado
+    tomados por otro hilo del padre: se recrean para que el hijo no quede bloqueado.
+    """
+    global _export_lock, _estadisticas_lock
+    _export_lock, _estadisticas_lock = threading.Lock(), threading.Lock()
+    if _estadisticas is not None:
+        _estadisticas._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_locks)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    ruta = Path(argv[0]) if argv else TRACE_PATH
+    if ruta is None:
+        print("No hay archivo de trazas configurado (GENERATOR_TRACE_FILE).")
+        return 1
+    percentiles = cargar_estadisticas(ruta).percentiles()
+    if not percentiles:
+        print(f"Sin trazas en {ruta}.")
+        return 1
+    print(f"{'etapa':<16} {'n':>6} {'p50 ms':>10} {'p95 ms':>10}")
+    for etapa, p in sorted(percentiles.items(), key=lambda e: -e[1]["p95"]):
+        print(f"{etapa:<16} {p['n']:>6} {p['p50'] * 1000:>10.1f} {p['p95'] * 1000:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+# yaml_stream.py
+# Parsers incrementales de la respuesta unificada (YAML libre o JSON con esquema): validan cada
+# sección de primer nivel apenas se completa.
+
+import json
+import re
+from typing import Any, Optional
+
+import yaml
+from pydantic import ValidationError
+
+from models import UnifiedModel
+
+LAYERS_VALIDAS = {"domain", "business", "proxy", "reception"}
+_CLAVE_RAIZ = re.compile(r"^([A-Za-z_][\w-]*)\s*:")
+_FENCE = re.compile(r"^\s*```")
+
+# Esqueleto mínimo válido: cada sección se valida reemplazando su parte en este modelo.
+_ESQUELETO = {"layer": "domain", "names": {"project_name": "x"}, "paths": {}}
+
+
+class EsquemaVioladoError(ValueError):
+    """La respuesta en curso ya no puede producir un `UnifiedModel` válido."""
+
+    def __init__(self, seccion: str, motivo: str):
+        super().__init__(f"Sección '{seccion}': {motivo}")
+        self.seccion = seccion
+        self.motivo = motivo
+
+
+def validar_seccion(nombre: str, valor: Any):
+    """Lanza EsquemaVioladoError si la sección no encaja en `UnifiedModel`."""
+    if nombre not in UnifiedModel.model_fields:
+        raise EsquemaVioladoError(nombre, "clave de primer nivel desconocida")
+    if nombre == "layer" and str(valor).strip().lower() not in LAYERS_VALIDAS:
+        raise EsquemaVioladoError(nombre, f"capa inválida '{valor}'")
+    if nombre in ("names", "paths", "upstream", "security") and not isinstance(valor, dict):
+        raise EsquemaVioladoError(nombre, "se esperaba un mapa")
+    try:
+        UnifiedModel.model_validate({**_ESQUELETO, nombre: valor})
+    except ValidationError as e:
+        raise EsquemaVioladoError(nombre, e.errors()[0].get("msg", str(e))) from e
+
+
+class ParserYamlIncremental:
+    """
+    Recibe el texto del LLM a trozos. Cada vez que empieza una clave de primer nivel, la sección
+    anterior está completa: se parsea, se valida y se devuelve para mostrarla.
+    """
+
+    def __init__(self):
+        self.datos: dict[str, Any] = {}
+        self._pendiente = ""
+        self._seccion: Optional[str] = None
+        self._lineas: list[str] = []
+        self._cerrado = False
+
+    def feed(self, trozo: str) -> list[tuple[str, Any]]:
+        self._pendiente += trozo
+        *lineas, self._pendiente = self._pendiente.split("\n")
+        completas = []
+        for linea in lineas:
+            completas.extend(self._procesar_linea(linea))
+        return completas
+
+    def finish(self) -> list[tuple[str, Any]]:
+        completas = []
+        if self._pendiente:
+            completas.extend(self._procesar_linea(self._pendiente))
+            self._pendiente = ""
+        completas.extend(self._cerrar_seccion())
+        self._cerrado = True
+        return completas
+
+    def _procesar_linea(self, linea: str) -> list[tuple[str, Any]]:
+        if self._cerrado:
+            return []
+        if _FENCE.match(linea):
+            # La fence de apertura se ignora; la de cierre termina el documento.
+            if self._seccion is not None:
+                completas = self._cerrar_seccion()
+                self._cerrado = True
+                return completas
+            return []
+
+        m = _CLAVE_RAIZ.match(linea)
+        if m:
+            completas = self._cerrar_seccion()
+            self._seccion = m.group(1)
+            if self._seccion not in UnifiedModel.model_fields:
+                raise EsquemaVioladoError(self._seccion, "clave de primer nivel desconocida")
+            self._lineas = [linea]
+            return completas
+
+        if self._seccion is not None:
+            self._lineas.append(linea)
+        return []
+
+    def _cerrar_seccion(self) -> list[tuple[str, Any]]:
+        if self._seccion is None:
+            return []
+        nombre, texto = self._seccion, "\n".join(self._lineas)
+        self._seccion, self._lineas = None, []
+        try:
+            parsed = yaml.safe_load(texto) or {}
+        except yaml.YAMLError as e:
+            raise EsquemaVioladoError(nombre, f"YAML inválido: {e}") from e
+        valor = parsed.get(nombre) if isinstance(parsed, dict) else None
+        validar_seccion(nombre, valor)
+        self.datos[nombre] = valor
+        return [(nombre, valor)]
+
+
+class ParserJsonIncremental:
+    """
+    Como `ParserYamlIncremental`, para la salida estructurada (un objeto JSON): sigue la anidación
+    carácter a carácter y, cada vez que se cierra un miembro de primer nivel, lo parsea y valida.
+    """
+
+    def __init__(self):
+        self.datos: dict[str, Any] = {}
+        self.texto = ""
+        self._profundidad = 0
+        self._en_cadena = False
+        self._escape = False
+        self._inicio_miembro: Optional[int] = None
+
+    def feed(self, trozo: str) -> list[tuple[str, Any]]:
+        completas = []
+        base = len(self.texto)
+        self.texto += trozo
+        for i, c in enumerate(trozo, start=base):
+            if self._en_cadena:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._en_cadena = False
+            elif c == '"':
+                self._en_cadena = True
+            elif c in "{[":
+                self._profundidad += 1
+                if self._profundidad == 1:
+                    self._inicio_miembro = i + 1
+            elif c in "}]":
+                if self._profundidad == 1:
+                    completas.extend(self._cerrar_miembro(i))
+                self._profundidad -= 1
+            elif c == "," and self._profundidad == 1:
+                completas.extend(self._cerrar_miembro(i))
+                self._inicio_miembro = i + 1
+        return completas
+
+    def finish(self) -> list[tuple[str, Any]]:
+        return []  # los miembros se entregan al cerrarse; un objeto truncado queda incompleto
+
+    def _cerrar_miembro(self, fin: int) -> list[tuple[str, Any]]:
+        fragmento = self.texto[self._inicio_miembro:fin].strip() if self._inicio_miembro is not None else ""
+        self._inicio_miembro = None
+        if not fragmento:
+            return []
+        try:
+            miembro = json.loads("{" + fragmento + "}")
+        except ValueError as e:
+            raise EsquemaVioladoError(fragmento.split(":", 1)[0].strip(' "'), f"JSON inválido: {e}") from e
+        completas = []
+        for nombre, valor in miembro.items():
+            validar_seccion(nombre, valor)
+            self.datos[nombre] = valor
+            completas.append((nombre, valor))
+        return completas
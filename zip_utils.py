@@ -0,0 +1,137 @@
+# zip_utils.py
+# Utilidades de bajo nivel para copiar entradas entre ZIPs sin descomprimir/recomprimir.
+
+import functools
+import io
+import struct
+import zipfile
+import zlib
+
+_LOCAL_HEADER_SIZE = 30
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+
+def raiz_comun(nombres: list[str]) -> str:
+    """
+    Prefijo de carpetas envoltorio que comparten todas las entradas (p. ej. 'arquetipo-x/arquetipo-x/').
+    Devuelve '' si las entradas no cuelgan de una única carpeta.
+    """
+    partes = [n.split("/") for n in nombres if n and not n.endswith("/")]
+    if not partes:
+        return ""
+    prefijo = []
+    for nivel in zip(*[p[:-1] for p in partes]):
+        if len(set(nivel)) != 1:
+            break
+        prefijo.append(nivel[0])
+    return "/".join(prefijo) + "/" if prefijo else ""
+
+
+def offset_datos(fp, info: zipfile.ZipInfo) -> int:
+    """Posición en el archivo donde empiezan los datos comprimidos de la entrada."""
+    fp.seek(info.header_offset)
+    header = fp.read(_LOCAL_HEADER_SIZE)
+    if len(header) != _LOCAL_HEADER_SIZE or header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Cabecera local inválida para '{info.filename}'")
+    largo_nombre, largo_extra = struct.unpack("<HH", header[26:30])
+    return info.header_offset + _LOCAL_HEADER_SIZE + largo_nombre + largo_extra
+
+
+def leer_entrada(zip_path, info: zipfile.ZipInfo, offset: int) -> bytes:
+    """
+    Contenido de una entrada leyendo solo sus bytes comprimidos desde `offset` (sin volver a parsear
+    el directorio central del ZIP). Los métodos que no son stored/deflate pasan por `zipfile`.
+    """
+    if info.flag_bits & _FLAG_ENCRYPTED or info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        with zipfile.ZipFile(zip_path) as z:
+            return z.read(info)
+    with open(zip_path, "rb") as fp:
+        fp.seek(offset)
+        crudo = fp.read(info.compress_size)
+    datos = crudo if info.compress_type == zipfile.ZIP_STORED else zlib.decompress(crudo, -zlib.MAX_WBITS)
+    if zlib.crc32(datos) != info.CRC:
+        raise zipfile.BadZipFile(f"CRC inválido en '{info.filename}'")
+    return datos
+
+
+def admite_copia_cruda(info: zipfile.ZipInfo) -> bool:
+    """Las entradas cifradas no se pueden reubicar tal cual."""
+    return not (info.flag_bits & _FLAG_ENCRYPTED)
+
+
+# Internos de `zipfile.ZipFile` (CPython) que usa `escribir_entrada_cruda`. Son privados: un parche de
+# Python puede cambiar su semántica sin quitarlos, y entonces la copia cruda produciría ZIPs corruptos
+# sin ningún error. Por eso `admite_escritura_cruda` no se conforma con que existan: también hace una
+# copia cruda de prueba y la verifica (CRC, `testzip()`). Si falla, se recomprime con `writestr`.
+_INTERNOS_ZIPFILE = ("_lock", "_writing", "_writecheck", "_didModify", "fp", "start_dir", "filelist", "NameToInfo")
+
+
+def admite_escritura_cruda(dst: zipfile.ZipFile) -> bool:
+    """
+    La copia cruda replica `ZipFile.write` con atributos privados; si una versión de Python los
+    cambia, quien escribe debe recomprimir (`writestr`) en lugar de copiar.
+    """
+    return (all(hasattr(dst, nombre) for nombre in _INTERNOS_ZIPFILE)
+            and callable(getattr(zipfile.ZipInfo, "FileHeader", None))
+            and _copia_cruda_verificada())
+
+
+@functools.cache
+def _copia_cruda_verificada() -> bool:
+    """Una vez por proceso: copia cruda entre dos ZIPs en memoria y comprueba que el resultado se lee igual."""
+    datos = b"sonda de copia cruda\n" * 64
+    try:
+        origen = io.BytesIO()
+        with zipfile.ZipFile(origen, "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("sonda.txt", datos)
+        with zipfile.ZipFile(origen) as z:
+            info = z.getinfo("sonda.txt")
+        inicio = offset_datos(origen, info)
+        crudo = origen.getvalue()[inicio:inicio + info.compress_size]
+
+        destino = io.BytesIO()
+        with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("antes.txt", b"antes")
+            escribir_entrada_cruda(z, info, "copia/sonda.txt", crudo)
+            z.writestr("despues.txt", b"despues")
+        with zipfile.ZipFile(destino) as z:
+            if (z.testzip() is None and z.namelist() == ["antes.txt", "copia/sonda.txt", "despues.txt"]
+                    and z.getinfo("copia/sonda.txt").CRC == zlib.crc32(datos)
+                    and z.read("copia/sonda.txt") == datos and z.read("despues.txt") == b"despues"):
+                return True
+        error = "el ZIP de prueba no se lee igual"
+    except Exception as e:
+        error = e
+    print(f"Info: copia cruda de ZIP deshabilitada en este Python, se recomprime. Error: {error}")
+    return False
+
+
+def escribir_entrada_cruda(dst: zipfile.ZipFile, info: zipfile.ZipInfo, arcname: str, datos: bytes):
+    """
+    Escribe en `dst` una entrada con los bytes ya comprimidos de `info` bajo un nuevo nombre.
+    Replica lo que hace `ZipFile.write`, pero sin pasar por el compresor. Solo si
+    `admite_escritura_cruda(dst)`.
+    """
+    zinfo = zipfile.ZipInfo(arcname, info.date_time)
+    zinfo.compress_type = info.compress_type
+    zinfo.create_system = info.create_system
+    zinfo.external_attr = info.external_attr
+    zinfo.flag_bits = info.flag_bits & ~_FLAG_DATA_DESCRIPTOR
+    zinfo.CRC = info.CRC
+    zinfo.compress_size = info.compress_size
+    zinfo.file_size = info.file_size
+    zip64 = max(zinfo.file_size, zinfo.compress_size) > zipfile.ZIP64_LIMIT
+
+    with dst._lock:
+        if dst._writing:
+            raise ValueError("No se puede escribir mientras hay otra entrada abierta en el ZIP.")
+        dst._writecheck(zinfo)
+        dst._didModify = True
+        dst.fp.seek(dst.start_dir)
+        zinfo.header_offset = dst.fp.tell()
+        dst.fp.write(zinfo.FileHeader(zip64))
+        dst.fp.write(datos)
+        dst.filelist.append(zinfo)
+        dst.NameToInfo[zinfo.filename] = zinfo
+        dst.start_dir = dst.fp.tell()